@@ -0,0 +1,63 @@
+"""Benchmark of the vectorised bst_to_utc against the previous per-row pytz conversion
+
+Usage:
+    python benchmarks/benchmark_bst_to_utc.py --number-of-gsps 20 --years 3
+"""
+import argparse
+import time
+
+import pandas as pd
+import pytz
+from synthetic_gsp_data import make_gsp_frames
+
+from ukpn.load import bst_to_utc, convert_gsp_data_to_utc
+
+
+def legacy_bst_to_utc(original_df: pd.DataFrame, time_zone: str = "Europe/London"):
+    """The previous row by row implementation, kept for comparison"""
+    local_standard_time = pytz.timezone(time_zone)
+    original_df = original_df.reset_index()
+    original_df["time_utc"] = original_df["time_utc"].apply(lambda x: x.to_pydatetime())
+    original_df["time_utc"] = original_df["time_utc"].apply(
+        lambda x: local_standard_time.localize(x).astimezone(pytz.utc)
+    )
+    original_df["time_utc"] = pd.to_datetime(original_df["time_utc"])
+    return original_df.set_index("time_utc")
+
+
+def main():
+    """Times each conversion and prints rows/second"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, default=5)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    gsp_frames = make_gsp_frames(args.number_of_gsps, args.years * 365, start="2019-01-01")
+    total_rows = sum(len(x) for x in gsp_frames.values())
+
+    timings = {}
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy = {name: legacy_bst_to_utc(df) for name, df in gsp_frames.items()}
+        timings["legacy per-row pytz"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorised = {name: bst_to_utc(df) for name, df in gsp_frames.items()}
+    timings["vectorised bst_to_utc"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    convert_gsp_data_to_utc(gsp_frames)
+    timings["convert_gsp_data_to_utc"] = time.perf_counter() - start
+
+    if not args.skip_legacy:
+        for name in gsp_frames:
+            assert legacy[name].index.equals(vectorised[name].index)
+
+    print(f"{args.number_of_gsps} GSPs, {total_rows} rows")
+    for name, seconds in timings.items():
+        print(f"{name:>26}: {seconds:8.3f} s  {total_rows / seconds:14,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
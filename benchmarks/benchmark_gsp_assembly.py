@@ -0,0 +1,73 @@
+"""Benchmark of assemble_gsp_dataset against growing a dataframe with outer pd.concat
+
+Usage:
+    python benchmarks/benchmark_gsp_assembly.py --number-of-gsps 50 200 500 --days 60
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from synthetic_gsp_data import make_gsp_frames
+
+from ukpn.load import assemble_gsp_dataset
+
+
+def legacy_assembly(gsp_data_in_dict):
+    """The previous implementation, re-aligning the whole dataframe per GSP"""
+    gsp_dataframe = pd.DataFrame()
+    for data_frame in gsp_data_in_dict.values():
+        gsp_dataframe = pd.concat([gsp_dataframe, data_frame], axis=1, join="outer")
+    return xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], gsp_dataframe.to_numpy())),
+        coords=dict(time_utc=gsp_dataframe.index.values, gsp_id=gsp_dataframe.columns),
+    )
+
+
+def measure(function, *args):
+    """Wall time and peak traced memory of a function call"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    """Times each assembly and prints the wall time and peak memory"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    # Warming up the imports and caches of pandas and xarray
+    assemble_gsp_dataset(make_gsp_frames(2, 1, tz="UTC", ragged=True))
+    legacy_assembly(make_gsp_frames(2, 1, tz="UTC", ragged=True))
+
+    print(f"{'GSPs':>6} {'method':>22} {'seconds':>10} {'peak MB':>10}")
+    for number_of_gsps in args.number_of_gsps:
+        gsp_data_in_dict = make_gsp_frames(number_of_gsps, args.days, tz="UTC", ragged=True)
+
+        methods = {"assemble_gsp_dataset": assemble_gsp_dataset}
+        if not args.skip_legacy:
+            methods["legacy pd.concat"] = legacy_assembly
+
+        results = {}
+        for name, function in methods.items():
+            results[name], seconds, peak = measure(function, gsp_data_in_dict)
+            print(f"{number_of_gsps:>6} {name:>22} {seconds:>10.3f} {peak / 1e6:>10.1f}")
+
+        if not args.skip_legacy:
+            np.testing.assert_array_equal(
+                results["assemble_gsp_dataset"].power.values,
+                results["legacy pd.concat"].power.values,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Throughput of the GSP training windows in samples per second for several batch sizes
+
+Compares selecting every window from the xarray dataset, collating the windows of
+SampleGSPWindows and gathering whole batches with BatchGSPWindows.
+
+Usage:
+    python benchmarks/benchmark_gsp_batches.py --number-of-gsps 100 --days 365
+"""
+import argparse
+import itertools
+import time
+
+import pandas as pd
+import torch
+import xarray as xr
+from synthetic_gsp_data import make_gsp_dataset
+
+from ukpn.load import BatchGSPWindows, SampleGSPWindows, collate_gsp_windows
+
+
+def time_batches(batches, number_of_samples: int) -> float:
+    """Samples per second of the first batches adding up to number_of_samples
+
+    The indexing of the windows before the first batch is included in the time.
+    """
+    start = time.perf_counter()
+    samples = 0
+    for batch in batches:
+        samples += len(batch["t0"])
+        if samples >= number_of_samples:
+            break
+    return samples / (time.perf_counter() - start)
+
+
+def select_with_xarray(dataset: xr.Dataset, windows, history_length: int, batch_size: int):
+    """Batches of windows selected one by one from the dataset, as users did before"""
+    step = pd.Timedelta("10Min")
+    while True:
+        batch = list(itertools.islice(windows, batch_size))
+        if not batch:
+            return
+        power = [
+            torch.tensor(
+                dataset.power.sel(
+                    gsp_id=x["gsp_id"],
+                    time_utc=slice(x["t0"] - (history_length - 1) * step, None),
+                ).values[: len(x["power"])]
+            )
+            for x in batch
+        ]
+        yield dict(power=torch.stack(power), t0=[x["t0"] for x in batch])
+
+
+def main():
+    """Prints the samples per second of every method and batch size"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--history-length", type=int, default=48)
+    parser.add_argument("--forecast-length", type=int, default=48)
+    parser.add_argument("--number-of-samples", type=int, default=200_000)
+    args = parser.parse_args()
+
+    dataset = make_gsp_dataset(args.number_of_gsps, args.days, nan_fraction=0.01)
+    sample_kwargs = dict(
+        history_length=args.history_length,
+        forecast_length=args.forecast_length,
+        max_nans=5,
+        shuffle=True,
+        seed=0,
+    )
+    window_length = args.history_length + args.forecast_length
+    print(f"{args.number_of_gsps} GSPs, {args.days} days, windows of {window_length}")
+
+    for batch_size in [32, 64, 128, 256, 512, 1024]:
+        windows = iter(SampleGSPWindows([dataset], **sample_kwargs))
+        xarray_rate = time_batches(
+            select_with_xarray(dataset, windows, args.history_length, batch_size),
+            number_of_samples=2_000,
+        )
+
+        windows = iter(SampleGSPWindows([dataset], **sample_kwargs))
+        collated = (
+            collate_gsp_windows(list(itertools.islice(windows, batch_size)))
+            for _ in itertools.count()
+        )
+        collate_rate = time_batches(collated, number_of_samples=args.number_of_samples)
+
+        batched = BatchGSPWindows([dataset], batch_size=batch_size, **sample_kwargs)
+        batch_rate = time_batches(batched, number_of_samples=args.number_of_samples)
+
+        print(
+            f"batch size {batch_size:>5}: xarray {xarray_rate:>10,.0f}, "
+            f"collate {collate_rate:>10,.0f}, batched {batch_rate:>10,.0f} samples/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
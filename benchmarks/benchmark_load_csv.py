@@ -0,0 +1,76 @@
+"""Benchmark of the csv readers of load_csv_to_pandas on large synthetic GSP files
+
+Usage:
+    python benchmarks/benchmark_load_csv.py --years 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from glob import glob
+from pathlib import Path
+
+import pandas as pd
+from synthetic_gsp_data import write_synthetic_gsp_csvs
+
+from ukpn.load import UKPN_CSV_SCHEMA, load_csv_to_pandas
+
+
+def legacy_load_csv_to_pandas(path_to_file: Path, datetime_index_name: str = "time_utc"):
+    """The previous reader, kept for comparison"""
+    path_to_file = path_to_file.as_posix()
+    file_name = [os.path.basename(x).rsplit(".", 1)[0] for x in glob(path_to_file)]
+    df = pd.read_csv(path_to_file, names=[datetime_index_name, file_name[0]], sep=",", skiprows=1)
+    if isinstance(df[df.columns[1]][0], str):
+        df[file_name[0]] = pd.to_numeric(df[file_name[0]], errors="coerce")
+    df[datetime_index_name] = pd.to_datetime(df[datetime_index_name])
+    df = df.reset_index(drop=True)
+    return df.set_index(datetime_index_name)
+
+
+def main():
+    """Times each reader and prints rows/second"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    readers = {
+        "legacy": lambda x: legacy_load_csv_to_pandas(Path(x)),
+        "inferred": lambda x: load_csv_to_pandas(x),
+        "schema, c": lambda x: load_csv_to_pandas(x, **UKPN_CSV_SCHEMA),
+    }
+    try:
+        import pyarrow  # noqa: F401
+
+        readers["schema, pyarrow"] = lambda x: load_csv_to_pandas(
+            x, **dict(UKPN_CSV_SCHEMA, engine="pyarrow")
+        )
+    except ImportError:
+        print("pyarrow is not installed, skipping its engine")
+
+    with tempfile.TemporaryDirectory() as folder:
+        (file_path,) = write_synthetic_gsp_csvs(
+            folder,
+            number_of_gsps=1,
+            years=args.years,
+            dst_transitions=False,
+            duplicate_fraction=0,
+            negative_fraction=0,
+            string_fraction=0,
+        )
+        rows = int(args.years * 365 * 144)
+        print(f"{rows} rows, {os.path.getsize(file_path) / 1e6:.1f} MB")
+
+        for name, reader in readers.items():
+            seconds = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                reader(file_path)
+                seconds.append(time.perf_counter() - start)
+            best = min(seconds)
+            print(f"{name:>16}: {best:7.3f} s  {rows / best:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
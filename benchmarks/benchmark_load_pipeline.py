@@ -0,0 +1,153 @@
+"""Throughput and peak memory of every stage of the GSP load pipeline on synthetic files
+
+Times load_csv_to_pandas, bst_to_utc, check_for_negative_data, OpenGSPData and
+convert_xarray_to_netcdf on the UKPN formatted files of synthetic_gsp_data.py. The
+results can be saved to a JSON file and later runs compared against it, the script
+exits with an error if a stage got slower or bigger than the tolerance.
+
+Usage:
+    python benchmarks/benchmark_load_pipeline.py --number-of-gsps 20 --years 3 --save base.json
+    python benchmarks/benchmark_load_pipeline.py --number-of-gsps 20 --years 3 --compare base.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_gsp_data import write_synthetic_gsp_csvs
+
+from ukpn.load import (
+    OpenGSPData,
+    bst_to_utc,
+    check_for_negative_data,
+    convert_xarray_to_netcdf,
+    load_csv_to_pandas,
+)
+
+
+def measure(function, *args, setup=None, **kwargs):
+    """Result, wall time and peak traced memory of a function call
+
+    Tracing slows down the allocations a lot, so the function is timed untraced and
+    called a second time for the peak. Only the allocations of this process are
+    traced, so OpenGSPData is run with threads. For the functions changing their
+    input in place, setup is called before each call, outside of the timing and the
+    tracing, and its result is passed as the first argument.
+    """
+    first_args = (setup(),) if setup is not None else ()
+    start = time.perf_counter()
+    result = function(*first_args, *args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    first_args = (setup(),) if setup is not None else ()
+    tracemalloc.start()
+    function(*first_args, *args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_stages(folder: str, file_paths):
+    """Seconds, peak MB, rows/s and MB/s of every stage"""
+    file_mb = sum(os.path.getsize(x) for x in file_paths) / 1e6
+
+    def load_all():
+        return [load_csv_to_pandas(x) for x in file_paths]
+
+    data_frames, seconds, peak = measure(load_all)
+    rows = sum(len(x) for x in data_frames)
+    results = {"load_csv_to_pandas": (seconds, peak)}
+
+    utc_frames, *results["bst_to_utc"] = measure(lambda: [bst_to_utc(x) for x in data_frames])
+    # The negative values are replaced in place, so every call gets fresh copies
+    _, *results["check_for_negative_data"] = measure(
+        lambda frames: [check_for_negative_data(x, replace_with_nan=True) for x in frames],
+        setup=lambda: [x.copy() for x in utc_frames],
+    )
+
+    dataset, *results["OpenGSPData"] = measure(
+        lambda: next(iter(OpenGSPData(folder_destination=folder, executor="thread")))
+    )
+    _, *results["convert_xarray_to_netcdf"] = measure(
+        convert_xarray_to_netcdf,
+        dataset,
+        folder_to_save=folder,
+        file_name="benchmark.nc",
+        overwrite=True,
+    )
+
+    return {
+        name: dict(
+            seconds=seconds,
+            peak_mb=peak / 1e6,
+            rows_per_second=rows / seconds,
+            mb_per_second=file_mb / seconds,
+        )
+        for name, (seconds, peak) in results.items()
+    }
+
+
+def compare(results, baseline, tolerance: float) -> bool:
+    """Prints the stages which regressed against the baseline, true if none did"""
+    passed = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for key in ["seconds", "peak_mb"]:
+            ratio = result[key] / max(baseline[name][key], 1e-9)
+            if ratio > 1 + tolerance:
+                print(f"REGRESSION {name} {key}: {baseline[name][key]:.3f} -> {result[key]:.3f}")
+                passed = False
+    return passed
+
+
+def main():
+    """Prints the throughput and peak memory of every stage"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, default=20)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--freq", default="10Min")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--save", help="JSON file to save the results to")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        file_paths = write_synthetic_gsp_csvs(
+            folder, number_of_gsps=args.number_of_gsps, years=args.years, freq=args.freq
+        )
+        print(
+            f"{len(file_paths)} GSPs, {args.years} years, "
+            f"{sum(os.path.getsize(x) for x in file_paths) / 1e6:.1f} MB of csv"
+        )
+
+        # The best of the repeats, per stage
+        runs = [run_stages(folder, file_paths) for _ in range(args.repeats)]
+        results = {
+            name: min((x[name] for x in runs), key=lambda x: x["seconds"]) for name in runs[0]
+        }
+
+    print(f"{'stage':>26} {'seconds':>9} {'peak MB':>9} {'rows/s':>12} {'MB/s':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:>26} {result['seconds']:>9.3f} {result['peak_mb']:>9.1f} "
+            f"{result['rows_per_second']:>12,.0f} {result['mb_per_second']:>8.1f}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(dict(vars(args), results=results), results_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
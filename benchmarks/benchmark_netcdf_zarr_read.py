@@ -0,0 +1,87 @@
+"""Benchmark of single GSP and single day reads from the NetCDF and Zarr layouts
+
+Usage:
+    python benchmarks/benchmark_netcdf_zarr_read.py --number-of-gsps 100 --days 365
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import xarray as xr
+from synthetic_gsp_data import make_gsp_dataset
+
+from ukpn.load import convert_xarray_to_netcdf, convert_xarray_to_zarr
+
+
+def time_read(open_function, selection, repeats: int):
+    """Median latencies of opening the store and loading a selection, and of loading only"""
+    open_latencies, read_latencies = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with open_function() as dataset:
+            opened = time.perf_counter()
+            dataset.power.isel(**selection).values
+            end = time.perf_counter()
+        open_latencies.append(end - start)
+        read_latencies.append(end - opened)
+    return float(np.median(open_latencies)), float(np.median(read_latencies))
+
+
+def main():
+    """Writes both layouts and prints the read latencies"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--chunk-time", type=int, default=4320)
+    parser.add_argument("--chunk-gsp", type=int, default=8)
+    parser.add_argument("--compressor", default="zstd")
+    args = parser.parse_args()
+
+    dataset = make_gsp_dataset(args.number_of_gsps, args.days)
+
+    with tempfile.TemporaryDirectory() as folder:
+        convert_xarray_to_netcdf(dataset, folder_to_save=folder, file_name="gsp.nc")
+        convert_xarray_to_zarr(
+            dataset,
+            folder_to_save=folder,
+            file_name="gsp.zarr",
+            chunks={"time_utc": args.chunk_time, "gsp_id": args.chunk_gsp},
+            compressor=args.compressor,
+        )
+        netcdf_path = os.path.join(folder, "gsp.nc")
+        zarr_path = os.path.join(folder, "gsp.zarr")
+        netcdf_mb = os.path.getsize(netcdf_path) / 1e6
+        zarr_mb = (
+            sum(
+                os.path.getsize(os.path.join(root, x))
+                for root, _, files in os.walk(zarr_path)
+                for x in files
+            )
+            / 1e6
+        )
+
+        layouts = {
+            "NetCDF": lambda: xr.open_dataset(netcdf_path, engine="h5netcdf"),
+            "Zarr": lambda: xr.open_zarr(zarr_path, consolidated=True),
+        }
+        selections = {
+            "single GSP": dict(gsp_id=args.number_of_gsps // 2),
+            "single day": dict(time_utc=slice(144 * (args.days // 2), 144 * (args.days // 2 + 1))),
+        }
+
+        print(f"{args.number_of_gsps} GSPs, {args.days} days")
+        print(f"NetCDF {netcdf_mb:.1f} MB, Zarr {zarr_mb:.1f} MB")
+        for selection_name, selection in selections.items():
+            for layout_name, open_function in layouts.items():
+                total, read = time_read(open_function, selection, args.repeats)
+                print(
+                    f"{selection_name:>11} {layout_name:>7}: {total * 1e3:8.2f} ms open and read, "
+                    f"{read * 1e3:8.2f} ms read"
+                )
+
+
+if __name__ == "__main__":
+    main()
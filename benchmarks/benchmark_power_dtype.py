@@ -0,0 +1,59 @@
+"""Memory and file sizes of the GSP power array in every dtype of POWER_DTYPES
+
+Usage:
+    python benchmarks/benchmark_power_dtype.py --number-of-gsps 100 --days 1095
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import xarray as xr
+from synthetic_gsp_data import make_gsp_dataset
+
+from ukpn.load import POWER_DTYPES, convert_xarray_to_netcdf, convert_xarray_to_zarr
+
+
+def get_size_mb(path: str) -> float:
+    """Size of a file or of every file in a folder in MB"""
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return (
+        sum(os.path.getsize(os.path.join(r, x)) for r, _, files in os.walk(path) for x in files)
+        / 1e6
+    )
+
+
+def main():
+    """Writes the dataset in every dtype and prints the sizes and the largest error"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number-of-gsps", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1095)
+    args = parser.parse_args()
+
+    dataset = make_gsp_dataset(args.number_of_gsps, args.days, nan_fraction=0.05)
+    print(f"{args.number_of_gsps} GSPs, {args.days} days")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for dtype, memory_dtype in POWER_DTYPES.items():
+            compact = dataset.astype(memory_dtype)
+            convert_xarray_to_netcdf(
+                compact, folder_to_save=folder, file_name=f"{dtype}.nc", dtype=dtype
+            )
+            convert_xarray_to_zarr(
+                compact, folder_to_save=folder, file_name=f"{dtype}.zarr", dtype=dtype
+            )
+
+            with xr.open_dataset(os.path.join(folder, f"{dtype}.nc"), engine="h5netcdf") as stored:
+                max_error = float(np.nanmax(np.abs(stored.power.values - dataset.power.values)))
+
+            print(
+                f"{dtype:>8}: {compact.power.nbytes / 1e6:8.1f} MB in memory, "
+                f"NetCDF {get_size_mb(os.path.join(folder, f'{dtype}.nc')):8.1f} MB, "
+                f"Zarr {get_size_mb(os.path.join(folder, f'{dtype}.zarr')):8.1f} MB, "
+                f"max error {max_error:.2e} MW"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Synthetic GSP data of every benchmark, as csv files, dataframes and datasets
+
+The csv files have the byte order mark and the quoted "Time","Solar" header of the
+UKPN files, local datetimes and the defects of the real data: repeated and skipped
+hours at the DST transitions, duplicate rows, negative values and string-valued cells.
+The pre-processed dataframes and the aligned datasets hold the same solar power.
+
+Usage:
+    python benchmarks/synthetic_gsp_data.py /tmp/gsp_data --number-of-gsps 20 --years 3
+"""
+import argparse
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+UKPN_CSV_HEADER = '\ufeff"Time","Solar"\n'
+
+# String values found in the power column of the UKPN files
+STRING_VALUES = ["", "n/a", "Bad Data", "#VALUE!"]
+
+
+def get_daily_cycle(datetimes: pd.DatetimeIndex) -> np.ndarray:
+    """Clear sky like daily cycle between 0 at night and 1 at noon"""
+    hours = datetimes.hour.to_numpy() + datetimes.minute.to_numpy() / 60
+    return np.clip(np.sin((hours - 6) * np.pi / 12), 0, None)
+
+
+def make_power_array(
+    datetimes: pd.DatetimeIndex, number_of_gsps: int, nan_fraction: float = 0.0, seed: int = 0
+) -> np.ndarray:
+    """Synthetic (time_utc, gsp_id) solar power in MW, in kW resolution
+
+    Args:
+        datetimes: Datetimes of the rows
+        number_of_gsps: Number of GSP columns
+        nan_fraction: Fraction of the values which are NaN's
+        seed: Seed of the random values
+    """
+    rng = np.random.default_rng(seed)
+    capacity = rng.uniform(10, 300, number_of_gsps)
+    clouds = rng.uniform(0.5, 1, (len(datetimes), number_of_gsps))
+    power = np.round(get_daily_cycle(datetimes)[:, None] * capacity * clouds, 3)
+    power[rng.random(power.shape) < nan_fraction] = np.nan
+    return power
+
+
+def make_gsp_dataset(
+    number_of_gsps: int,
+    days: int,
+    freq: str = "10Min",
+    nan_fraction: float = 0.0,
+    seed: int = 0,
+) -> xr.Dataset:
+    """Synthetic aligned GSP dataset, like the one of OpenGSPData
+
+    Args:
+        number_of_gsps: Number of GSPs
+        days: Length of the time series in days
+        freq: Frequency of the datetimes
+        nan_fraction: Fraction of the values which are NaN's
+        seed: Seed of the random values
+    """
+    time_utc = pd.date_range(
+        "2021-01-01", periods=int(pd.Timedelta(days=days) / pd.Timedelta(freq)), freq=freq
+    )
+    power = make_power_array(time_utc, number_of_gsps, nan_fraction=nan_fraction, seed=seed)
+    return xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], power)),
+        coords=dict(time_utc=time_utc.values, gsp_id=[f"gsp_{i}" for i in range(number_of_gsps)]),
+    )
+
+
+def make_gsp_frames(
+    number_of_gsps: int,
+    days: float,
+    freq: str = "10Min",
+    start: str = "2021-01-01",
+    tz: Optional[str] = None,
+    ragged: bool = False,
+    seed: int = 0,
+) -> Dict[str, pd.DataFrame]:
+    """Synthetic single column GSP dataframes indexed by time_utc, keyed by GSP name
+
+    Args:
+        number_of_gsps: Number of GSPs
+        days: Length of the time series in days
+        freq: Frequency of the datetimes
+        start: First datetime
+        tz: Time zone of the datetimes, naive if None
+        ragged: If true, every GSP starts and ends at different datetimes, trimmed by
+            up to a tenth of the time series, like pre-processed files of different ranges
+        seed: Seed of the random values
+    """
+    rng = np.random.default_rng(seed)
+    periods = int(pd.Timedelta(days=days) / pd.Timedelta(freq))
+    datetimes = pd.date_range(start, periods=periods, freq=freq, tz=tz, name="time_utc")
+    power = make_power_array(datetimes, number_of_gsps, seed=seed)
+
+    gsp_data_in_dict = {}
+    for i in range(number_of_gsps):
+        offset, trim = rng.integers(0, periods // 10, size=2) if ragged else (0, 0)
+        rows = slice(offset, periods - trim)
+        gsp_data_in_dict[f"gsp_{i}"] = pd.DataFrame(
+            {f"gsp_{i}": power[rows, i]}, index=datetimes[rows]
+        )
+    return gsp_data_in_dict
+
+
+def make_gsp_frame(
+    years: float,
+    freq: str = "10Min",
+    start: str = "2019-01-01",
+    dst_transitions: bool = True,
+    duplicate_fraction: float = 0.001,
+    negative_fraction: float = 0.001,
+    string_fraction: float = 0.0005,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Synthetic solar power of a GSP with the columns of the UKPN files
+
+    Args:
+        years: Length of the time series in years
+        freq: Frequency of the datetimes
+        start: First local datetime
+        dst_transitions: If true, the datetimes are the Europe/London wall clock, so
+            the spring hour is missing and the autumn hour is repeated, otherwise they
+            are a regular range
+        duplicate_fraction: Fraction of the rows written twice
+        negative_fraction: Fraction of the values which are small negative numbers
+        string_fraction: Fraction of the values replaced with strings
+        seed: Seed of the random values
+    """
+    rng = np.random.default_rng(seed)
+    periods = int(years * 365 * pd.Timedelta("1D") / pd.Timedelta(freq))
+    if dst_transitions:
+        datetimes = pd.date_range(start, periods=periods, freq=freq, tz="UTC")
+        datetimes = datetimes.tz_convert("Europe/London").tz_localize(None)
+    else:
+        datetimes = pd.date_range(start, periods=periods, freq=freq)
+
+    # A clear sky like daily cycle with random clouds, in MW
+    values = get_daily_cycle(datetimes) * rng.uniform(10, 60) * rng.uniform(0.3, 1, periods)
+
+    negative = rng.random(periods) < negative_fraction
+    values[negative] = -rng.uniform(0, 0.5, negative.sum())
+    values = np.round(values, 3)
+
+    if duplicate_fraction > 0:
+        rows = np.arange(periods)
+        duplicates = rows[rng.random(periods) < duplicate_fraction]
+        rows = np.sort(np.concatenate([rows, duplicates]))
+        datetimes, values = datetimes[rows], values[rows]
+
+    data_frame = pd.DataFrame({"Time": datetimes.strftime("%Y-%m-%d %H:%M:%S"), "Solar": values})
+    strings = rng.random(len(data_frame)) < string_fraction
+    if strings.any():
+        data_frame["Solar"] = data_frame["Solar"].astype(object)
+        data_frame.loc[strings, "Solar"] = rng.choice(STRING_VALUES, strings.sum())
+    return data_frame
+
+
+def write_synthetic_gsp_csvs(
+    folder_to_save: str, number_of_gsps: int = 10, years: float = 1, **frame_kwargs
+) -> List[str]:
+    """Writes a UKPN formatted csv file for every synthetic GSP
+
+    Args:
+        folder_to_save: Folder of the csv files, created if needed
+        number_of_gsps: Number of GSP files
+        years: Length of every time series in years
+        frame_kwargs: Keyword arguments of `make_gsp_frame`, except the seed
+
+    Returns:
+        The paths of the files
+    """
+    os.makedirs(folder_to_save, exist_ok=True)
+    file_paths = []
+    for i in range(number_of_gsps):
+        file_path = os.path.join(folder_to_save, f"gsp_{i:04d}.csv")
+        data_frame = make_gsp_frame(years=years, seed=i, **frame_kwargs)
+        with open(file_path, "w", encoding="utf-8", newline="") as csv_file:
+            csv_file.write(UKPN_CSV_HEADER)
+            data_frame.to_csv(csv_file, header=False, index=False)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def main():
+    """Writes the synthetic files into a folder"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder")
+    parser.add_argument("--number-of-gsps", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--freq", default="10Min")
+    parser.add_argument("--no-dst-transitions", action="store_true")
+    parser.add_argument("--duplicate-fraction", type=float, default=0.001)
+    parser.add_argument("--negative-fraction", type=float, default=0.001)
+    parser.add_argument("--string-fraction", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    file_paths = write_synthetic_gsp_csvs(
+        args.folder,
+        number_of_gsps=args.number_of_gsps,
+        years=args.years,
+        freq=args.freq,
+        dst_transitions=not args.no_dst_transitions,
+        duplicate_fraction=args.duplicate_fraction,
+        negative_fraction=args.negative_fraction,
+        string_fraction=args.string_fraction,
+    )
+    size = sum(os.path.getsize(x) for x in file_paths) / 1e6
+    print(f"{len(file_paths)} files, {size:.1f} MB written to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import logging
 
 from ukpn import DownloadGrafanaData, main_panel, open_webpage
+from ukpn.grafana.grafana import match_dashboard_gsp_name
 
 logger_webdriver = logging.getLogger("selenium.webdriver.remote.remote_connection")
 logger_webdriver.setLevel(logging.WARNING)
@@ -44,3 +45,11 @@ def test_automatic_download_solar_gsp():
     status = next(iter(data))
     # If True, data is present and downloaded
     assert all(element == status[0] for element in status) == True
+
+
+def test_match_dashboard_gsp_name():
+    """Testing that file and register names select the dashboard names"""
+    dashboard_names = ["SELLINDGE", "CANTERBURY NORTH", "CANTERBURY SOUTH"]
+    assert match_dashboard_gsp_name("sellindge", dashboard_names) == "SELLINDGE"
+    assert match_dashboard_gsp_name("CANTERBURY NORTH 132kV", dashboard_names) == "CANTERBURY NORTH"
+    assert match_dashboard_gsp_name("CANTERBURY", dashboard_names) == "CANTERBURY"
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stand-in of the UKPN api, failing some paths before answering
+
+    The responses are tagged with the etag of the server, if any, and a request
+    with the same etag is answered with a 304. If the server has a register, its
+    records are served by pages on /search/ and as a json array in small writes on
+    /download/.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failures = server.failures.get(self.path, [])
+            status = failures.pop(0) if failures else None
+        try:
+            time.sleep(0.02)
+            if self.path == "/missing":
+                self.send_error(404)
+            elif status is not None:
+                self.send_response(status)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+            elif server.etag is not None and self.headers.get("If-None-Match") == server.etag:
+                self.send_response(304)
+                self.end_headers()
+            elif server.register is not None and self.path.startswith(("/search/", "/download/")):
+                self.send_register()
+            else:
+                body = json.dumps({"path": self.path, "version": server.etag}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if server.etag is not None:
+                    self.send_header("ETag", server.etag)
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    do_HEAD = do_GET
+
+    def send_register(self):
+        """Serves the refined records of the register, by page or all at once"""
+        query = dict(parse_qsl(urlsplit(self.path).query))
+        records = [
+            x
+            for x in self.server.register
+            if all(
+                x["fields"][k[len("refine.") :]] == v
+                for k, v in query.items()
+                if k[:7] == "refine."
+            )
+        ]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        if self.path.startswith("/search/"):
+            start, rows = int(query.get("start", 0)), int(query["rows"])
+            names = sorted({x["fields"]["grid_supply_point"] for x in records})
+            facets = [dict(name="grid_supply_point", facets=[dict(name=x) for x in names])]
+            page = dict(
+                nhits=len(records), records=records[start : start + rows], facet_groups=facets
+            )
+            self.wfile.write(json.dumps(page).encode())
+        else:
+            body = json.dumps(records).encode()
+            for i in range(0, len(body), 1000):
+                self.wfile.write(body[i : i + 1000])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Serves the stand-in api from a thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.failures = {}
+    server.etag = None
+    server.register = None
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,37 @@
+import numpy as np
+import torch
+
+from ukpn.load import BatchGSPWindows, OpenGSPData, SampleGSPWindows, collate_gsp_windows
+
+
+def test_batch_gsp_windows():
+    """Testing that the batches hold the same windows as the single window sampler"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+    dataset = dataset.isel(time_utc=slice(0, 20000))
+    sample_kwargs = dict(history_length=12, forecast_length=6, max_nans=3, shuffle=True, seed=0)
+
+    windows = list(SampleGSPWindows([dataset], **sample_kwargs))
+    batches = list(BatchGSPWindows([dataset], batch_size=100, fill_value=-1.0, **sample_kwargs))
+
+    assert [len(x["t0"]) for x in batches[:-1]] == [100] * (len(batches) - 1)
+    assert sum(len(x["t0"]) for x in batches) == len(windows)
+
+    power = torch.cat([x["power"] for x in batches])
+    mask = torch.cat([x["mask"] for x in batches])
+    assert power.dtype == torch.float32 and power.is_contiguous()
+    assert power.shape == (len(windows), 18)
+
+    expected = np.stack([x["power"] for x in windows]).astype(np.float32)
+    np.testing.assert_array_equal(mask.numpy(), ~np.isnan(expected))
+    np.testing.assert_array_equal(power.numpy(), np.nan_to_num(expected, nan=-1.0))
+    np.testing.assert_array_equal(
+        np.concatenate([x["gsp_id"] for x in batches]), [x["gsp_id"] for x in windows]
+    )
+
+    # Collating the single windows gives the same batch
+    collated = collate_gsp_windows(windows[:100], fill_value=-1.0)
+    for key in ["power", "mask", "t0"]:
+        torch.testing.assert_close(collated[key], batches[0][key])
+
+    dropped = list(BatchGSPWindows([dataset], batch_size=100, drop_last=True, **sample_kwargs))
+    assert len(dropped) == len(windows) // 100
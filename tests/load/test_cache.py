@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import pandas as pd
+
+import ukpn.load.power_data.utils
+from ukpn.load import evict_from_cache, get_gsp_data_in_dict
+
+
+def test_warm_run_skips_csv_parsing(tmp_path, monkeypatch):
+    """Testing that a warm cache gives the same dataframes without parsing the csv files"""
+    cache_dir = str(tmp_path / "cache")
+    preprocess_kwargs = dict(freq="10Min")
+    cold = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=preprocess_kwargs, cache_dir=cache_dir
+    )
+    assert len(os.listdir(cache_dir)) == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The csv file should not be parsed")
+
+    monkeypatch.setattr(ukpn.load.power_data.utils, "load_csv_to_pandas", fail)
+    warm = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=preprocess_kwargs, cache_dir=cache_dir
+    )
+    for gsp_name, data_frame in cold.items():
+        pd.testing.assert_frame_equal(warm[gsp_name], data_frame)
+        assert warm[gsp_name].index.freq == data_frame.index.freq
+
+
+def test_cache_eviction(tmp_path):
+    """Testing that the least recently used entries are evicted"""
+    cache_dir = str(tmp_path / "cache")
+    get_gsp_data_in_dict(folder_destination="tests/data", cache_dir=cache_dir)
+    sizes = {x: os.path.getsize(os.path.join(cache_dir, x)) for x in os.listdir(cache_dir)}
+
+    # Making the first entry the oldest one
+    oldest = sorted(sizes)[0]
+    os.utime(os.path.join(cache_dir, oldest), (0, 0))
+
+    assert evict_from_cache(cache_dir=cache_dir, max_cache_bytes=sum(sizes.values()) - 1) == 1
+    assert os.listdir(cache_dir) == [x for x in sizes if x != oldest]
+
+
+def test_cache_of_renamed_files(tmp_path):
+    """Testing that files with the same content are cached under their own names"""
+    cache_dir = str(tmp_path / "cache")
+    folder = tmp_path / "gsp"
+    folder.mkdir()
+    shutil.copy("tests/data/richborough.csv", folder / "richborough.csv")
+    get_gsp_data_in_dict(folder_destination=str(folder), cache_dir=cache_dir)
+
+    os.rename(folder / "richborough.csv", folder / "gsp_a.csv")
+    shutil.copy(folder / "gsp_a.csv", folder / "gsp_b.csv")
+    data_in_dict = get_gsp_data_in_dict(folder_destination=str(folder), cache_dir=cache_dir)
+
+    assert {x: list(y.columns) for x, y in data_in_dict.items()} == dict(
+        gsp_a=["gsp_a"], gsp_b=["gsp_b"]
+    )
+    assert len(os.listdir(cache_dir)) == 3
@@ -0,0 +1,43 @@
+import pytest
+
+from ukpn.load import UKPNApiClient, get_metadata_from_ukpn_api
+
+
+def test_client_retries(server):
+    """Testing the retries of the failed responses and the single GET per request"""
+    url = f"http://127.0.0.1:{server.server_port}"
+    server.failures = {"/flaky": [503, 429], "/down": [500] * 10}
+
+    with UKPNApiClient(max_retries=2, backoff_factor=0.001) as client:
+        assert client.get_json(f"{url}/flaky") == {"path": "/flaky", "version": None}
+        assert client.get_json(f"{url}/down") is None
+        assert client.get_json(f"{url}/missing") is None
+
+        assert get_metadata_from_ukpn_api(f"{url}/ok", client=client) == {
+            "path": "/ok",
+            "version": None,
+        }
+
+    assert [x for x in server.requests if x[1] == "/flaky"] == [("GET", "/flaky")] * 3
+    assert len([x for x in server.requests if x[1] == "/down"]) == 3
+    assert len([x for x in server.requests if x[1] == "/missing"]) == 1
+    assert all(method == "GET" for method, _ in server.requests)
+
+    # Connection errors are retried and then reported as unsuccessful
+    with UKPNApiClient(max_retries=1, backoff_factor=0.001, timeout=1) as client:
+        assert client.get_json("http://127.0.0.1:1/closed") is None
+
+
+def test_client_concurrency(server):
+    """Testing that the urls are requested concurrently, in order and bounded"""
+    url = f"http://127.0.0.1:{server.server_port}"
+    api_urls = [f"{url}/gsp_{i}" for i in range(24)]
+
+    with UKPNApiClient(max_workers=4) as client:
+        responses = client.get_many_json(api_urls)
+
+    assert responses == [{"path": f"/gsp_{i}", "version": None} for i in range(24)]
+    assert 1 < server.max_in_flight <= 4
+
+    with pytest.raises(ValueError):
+        UKPNApiClient(max_workers=0)
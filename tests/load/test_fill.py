@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from ukpn.load import AddGapIndex, FillGSPGaps, fill_gsp_gaps, get_filled_power
+
+
+def make_dataset():
+    """Two GSPs with gaps of one, two and four intervals"""
+    power = np.tile(np.arange(12, dtype=np.float64)[:, None], (1, 2))
+    power[[0, 3, 6, 7], 0] = np.nan
+    power[[2, 3, 4, 5], 1] = np.nan
+    return xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], power)),
+        coords=dict(
+            time_utc=pd.date_range("2021-06-01", periods=12, freq="10Min"),
+            gsp_id=["gsp_a", "gsp_b"],
+        ),
+    )
+
+
+def test_linear_gap_filling():
+    """Testing that only the bounded gaps up to the maximum length are filled"""
+    filled = next(iter(FillGSPGaps([make_dataset()], max_gap_length="20Min")))
+
+    power = filled.power.values
+    np.testing.assert_array_equal(power[1:, 0], np.arange(1, 12))
+    assert np.isnan(power[0, 0])
+    assert np.isnan(power[2:6, 1]).all()
+    np.testing.assert_array_equal(np.nonzero(filled.imputed.values[:, 0])[0], [3, 6, 7])
+    assert not filled.imputed.values[:, 1].any()
+
+    # The policies are per GSP
+    filled = fill_gsp_gaps(make_dataset(), max_gap_length={"gsp_b": 4})
+    assert np.isnan(filled.power.values[3, 0])
+    np.testing.assert_array_equal(filled.power.values[:, 1], np.arange(12))
+
+
+def test_gap_filling_with_gap_index():
+    """Testing that the filled gaps are removed from the gap index"""
+    dataset = next(iter(AddGapIndex([make_dataset()])))
+    filled = fill_gsp_gaps(dataset, max_gap_length=2)
+
+    np.testing.assert_array_equal(filled.gap_start.values, [0, 2])
+    np.testing.assert_array_equal(filled.gap_length.values, [1, 4])
+    np.testing.assert_array_equal(filled.gsp_gap_count.values, [1, 1])
+    xr.testing.assert_equal(filled.power, fill_gsp_gaps(make_dataset(), max_gap_length=2).power)
+
+
+def test_clear_sky_gap_filling():
+    """Testing that the clear sky method follows the shape of the clear sky profile"""
+    clear_sky = np.array([0, 0, 100, 200, 400, 800, 400, 200, 100, 0, 0, 0], dtype=np.float64)
+    power = (clear_sky / 2)[:, None].repeat(2, axis=1)
+    power[3:7, 0] = np.nan
+    power[9, 1] = np.nan
+
+    filled, imputed, filled_runs = get_filled_power(
+        power, max_gap_length=4, method="clear_sky", clear_sky=clear_sky
+    )
+    np.testing.assert_allclose(filled[3:7, 0], clear_sky[3:7] / 2)
+    assert filled_runs.all()
+
+    # At night there is no ratio on either side and the gap is filled linearly
+    assert filled[9, 1] == 0
+    assert imputed.sum() == 5
+
+    with pytest.raises(ValueError):
+        get_filled_power(power, max_gap_length=4, method="clear_sky")
+    with pytest.raises(ValueError):
+        FillGSPGaps([make_dataset()], max_gap_length=4, method="clear_sky")
+
+
+def test_per_gsp_clear_sky_filling(monkeypatch):
+    """Testing that only the clear sky GSPs need coordinates and a clear sky profile"""
+    requested = []
+
+    def get_profile(time_utc, gsp_coordinates):
+        requested.extend(gsp_coordinates)
+        return np.full((len(time_utc), len(gsp_coordinates)), 100.0)
+
+    monkeypatch.setattr("ukpn.load.power_data.fill.get_clear_sky_profile", get_profile)
+    filled = next(
+        iter(
+            FillGSPGaps(
+                [make_dataset()],
+                max_gap_length={"gsp_a": 2, "gsp_b": 4},
+                method={"gsp_a": "clear_sky"},
+                gsp_coordinates={"gsp_a": [1.0, 51.0]},
+            )
+        )
+    )
+    assert requested == [[1.0, 51.0]]
+    np.testing.assert_allclose(filled.power.values[[3, 6, 7], 0], [3, 6, 7])
+    np.testing.assert_array_equal(filled.power.values[:, 1], np.arange(12))
+
+    with pytest.raises(ValueError):
+        next(
+            iter(
+                FillGSPGaps(
+                    [make_dataset()],
+                    max_gap_length=2,
+                    method={"gsp_b": "clear_sky"},
+                    gsp_coordinates={"gsp_a": [1.0, 51.0]},
+                )
+            )
+        )
+
+
+def test_zero_max_gap_length():
+    """Testing that a maximum length of zero leaves the gaps of a GSP unfilled"""
+    filled = fill_gsp_gaps(make_dataset(), max_gap_length={"gsp_a": 0, "gsp_b": "40Min"})
+    assert not filled.imputed.values[:, 0].any()
+    assert filled.imputed.values[:, 1].sum() == 4
+
+    assert not fill_gsp_gaps(make_dataset(), max_gap_length=0).imputed.values.any()
+    with pytest.raises(ValueError):
+        fill_gsp_gaps(make_dataset(), max_gap_length=-1)
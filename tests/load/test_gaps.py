@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from ukpn.load import (
+    AddGapIndex,
+    OpenGSPData,
+    fill_gsp_gaps,
+    get_complete_windows,
+    get_coverage,
+    get_gap_runs,
+    get_longest_gap,
+    get_valid_window_index,
+)
+
+
+def make_dataset():
+    """Two GSPs of 20 intervals, the second without gaps"""
+    power = np.ones((20, 2))
+    power[[0, 1, 5, 6, 7, 19], 0] = np.nan
+    return xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], power)),
+        coords=dict(
+            time_utc=pd.date_range("2021-06-01", periods=20, freq="10Min"),
+            gsp_id=["gsp_a", "gsp_b"],
+        ),
+    )
+
+
+def test_gap_index_queries():
+    """Testing the queries against the known gaps, without the power array"""
+    dataset = next(iter(AddGapIndex([make_dataset()]))).drop_vars("power")
+    np.testing.assert_array_equal(dataset.gap_start.values, [0, 5, 19])
+    np.testing.assert_array_equal(dataset.gap_length.values, [2, 3, 1])
+    np.testing.assert_array_equal(dataset.gsp_gap_count.values, [3, 0])
+
+    assert get_longest_gap(dataset, "gsp_a") == dict(
+        start=pd.Timestamp("2021-06-01 00:50"), end=pd.Timestamp("2021-06-01 01:10"), length=3
+    )
+    assert get_longest_gap(dataset, "gsp_b") is None
+
+    assert get_coverage(dataset, "gsp_a") == pytest.approx(14 / 20)
+    assert get_coverage(dataset, "gsp_a", "2021-06-01 00:40", "2021-06-01 01:20") == 0.4
+    assert get_coverage(dataset, "gsp_b", "2021-06-01 00:40", "2021-06-01 01:20") == 1
+    assert np.isnan(get_coverage(dataset, "gsp_a", "2022-01-01", "2022-01-02"))
+
+    windows = get_complete_windows(dataset, "gsp_a", length="30Min")
+    assert windows.start.tolist() == [
+        pd.Timestamp("2021-06-01 00:20"),
+        pd.Timestamp("2021-06-01 01:20"),
+    ]
+    assert windows.windows.tolist() == [1, 9]
+
+    windows = get_complete_windows(dataset, "gsp_a", length=2, end="2021-06-01 00:40")
+    assert windows.end.tolist() == [pd.Timestamp("2021-06-01 00:40")]
+    assert windows.windows.tolist() == [2]
+
+    with pytest.raises(ValueError):
+        get_complete_windows(dataset, "gsp_a", length="15Min")
+    with pytest.raises(ValueError):
+        get_longest_gap(make_dataset(), "gsp_a")
+
+
+def test_gap_index_after_selection():
+    """Testing that the index follows a selection of GSPs and rejects one of datetimes"""
+    dataset = make_dataset()
+    dataset.power[[12, 13], 1] = np.nan
+    dataset = next(iter(AddGapIndex([dataset])))
+
+    subset = dataset.sel(gsp_id=["gsp_b"])
+    assert get_longest_gap(subset, "gsp_b") == dict(
+        start=pd.Timestamp("2021-06-01 02:00"), end=pd.Timestamp("2021-06-01 02:10"), length=2
+    )
+    reordered = dataset.sel(gsp_id=["gsp_b", "gsp_a"])
+    assert get_coverage(reordered, "gsp_a") == get_coverage(dataset, "gsp_a")
+    assert get_coverage(reordered, "gsp_b") == 0.9
+
+    # Filling a subset only removes the filled gaps of its GSPs from the index
+    filled = fill_gsp_gaps(subset, max_gap_length=2)
+    assert filled.imputed.values.sum() == 2
+    assert get_longest_gap(filled, "gsp_b") is None
+    np.testing.assert_array_equal(filled.gap_gsp_id.values, ["gsp_a"] * 3)
+
+    with pytest.raises(ValueError):
+        get_longest_gap(dataset.isel(time_utc=slice(5, None)), "gsp_a")
+    with pytest.raises(ValueError):
+        fill_gsp_gaps(dataset.isel(time_utc=slice(5, None)), max_gap_length=2)
+
+
+def test_gap_index_of_gsp_data():
+    """Testing the index of the test data against a scan of the power array"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data").add_gap_index()))
+    power = dataset.power.values
+
+    gsp_positions, starts, lengths = get_gap_runs(power)
+    assert lengths.sum() == np.isnan(power).sum()
+    for gsp_position, start, length in zip(gsp_positions, starts, lengths):
+        column = power[:, gsp_position]
+        assert np.isnan(column[start : start + length]).all()
+        assert start == 0 or not np.isnan(column[start - 1])
+        assert start + length == len(column) or not np.isnan(column[start + length])
+
+    # The complete windows agree with the window index of the sampler
+    window_gsps, _ = get_valid_window_index(power, history_length=36, forecast_length=12)
+    for i, gsp_id in enumerate(dataset.gsp_id.values):
+        windows = get_complete_windows(dataset, gsp_id, length=48)
+        assert windows.windows.sum() == (window_gsps == i).sum()
+        coverage = 1 - np.isnan(power[:, i]).mean()
+        assert get_coverage(dataset, gsp_id) == pytest.approx(coverage)
@@ -0,0 +1,42 @@
+from ukpn.load import GSPNameIndex, get_gsp_file_name, normalise_gsp_name
+
+REGISTER_NAMES = [
+    "CANTERBURY NORTH 132KV",
+    "CANTERBURY SOUTH 132KV",
+    "SELLINDGE 132KV",
+    "RICHBOROUGH 132KV",
+    "NORWICH MAIN 132kV",
+    "LODGE ROAD 33KV",
+]
+
+
+def test_normalise_gsp_name():
+    """Testing that case, separators and voltage suffixes are ignored"""
+    assert normalise_gsp_name("canterbury_north") == "CANTERBURY NORTH"
+    assert normalise_gsp_name("CANTERBURY NORTH 132kV") == "CANTERBURY NORTH"
+    assert normalise_gsp_name(" Lodge-Road  33KV ") == "LODGE ROAD"
+    assert normalise_gsp_name("132KV") == ""
+    assert get_gsp_file_name("Lodge Road") == "lodge_road"
+
+
+def test_gsp_name_lookup():
+    """Testing the exact, prefix and fuzzy lookups and their ranking"""
+    index = GSPNameIndex(REGISTER_NAMES)
+
+    assert index.lookup("canterbury_north") == [("CANTERBURY NORTH 132KV", 1.0, "exact")]
+    assert index.match("sellindge") == "SELLINDGE 132KV"
+    assert index.match("norwich") == "NORWICH MAIN 132kV"
+    assert index.match("lodge_road_grid") == "LODGE ROAD 33KV"
+    assert index.match("richborugh") == "RICHBOROUGH 132KV"
+    assert index.lookup("richborugh")[0].match == "fuzzy"
+    assert index.match("dungeness") is None
+
+    # Both canterbury GSPs match the leading word equally well
+    candidates = index.lookup("canterbury")
+    assert [x.name for x in candidates] == ["CANTERBURY NORTH 132KV", "CANTERBURY SOUTH 132KV"]
+    assert candidates[0].score == candidates[1].score
+    assert index.match("canterbury") is None
+
+    matches, ambiguities = index.match_all(["canterbury", "sellindge", "dungeness"])
+    assert matches == {"sellindge": "SELLINDGE 132KV"}
+    assert list(ambiguities) == ["canterbury"]
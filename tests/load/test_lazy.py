@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from ukpn.load import OpenGSPData, convert_xarray_to_zarr, open_gsp_data_lazy
+
+
+def test_lazy_dataset_matches_eager_dataset():
+    """Testing that the dask backed dataset computes to the in memory dataset"""
+    eager = next(iter(OpenGSPData(folder_destination="tests/data")))
+    lazy = open_gsp_data_lazy(folder_destination="tests/data", time_chunk=10000)
+
+    # Nothing has been computed yet
+    assert lazy.power.chunks is not None
+    assert lazy.power.data.chunksize == (10000, 1)
+
+    np.testing.assert_array_equal(lazy.time_utc.values, eager.time_utc.values)
+    np.testing.assert_array_equal(lazy.gsp_id.values, eager.gsp_id.values)
+    np.testing.assert_array_equal(lazy.power.values, eager.power.values)
+
+
+def test_write_lazy_dataset_to_zarr(tmp_path):
+    """Testing that the lazy dataset is written chunk by chunk to a Zarr store"""
+    lazy = next(iter(OpenGSPData(folder_destination="tests/data", lazy=True)))
+    convert_xarray_to_zarr(
+        xarray_dataset=lazy,
+        folder_to_save=str(tmp_path),
+        file_name="lazy.zarr",
+        chunks={"time_utc": 5000, "gsp_id": 2},
+    )
+
+    stored = xr.open_zarr(tmp_path / "lazy.zarr")
+    assert stored.power.encoding["chunks"] == (5000, 2)
+    np.testing.assert_array_equal(stored.power.values, lazy.power.values)
+
+
+def test_lazy_dataset_with_csv_schema(tmp_path):
+    """Testing that the time range is read with the position and format of the schema"""
+    with open("tests/data/richborough.csv") as csv_file:
+        lines = csv_file.readlines()[1:2000]
+    with open(tmp_path / "richborough.csv", "w") as csv_file:
+        csv_file.write("Id,Time,Solar\n")
+        for i, line in enumerate(lines):
+            local_datetime, value = line.strip().split(",")
+            local_datetime = pd.Timestamp(local_datetime).strftime("%d/%m/%Y %H:%M")
+            csv_file.write(f"{i},{local_datetime},{value}\n")
+    csv_schema = dict(datetime_format="%d/%m/%Y %H:%M", usecols=(1, 2))
+
+    eager = next(iter(OpenGSPData(folder_destination=str(tmp_path), csv_schema=csv_schema)))
+    lazy = open_gsp_data_lazy(folder_destination=str(tmp_path), csv_schema=csv_schema)
+    np.testing.assert_array_equal(lazy.time_utc.values, eager.time_utc.values)
+    np.testing.assert_array_equal(lazy.power.values, eager.power.values)
+
+
+def test_lazy_dataset_off_the_grid(tmp_path):
+    """Testing that files which do not fit the grid of the first and last rows fail"""
+    with open("tests/data/richborough.csv") as csv_file:
+        lines = csv_file.readlines()
+
+    # Rows which are not sorted by datetime
+    with open(tmp_path / "richborough.csv", "w") as csv_file:
+        csv_file.writelines([lines[0], lines[10], *lines[1:10], lines[11]])
+    lazy = open_gsp_data_lazy(folder_destination=str(tmp_path))
+    with pytest.raises(ValueError):
+        lazy.power.values
+
+    with open(tmp_path / "richborough.csv", "w") as csv_file:
+        csv_file.writelines([lines[0], lines[11], *lines[1:10]])
+    with pytest.raises(ValueError):
+        open_gsp_data_lazy(folder_destination=str(tmp_path))
+
+    # A file on a grid shifted by 5 minutes
+    with open(tmp_path / "richborough.csv", "w") as csv_file:
+        csv_file.writelines(lines[:100])
+    with open(tmp_path / "sellindge.csv", "w") as csv_file:
+        csv_file.write(lines[0])
+        for line in lines[1:100]:
+            local_datetime, value = line.strip().split(",")
+            local_datetime = pd.Timestamp(local_datetime) + pd.Timedelta("5Min")
+            csv_file.write(f"{local_datetime},{value}\n")
+    with pytest.raises(ValueError):
+        open_gsp_data_lazy(folder_destination=str(tmp_path))
@@ -0,0 +1,196 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from ukpn.load import (
+    OpenGSPData,
+    assemble_gsp_dataset,
+    get_file_status,
+    get_gsp_data_in_dict,
+    load_manifest,
+    merge_gsp_data_into_dataset,
+    save_manifest,
+)
+
+
+def write_rows(file_path, lines, mode="w"):
+    with open(file_path, mode) as csv_file:
+        csv_file.writelines(lines)
+
+
+def test_file_status(tmp_path):
+    """Testing new, unchanged, appended and changed files against the manifest"""
+    with open("tests/data/richborough.csv") as csv_file:
+        lines = csv_file.readlines()
+    file_path = str(tmp_path / "richborough.csv")
+
+    write_rows(file_path, lines[:1000])
+    record = get_file_status(file_path, None)
+    assert record["status"] == "new"
+
+    # Saving and loading the manifest
+    manifest_path = str(tmp_path / "manifest.json")
+    save_manifest({"richborough": record}, manifest_path)
+    record = load_manifest(manifest_path)["richborough"]
+    assert "status" not in record
+    assert get_file_status(file_path, record)["status"] == "unchanged"
+
+    # Only the appended rows are read
+    write_rows(file_path, lines[1000:1500], mode="a")
+    appended = get_file_status(file_path, record)
+    assert appended["status"] == "appended"
+    assert appended["byte_offset"] == record["size"]
+
+    tail = get_gsp_data_in_dict(
+        folder_destination=str(tmp_path),
+        file_paths=[file_path],
+        byte_offsets={file_path: appended["byte_offset"]},
+    )["richborough"]
+    assert len(tail) == 500
+
+    # Editing a previous row means reading the whole file again
+    write_rows(file_path, lines[:10] + ["2022-01-01 00:00:00,1.0\n"] + lines[11:1500])
+    os.utime(file_path, (0, 0))
+    assert get_file_status(file_path, record)["status"] == "changed"
+
+
+def test_merge_gsp_data_into_dataset():
+    """Testing merging an appended time range and a new GSP into a stored dataset"""
+    preprocess_kwargs = dict(freq="10Min")
+    gsp_data_in_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=preprocess_kwargs
+    )
+    expected = assemble_gsp_dataset(gsp_data_in_dict=gsp_data_in_dict)
+
+    # The stored dataset is missing sellindge and the last rows of richborough
+    richborough = gsp_data_in_dict["richborough"]
+    stored_dataset = assemble_gsp_dataset(gsp_data_in_dict={"richborough": richborough[:-1000]})
+
+    merged = merge_gsp_data_into_dataset(
+        stored_dataset=stored_dataset,
+        gsp_data_in_dict={
+            "richborough": richborough[-1100:],
+            "sellindge": gsp_data_in_dict["sellindge"],
+        },
+        freq="10Min",
+    )
+
+    np.testing.assert_array_equal(merged.time_utc.values, expected.time_utc.values)
+    np.testing.assert_array_equal(merged.gsp_id.values, expected.gsp_id.values)
+    np.testing.assert_array_equal(merged.power.values, expected.power.values)
+    assert pd.Index(merged.time_utc.values).is_monotonic_increasing
+
+
+def test_incremental_removed_gsp(tmp_path):
+    """Testing that a GSP file deleted from the folder is dropped from the stored dataset"""
+    folder = tmp_path / "gsp"
+    folder.mkdir()
+    for gsp_name in ["richborough", "sellindge"]:
+        shutil.copy(f"tests/data/{gsp_name}.csv", folder)
+    kwargs = dict(
+        folder_destination=str(folder),
+        folder_to_save=str(tmp_path),
+        file_name="ukpn_gsp.nc",
+        incremental=True,
+    )
+    dataset = next(iter(OpenGSPData(**kwargs)))
+    assert list(dataset.gsp_id.values) == ["richborough", "sellindge"]
+
+    os.remove(folder / "sellindge.csv")
+    updated = next(iter(OpenGSPData(**kwargs)))
+    assert list(updated.gsp_id.values) == ["richborough"]
+    np.testing.assert_array_equal(
+        updated.power.sel(gsp_id="richborough").dropna("time_utc").values,
+        dataset.power.sel(gsp_id="richborough").dropna("time_utc").values,
+    )
+    with xr.open_dataset(tmp_path / "ukpn_gsp.nc", engine="h5netcdf") as stored_dataset:
+        assert list(stored_dataset.gsp_id.values) == ["richborough"]
+    assert list(load_manifest(str(tmp_path / "ukpn_gsp.nc.manifest.json"))) == ["richborough"]
+
+    # The appended rows cannot infer the repeated autumn hour on their own
+    with pytest.raises(ValueError):
+        OpenGSPData(**kwargs, ambiguous="infer")
+
+
+def test_incremental_extra_variables(tmp_path):
+    """Testing that the stored variables besides the power survive an update"""
+    with open("tests/data/richborough.csv") as csv_file:
+        lines = csv_file.readlines()
+    folder = tmp_path / "gsp"
+    folder.mkdir()
+    write_rows(folder / "richborough.csv", lines[:1000])
+    kwargs = dict(
+        folder_destination=str(folder),
+        folder_to_save=str(tmp_path),
+        file_name="ukpn_gsp.nc",
+        incremental=True,
+    )
+    dataset = next(iter(OpenGSPData(**kwargs)))
+
+    # Storing per value and per GSP variables next to the power
+    file_path = tmp_path / "ukpn_gsp.nc"
+    dataset["quality_flags"] = xr.ones_like(dataset.power, dtype=np.uint8)
+    dataset["gsp_quality_flags"] = ("gsp_id", np.array([2], dtype=np.uint8))
+    dataset.to_netcdf(file_path, engine="h5netcdf")
+    os.utime(file_path)
+
+    write_rows(folder / "richborough.csv", lines[1000:1500], mode="a")
+    updated = next(iter(OpenGSPData(**kwargs)))
+    with xr.open_dataset(file_path, engine="h5netcdf") as stored_dataset:
+        stored_dataset = stored_dataset.load()
+
+    for merged in [updated, stored_dataset]:
+        quality_flags = merged.quality_flags.sel(gsp_id="richborough")
+        stored_times = quality_flags.time_utc.isin(dataset.time_utc.values)
+        np.testing.assert_array_equal(quality_flags[stored_times].values, 1)
+        assert quality_flags[~stored_times].isnull().all()
+        np.testing.assert_array_equal(merged.gsp_quality_flags.values, [2])
+
+
+@pytest.mark.parametrize("zarr_append", [False, True])
+def test_incremental_zarr_store(tmp_path, zarr_append):
+    """Testing that the Zarr store follows appended rows, edited rows and new GSPs"""
+    with open("tests/data/richborough.csv") as csv_file:
+        lines = csv_file.readlines()
+    folder = tmp_path / "gsp"
+    folder.mkdir()
+    write_rows(folder / "richborough.csv", lines[:1000])
+    kwargs = dict(
+        folder_destination=str(folder),
+        folder_to_save=str(tmp_path),
+        file_name="ukpn_gsp.nc",
+        incremental=True,
+        write_as_zarr=True,
+        zarr_append=zarr_append,
+    )
+
+    def check_store(dataset):
+        stored_dataset = xr.open_zarr(tmp_path / "ukpn_gsp.zarr", consolidated=True)
+        np.testing.assert_array_equal(stored_dataset.time_utc.values, dataset.time_utc.values)
+        np.testing.assert_array_equal(stored_dataset.gsp_id.values, dataset.gsp_id.values)
+        np.testing.assert_array_equal(stored_dataset.power.values, dataset.power.values)
+
+    check_store(next(iter(OpenGSPData(**kwargs))))
+
+    # Appended rows
+    write_rows(folder / "richborough.csv", lines[1000:1500], mode="a")
+    check_store(next(iter(OpenGSPData(**kwargs))))
+
+    # An edited row before the last stored datetime
+    write_rows(
+        folder / "richborough.csv", lines[:10] + ["2021-12-30 01:30:00,9.0\n"] + lines[11:1500]
+    )
+    os.utime(folder / "richborough.csv", (0, 0))
+    dataset = next(iter(OpenGSPData(**kwargs)))
+    assert dataset.power.sel(time_utc="2021-12-30 01:30").item() == 9.0
+    check_store(dataset)
+
+    # A new GSP
+    write_rows(folder / "sellindge.csv", lines[:500])
+    dataset = next(iter(OpenGSPData(**kwargs)))
+    assert list(dataset.gsp_id.values) == ["richborough", "sellindge"]
+    check_store(dataset)
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+import torch
+
+from ukpn.load import (
+    BatchGSPWindows,
+    CheckGSPQuality,
+    OpenGSPData,
+    OpenGSPMemmap,
+    open_memmap_cache,
+    save_memmap_cache,
+)
+
+
+def test_memmap_cache_round_trip(tmp_path):
+    """Testing that the cache maps the exported arrays back without copying them"""
+    dataset = next(iter(CheckGSPQuality(OpenGSPData(folder_destination="tests/data"))))
+    save_memmap_cache(dataset, folder_to_save=str(tmp_path), dtype=None)
+
+    with open(tmp_path / "header.json") as header_file:
+        header = json.load(header_file)
+    assert set(header["variables"]) == {"power", "quality_flags", "gsp_quality_flags"}
+    assert header["time_utc"]["length"] == dataset.sizes["time_utc"]
+
+    cached = open_memmap_cache(str(tmp_path))
+    np.testing.assert_array_equal(cached.time_utc.values, dataset.time_utc.values)
+    np.testing.assert_array_equal(cached.gsp_id.values, dataset.gsp_id.values)
+    for name in header["variables"]:
+        np.testing.assert_array_equal(cached[name].values, dataset[name].values)
+
+    # The arrays are read-only views of the files
+    assert not cached.power.values.flags.writeable
+    assert not cached.power.values.flags.owndata
+
+    # A cache without its header is incomplete
+    (tmp_path / "header.json").unlink()
+    with pytest.raises(FileNotFoundError):
+        open_memmap_cache(str(tmp_path))
+
+
+def test_batches_from_memmap_cache(tmp_path):
+    """Testing the batches served from the cache against the ones of the dataset"""
+    dataset = next(
+        iter(OpenGSPData(folder_destination="tests/data", memmap_folder=str(tmp_path / "cache")))
+    )
+    dataset = dataset.isel(time_utc=slice(0, 20000))
+    save_memmap_cache(dataset, folder_to_save=str(tmp_path / "subset"))
+
+    batch_kwargs = dict(history_length=12, forecast_length=6, batch_size=256, seed=0)
+    expected = list(BatchGSPWindows([dataset], **batch_kwargs))
+    batches = list(OpenGSPMemmap(str(tmp_path / "subset")).batch_gsp_windows(**batch_kwargs))
+
+    assert len(batches) == len(expected)
+    for batch, expected_batch in zip(batches, expected):
+        for key in ["power", "mask", "t0", "gsp_index"]:
+            torch.testing.assert_close(batch[key], expected_batch[key])
+
+    assert open_memmap_cache(str(tmp_path / "cache")).power.dtype == np.float32
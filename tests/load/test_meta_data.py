@@ -7,6 +7,7 @@ from ukpn.load import (
     construct_url,
     get_gsp_names,
     get_metadata_from_ukpn_api,
+    group_records_by_gsp,
 )
 
 
@@ -60,3 +61,66 @@ def test_get_gsp_names():
     # Testing to ge the gsp names
     gsp_names = get_gsp_names()
     assert gsp_names is not None
+
+
+def make_register():
+    """A small register in the format of the UKPN api"""
+    names = ["RICHBOROUGH 132KV", "SELLINDGE 132KV", "CANTERBURY NORTH 132KV"]
+    records = []
+    for i, name in enumerate(names * 4):
+        longitude, latitude = 1 + (i % 4) * 0.1, 51 + (i // 4) * 0.05 + (i % 4 in (1, 2)) * 0.1
+        records.append(
+            dict(
+                fields=dict(grid_supply_point=name, energy_conversion_technology_1="Photovoltaic"),
+                geometry=dict(type="Point", coordinates=[longitude, latitude]),
+            )
+        )
+    records.append(
+        dict(
+            fields=dict(grid_supply_point=names[0], energy_conversion_technology_1="Wind"),
+            geometry=dict(type="Point", coordinates=[5.0, 55.0]),
+        )
+    )
+    return dict(
+        nhits=len(records),
+        records=records,
+        facet_groups=[
+            dict(name="grid_supply_point", facets=[dict(name=x, count=5) for x in names])
+        ],
+    )
+
+
+def test_bulk_center_coordinates(monkeypatch):
+    """Testing that the single register request gives the centers of the per GSP requests"""
+    register = make_register()
+    requested_urls = []
+
+    def get_register_response(client, api_url):
+        """Filters the register like the refiners of the api"""
+        requested_urls.append(api_url)
+        refiners = dict(x.split("=") for x in api_url.split("&") if x.startswith("refine."))
+        records = [
+            x
+            for x in register["records"]
+            if all(
+                x["fields"][k[len("refine.") :]] == v.replace("+", " ") for k, v in refiners.items()
+            )
+        ]
+        return dict(register, nhits=len(records), records=records)
+
+    monkeypatch.setattr("ukpn.load.meta_data.client.UKPNApiClient.get_json", get_register_response)
+
+    per_gsp = next(iter(GetCenterCoordinatesGSP(folder_destination="tests/data", bulk=False)))
+    assert len(requested_urls) == 3
+    assert "&rows=0&" in requested_urls[0]
+
+    requested_urls.clear()
+    bulk = next(iter(GetCenterCoordinatesGSP(folder_destination="tests/data")))
+    assert len(requested_urls) == 1
+
+    assert set(bulk) == {"richborough", "sellindge"}
+    assert bulk == per_gsp
+
+    records_by_gsp = group_records_by_gsp(register)
+    assert len(records_by_gsp["RICHBOROUGH 132KV"]) == 4
+    assert len(group_records_by_gsp(register, technology=None)["RICHBOROUGH 132KV"]) == 5
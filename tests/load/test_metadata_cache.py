@@ -0,0 +1,80 @@
+from ukpn.load import (
+    MetadataCache,
+    UKPNApiClient,
+    construct_url,
+    get_default_client,
+    get_gsp_names,
+    set_default_client,
+)
+
+
+def test_cache_revalidation(server, tmp_path):
+    """Testing the fresh hits, the conditional revalidation and the counters"""
+    url = f"http://127.0.0.1:{server.server_port}/register"
+    server.etag = '"v1"'
+
+    cache = MetadataCache(str(tmp_path), ttl=3600)
+    client = UKPNApiClient(cache=cache)
+    assert client.get_json(url) == {"path": "/register", "version": '"v1"'}
+    assert client.get_json(url) == {"path": "/register", "version": '"v1"'}
+    assert len(server.requests) == 1
+    assert cache.stats == dict(hits=1, misses=1, revalidated=0, stale=0)
+
+    # An expired entry is revalidated with its etag
+    cache.ttl = 0
+    assert client.get_json(url) == {"path": "/register", "version": '"v1"'}
+    assert cache.stats["revalidated"] == 1
+
+    # A changed response replaces the entry
+    server.etag = '"v2"'
+    assert client.get_json(url) == {"path": "/register", "version": '"v2"'}
+    assert cache.get(url)["etag"] == '"v2"'
+    assert cache.stats["misses"] == 2
+
+    # The expired entry is served if the api fails
+    server.failures = {"/register": [500] * 10}
+    client.max_retries, client.backoff_factor = 1, 0.001
+    assert client.get_json(url) == {"path": "/register", "version": '"v2"'}
+    assert cache.stats["stale"] == 1
+
+
+def test_offline_cache(server, tmp_path):
+    """Testing a cold start without network from a populated cache"""
+    register = dict(
+        nhits=0,
+        records=[],
+        facet_groups=[dict(name="grid_supply_point", facets=[dict(name="SELLINDGE 132KV")])],
+    )
+    api_url = construct_url(get_complete_records=True, number_of_records="0")
+    MetadataCache(str(tmp_path)).put(api_url, data=register)
+
+    cache = MetadataCache(str(tmp_path), offline=True)
+    set_default_client(UKPNApiClient(cache=cache))
+    try:
+        assert get_gsp_names() == ["SELLINDGE 132KV"]
+        assert UKPNApiClient(cache=cache).get_json("http://127.0.0.1:1/not_cached") is None
+    finally:
+        set_default_client(None)
+
+    assert cache.stats == dict(hits=1, misses=1, revalidated=0, stale=0)
+    assert server.requests == []
+
+
+def test_default_client_of_forked_workers(tmp_path, monkeypatch):
+    """Testing that a forked process keeps the cache of the installed default client"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache = MetadataCache("~/ukpn_cache", offline=True)
+    assert cache.cache_dir == str(tmp_path / "ukpn_cache")
+
+    client = UKPNApiClient(max_retries=1, cache=cache)
+    set_default_client(client)
+    try:
+        # A forked worker has another process id
+        monkeypatch.setattr("ukpn.load.meta_data.client.os.getpid", lambda: -1)
+        worker_client = get_default_client()
+        assert worker_client is not client
+        assert worker_client.session is not client.session
+        assert worker_client.cache is cache and worker_client.max_retries == 1
+    finally:
+        set_default_client(None)
+    assert get_default_client().cache is None
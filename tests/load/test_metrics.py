@@ -0,0 +1,83 @@
+import json
+import logging
+
+import pytest
+
+from ukpn.load import OpenGSPData, PipelineMetrics, get_gsp_data_in_dict
+
+
+def write_csv(path, rows):
+    """Writes a UKPN formatted csv file"""
+    with open(path, "w", encoding="utf-8") as csv_file:
+        csv_file.write('\ufeff"Time","Solar"\n')
+        csv_file.writelines(f"{time},{value}\n" for time, value in rows)
+
+
+def test_metrics_of_gsp_stages(tmp_path):
+    """Testing the rows dropped and the bytes recorded for every stage of a GSP"""
+    write_csv(
+        tmp_path / "gsp_a.csv",
+        [
+            ("2021-06-01 00:00:00", 1.0),
+            ("2021-06-01 00:10:00", -0.5),
+            ("2021-06-01 00:10:00", 2.0),
+            ("not a date", 3.0),
+            ("2021-06-01 00:30:00", "Bad Data"),
+        ],
+    )
+    write_csv(tmp_path / "gsp_b.csv", [("2021-06-01 00:00:00", 4.0)])
+
+    records = []
+    metrics = PipelineMetrics(callback=records.append)
+    get_gsp_data_in_dict(
+        folder_destination=str(tmp_path),
+        preprocess_kwargs=dict(freq="10Min"),
+        max_workers=2,
+        metrics=metrics,
+    )
+    assert records == metrics.records
+
+    by_stage = {(x["stage"], x["gsp"]): x for x in metrics.records}
+    read_csv = by_stage[("read_csv", "gsp_a")]
+    assert read_csv["rows_in"] == 5
+    assert read_csv["rows_out"] == 4
+    assert read_csv["rows_dropped"] == {"invalid_datetime": 1, "invalid_value": 1}
+    assert read_csv["bytes_read"] == (tmp_path / "gsp_a.csv").stat().st_size
+
+    preprocess = by_stage[("preprocess", "gsp_a")]
+    assert preprocess["rows_dropped"] == {"negative": 1, "dst": 0, "duplicate": 1}
+    assert preprocess["rows_out"] == 4
+
+    summary = metrics.summary(by="gsp")
+    assert set(summary) == {"gsp_a", "gsp_b"}
+    assert summary["gsp_a"]["rows_dropped"]["duplicate"] == 1
+
+    with pytest.raises(ValueError):
+        metrics.summary(by="file")
+
+
+def test_metrics_report_of_open_gsp_data(tmp_path, caplog):
+    """Testing the JSON report of the whole pipeline and the logged records"""
+    metrics = PipelineMetrics()
+    with caplog.at_level(logging.INFO, logger="ukpn.load.power_data.metrics"):
+        next(
+            iter(
+                OpenGSPData(
+                    folder_destination="tests/data",
+                    folder_to_save=str(tmp_path),
+                    file_name="gsp.nc",
+                    write_as_netcdf=True,
+                    metrics=metrics,
+                )
+            )
+        )
+    assert "preprocess of sellindge" in caplog.text
+
+    report_path = metrics.save_json(str(tmp_path / "report.json"))
+    with open(report_path) as report_file:
+        report = json.load(report_file)
+
+    assert set(report["stages"]) == {"read_csv", "preprocess", "assemble", "write_netcdf"}
+    assert set(report["gsps"]) == {"richborough", "sellindge", "all"}
+    assert report["stages"]["write_netcdf"]["bytes_written"] == (tmp_path / "gsp.nc").stat().st_size
+    assert report["stages"]["read_csv"]["bytes_read"] > 0
@@ -1,9 +1,29 @@
 import os
+import sys
+from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
 
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
 import xarray as xr
 
-from ukpn.load import check_for_negative_data, get_gsp_data_in_dict
+from ukpn.load import (
+    UKPN_CSV_SCHEMA,
+    OpenGSPData,
+    assemble_gsp_dataset,
+    bst_to_utc,
+    check_for_negative_data,
+    convert_gsp_data_to_utc,
+    convert_xarray_to_netcdf,
+    convert_xarray_to_zarr,
+    get_gsp_data_in_dict,
+    get_rss_bytes,
+    iterate_gsp_dataset_windows,
+    load_csv_to_pandas,
+)
 
 
 def test_write_netcdf():
@@ -35,3 +55,255 @@ def test_check_non_negative_valus():
 
         # If false, means it has no negative values
         assert (non_negative_df < 0.0).any().any() == False
+
+
+def test_bst_to_utc_dst_policies():
+    """Testing the handling of the autumn and spring clock changes"""
+    # Autumn clock change, the hour from 01:00 is repeated
+    autumn = pd.DatetimeIndex(
+        ["2020-10-25 00:30", "2020-10-25 01:30", "2020-10-25 01:30", "2020-10-25 02:30"],
+        name="time_utc",
+    )
+    autumn_df = pd.DataFrame({"gsp": np.arange(4.0)}, index=autumn)
+
+    inferred = bst_to_utc(original_df=autumn_df, ambiguous="infer")
+    assert inferred.index.is_monotonic_increasing
+    assert inferred.index[1] == pd.Timestamp("2020-10-25 00:30", tz="UTC")
+    assert inferred.index[2] == pd.Timestamp("2020-10-25 01:30", tz="UTC")
+
+    marked = bst_to_utc(original_df=autumn_df, ambiguous="NaT")
+    assert marked.index.isna().sum() == 2
+
+    # By default the repeated hour is read as standard time, like pytz localize
+    default = bst_to_utc(original_df=autumn_df.iloc[[1]])
+    expected = pytz.timezone("Europe/London").localize(datetime(2020, 10, 25, 1, 30), is_dst=False)
+    assert default.index[0] == pd.Timestamp("2020-10-25 01:30", tz="UTC")
+    assert default.index[0] == expected
+
+    # Spring clock change, the hour from 01:00 does not exist
+    spring = pd.DatetimeIndex(["2020-03-29 00:30", "2020-03-29 01:30"], name="time_utc")
+    spring_df = pd.DataFrame({"gsp": [0.0, 1.0]}, index=spring)
+
+    shifted = bst_to_utc(original_df=spring_df, nonexistent="shift_forward")
+    assert shifted.index[1] == pd.Timestamp("2020-03-29 01:00", tz="UTC")
+    assert bst_to_utc(original_df=spring_df, nonexistent="NaT").index.isna().sum() == 1
+
+    with pytest.raises(ValueError):
+        bst_to_utc(original_df=spring_df, nonexistent="raise")
+
+
+def test_convert_gsp_data_to_utc():
+    """Testing the conversion of all the GSPs at once against each GSP separately"""
+    dataframe_dict = get_gsp_data_in_dict(folder_destination="tests/data")
+    utc_dict = convert_gsp_data_to_utc(gsp_data_in_dict=dataframe_dict)
+    for gsp_name, data_frame in dataframe_dict.items():
+        expected = bst_to_utc(original_df=data_frame)
+        pd.testing.assert_frame_equal(utc_dict[gsp_name], expected)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel_gsp_data_in_dict(executor):
+    """Testing the parallel loading against the serial loading"""
+    preprocess_kwargs = dict(freq="10Min")
+    serial_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=preprocess_kwargs
+    )
+    parallel_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data",
+        max_workers=2,
+        executor=executor,
+        preprocess_kwargs=preprocess_kwargs,
+    )
+
+    # The GSPs are always in a stable order
+    assert list(parallel_dict) == sorted(parallel_dict) == list(serial_dict)
+    for gsp_name, data_frame in serial_dict.items():
+        pd.testing.assert_frame_equal(parallel_dict[gsp_name], data_frame)
+
+
+def test_assemble_gsp_dataset():
+    """Testing the single pass assembly against an outer join of the dataframes"""
+    gsp_data_in_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=dict(freq="10Min")
+    )
+    # An irregular GSP forces the sort based union
+    gsp_data_in_dict["irregular"] = pd.DataFrame(
+        {"irregular": [1.0, 2.0]},
+        index=pd.DatetimeIndex(["2020-01-01 00:05", "2030-01-01"], tz="UTC", name="time_utc"),
+    )
+
+    for gsps in [["richborough", "sellindge"], ["richborough", "sellindge", "irregular"]]:
+        gsp_subset = {x: gsp_data_in_dict[x] for x in gsps}
+        dataset = assemble_gsp_dataset(gsp_data_in_dict=gsp_subset)
+        expected = pd.concat(list(gsp_subset.values()), axis=1, join="outer")
+
+        assert list(dataset.gsp_id.values) == gsps
+        np.testing.assert_array_equal(dataset.time_utc.values, expected.index.tz_localize(None))
+        np.testing.assert_array_equal(dataset.power.values, expected.to_numpy())
+
+
+def test_write_zarr(tmp_path):
+    """Testing the chunked Zarr store and appending along time_utc"""
+    gsp_data_in_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=dict(freq="10Min")
+    )
+    dataset = assemble_gsp_dataset(gsp_data_in_dict=gsp_data_in_dict)
+    first, second = dataset.isel(time_utc=slice(0, 50000)), dataset.isel(
+        time_utc=slice(40000, None)
+    )
+
+    convert_xarray_to_zarr(
+        xarray_dataset=first,
+        folder_to_save=str(tmp_path),
+        file_name="ukpn_gsp.zarr",
+        chunks={"time_utc": 1000, "gsp_id": 1},
+        compressor="lz4",
+    )
+    convert_xarray_to_zarr(
+        xarray_dataset=second,
+        folder_to_save=str(tmp_path),
+        file_name="ukpn_gsp.zarr",
+        append=True,
+    )
+
+    stored = xr.open_zarr(tmp_path / "ukpn_gsp.zarr", consolidated=True)
+    assert stored.power.encoding["chunks"] == (1000, 1)
+    np.testing.assert_array_equal(stored.time_utc.values, dataset.time_utc.values)
+    np.testing.assert_array_equal(stored.power.values, dataset.power.values)
+
+    with pytest.raises(ValueError):
+        convert_xarray_to_zarr(
+            xarray_dataset=dataset, folder_to_save=str(tmp_path), compressor="gzip"
+        )
+
+
+def test_open_gsp_data_streaming_modes(tmp_path):
+    """Testing the per GSP and per window streaming against the whole dataset"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+
+    gsp_datasets = list(OpenGSPData(folder_destination="tests/data", mode="gsp"))
+    assert [x.gsp_id.item() for x in gsp_datasets] == list(dataset.gsp_id.values)
+    for gsp_dataset in gsp_datasets:
+        expected = dataset.power.sel(gsp_id=gsp_dataset.gsp_id).dropna("time_utc", how="all")
+        stream = gsp_dataset.power.sel(time_utc=expected.time_utc)
+        np.testing.assert_array_equal(stream.values, expected.values)
+
+    window_datasets = list(
+        OpenGSPData(
+            folder_destination="tests/data",
+            mode="window",
+            window="30D",
+            folder_to_save=str(tmp_path),
+            write_as_zarr=True,
+        )
+    )
+    assert all(x.sizes["time_utc"] <= 30 * 144 for x in window_datasets)
+    windows = xr.concat(window_datasets, dim="time_utc")
+    np.testing.assert_array_equal(windows.power.values, dataset.power.values)
+
+    # The windows were appended one after the other to the Zarr store
+    stored = xr.open_zarr(tmp_path / "ukpn_gsp.zarr")
+    np.testing.assert_array_equal(stored.power.values, dataset.power.values)
+
+    with pytest.raises(ValueError):
+        OpenGSPData(folder_destination="tests/data", mode="gsp", write_as_netcdf=True)
+
+
+def test_compact_dtypes(tmp_path):
+    """Testing the float32 and the scaled int16 power, in memory and on disk"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+
+    for dtype in ["float32", "int16"]:
+        compact = next(
+            iter(
+                OpenGSPData(
+                    folder_destination="tests/data",
+                    dtype=dtype,
+                    folder_to_save=str(tmp_path),
+                    file_name=f"ukpn_gsp_{dtype}.nc",
+                    write_as_netcdf=True,
+                    write_as_zarr=True,
+                )
+            )
+        )
+        assert compact.power.dtype == np.float32
+        np.testing.assert_allclose(compact.power.values, dataset.power.values, rtol=1e-6)
+
+        for stored in [
+            xr.open_dataset(tmp_path / f"ukpn_gsp_{dtype}.nc", engine="h5netcdf"),
+            xr.open_zarr(tmp_path / f"ukpn_gsp_{dtype}.zarr"),
+        ]:
+            assert stored.power.encoding["dtype"] == np.dtype(dtype)
+            # The NaN's survive and the int16 rounding is within half a step
+            tolerance = stored.power.encoding.get("scale_factor", 0) / 2 + 1e-4
+            np.testing.assert_array_equal(stored.power.isnull(), dataset.power.isnull())
+            np.testing.assert_allclose(stored.power.values, dataset.power.values, atol=tolerance)
+
+    with pytest.raises(ValueError):
+        convert_xarray_to_netcdf(dataset, folder_to_save=str(tmp_path), dtype="int8")
+
+
+def test_memory_limit(monkeypatch):
+    """Testing that the memory limit refuses the dataset and splits the windows"""
+    # Nothing else in use, so that the limit only applies to the power array
+    monkeypatch.setattr("ukpn.load.power_data.utils.get_rss_bytes", lambda: 0)
+    gsp_data_in_dict = get_gsp_data_in_dict(
+        folder_destination="tests/data", preprocess_kwargs=dict(freq="10Min")
+    )
+    dataset = assemble_gsp_dataset(gsp_data_in_dict=gsp_data_in_dict)
+    memory_limit = dataset.power.nbytes // 4
+
+    with pytest.raises(MemoryError):
+        assemble_gsp_dataset(gsp_data_in_dict=gsp_data_in_dict, memory_limit=memory_limit)
+
+    windows = list(
+        iterate_gsp_dataset_windows(
+            gsp_data_in_dict=gsp_data_in_dict, window="3650D", memory_limit=memory_limit
+        )
+    )
+    assert len(windows) > 1
+    assert all(x.power.nbytes <= dataset.power.nbytes // 4 for x in windows)
+    windows = xr.concat(windows, dim="time_utc")
+    np.testing.assert_array_equal(windows.power.values, dataset.power.values)
+
+
+@pytest.mark.parametrize("platform, expected", [("linux", 2048 * 1024), ("darwin", 2048)])
+def test_rss_without_procfs(monkeypatch, platform, expected):
+    """Testing the units of the peak resident memory without procfs and psutil"""
+    import resource
+
+    def no_procfs(name):
+        raise ValueError(name)
+
+    monkeypatch.setattr("ukpn.load.power_data.utils.os.sysconf", no_procfs)
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    monkeypatch.setattr("ukpn.load.power_data.utils.sys.platform", platform)
+    monkeypatch.setattr(resource, "getrusage", lambda who: SimpleNamespace(ru_maxrss=2048))
+    assert get_rss_bytes() == expected
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_load_csv_with_schema(tmp_path, engine):
+    """Testing the explicit schema reader and the report of the rows failing to parse"""
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    schema = dict(UKPN_CSV_SCHEMA, engine=engine)
+    expected = load_csv_to_pandas(path_to_file="tests/data/richborough.csv")
+    data_frame = load_csv_to_pandas(path_to_file="tests/data/richborough.csv", **schema)
+    pd.testing.assert_frame_equal(data_frame, expected)
+
+    file_path = tmp_path / "gsp.csv"
+    file_path.write_text(
+        '"Time","Solar"\n'
+        "2021-01-01 00:00:00,1.5\n"
+        "2021-01-01 00:10:00,abc\n"
+        "not a date,2.0\n"
+        "2021-01-01 00:30:00,\n"
+    )
+    data_frame, failed_rows = load_csv_to_pandas(
+        path_to_file=file_path, return_failed_rows=True, **schema
+    )
+    assert len(data_frame) == 3
+    assert data_frame["gsp"].dtype == np.float64
+    assert list(failed_rows.index) == [1, 2]
+    assert list(failed_rows["reason"]) == ["value", "datetime"]
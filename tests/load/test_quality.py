@@ -0,0 +1,69 @@
+import numpy as np
+import xarray as xr
+
+from ukpn.load import QC_FLAGS, CheckGSPQuality, OpenGSPData, get_quality_flags
+
+
+def test_quality_flags():
+    """Testing every check on a small array with known faults"""
+    rng = np.random.default_rng(0)
+    power = rng.uniform(10, 20, (200, 3))
+    power[5, 0] = -1.0
+    power[50:60, 1] = 12.0
+    power[100, 2] = 500.0
+    power[150:170, 0] = 0.0
+    power[180, 1] = np.nan
+
+    flags = get_quality_flags(power, stuck_intervals=6, capacity=[100.0, 100.0, 100.0])
+
+    assert flags.dtype == np.uint8
+    assert flags[5, 0] & QC_FLAGS["negative"]
+    assert (flags[50:60, 1] & QC_FLAGS["stuck"]).all()
+    assert flags[100, 2] == QC_FLAGS["spike"] | QC_FLAGS["above_capacity"]
+    # Runs of zeros and the NaN's are not stuck
+    assert not (flags[150:170, 0] & QC_FLAGS["stuck"]).any()
+    assert flags[180, 1] == 0
+    # Nothing else apart from the values next to the injected faults
+    assert np.count_nonzero(flags & QC_FLAGS["stuck"]) == 10
+    assert np.count_nonzero(flags & QC_FLAGS["negative"]) == 1
+
+
+def test_check_gsp_quality_datapipe():
+    """Testing the flags and the masking added to the GSP dataset"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+    gsp_name = dataset.gsp_id.values[0]
+    capacity = float(dataset.power.sel(gsp_id=gsp_name).quantile(0.99))
+
+    checked = next(
+        iter(
+            CheckGSPQuality(
+                [dataset],
+                capacity={gsp_name: capacity},
+                mask_flags=QC_FLAGS["above_capacity"],
+            )
+        )
+    )
+
+    assert checked.quality_flags.dims == ("time_utc", "gsp_id")
+    above_capacity = (checked.quality_flags & QC_FLAGS["above_capacity"]) > 0
+    assert above_capacity.sel(gsp_id=gsp_name).any()
+    assert not above_capacity.drop_sel(gsp_id=gsp_name).any()
+    assert checked.gsp_quality_flags.sel(gsp_id=gsp_name) & QC_FLAGS["above_capacity"]
+
+    # Only the values above the capacity were masked
+    assert checked.power.where(above_capacity).isnull().all()
+    xr.testing.assert_equal(
+        checked.power.where(~above_capacity), dataset.power.where(~above_capacity)
+    )
+
+
+def test_quality_flags_are_vectorized_over_columns():
+    """Testing that the flags of every column do not depend on the other columns"""
+    rng = np.random.default_rng(1)
+    power = np.round(rng.normal(50, 5, (1000, 4)), 0)
+    flags = get_quality_flags(power, stuck_intervals=3)
+
+    for i in range(power.shape[1]):
+        np.testing.assert_array_equal(
+            get_quality_flags(power[:, [i]], stuck_intervals=3)[:, 0], flags[:, i]
+        )
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from ukpn.load import (
+    OpenUKPNRecords,
+    UKPNApiClient,
+    get_complete_records,
+    get_gsp_names,
+    iterate_records,
+    parse_json_array,
+)
+
+
+def make_register(number_of_records: int = 2500):
+    """Records of a stand-in register, every other one photovoltaic"""
+    return [
+        dict(
+            recordid=str(i),
+            fields=dict(
+                grid_supply_point=f"GSP {i % 3} 132KV",
+                energy_conversion_technology_1="Photovoltaic" if i % 2 else "Wind",
+            ),
+        )
+        for i in range(number_of_records)
+    ]
+
+
+@pytest.fixture
+def register_server(server, monkeypatch):
+    """Stand-in api serving a register of 2500 records"""
+    server.register = make_register()
+    monkeypatch.setattr(
+        "ukpn.load.meta_data.utils.UKPN_API_URL", f"http://127.0.0.1:{server.server_port}"
+    )
+    return server
+
+
+def test_paginated_records(register_server):
+    """Testing that every record is paged through, in order"""
+    with UKPNApiClient(max_workers=2) as client:
+        records = list(iterate_records(page_size=1000, client=client))
+        assert records == register_server.register
+        assert len(register_server.requests) == 3
+
+        refine = {"grid_supply_point": "GSP 1 132KV", "energy_conversion_technology_1": "Wind"}
+        records = list(OpenUKPNRecords(refine=refine, page_size=100, client=client))
+        assert records == [
+            x for x in register_server.register if x["fields"].items() >= refine.items()
+        ]
+
+        # The complete register of the first page is completed by the next pages
+        data_json = get_complete_records(client=client, page_size=1000)
+        assert data_json["records"] == register_server.register
+        assert data_json["facet_groups"][0]["name"] == "grid_supply_point"
+
+
+def test_gsp_names_of_first_page(register_server):
+    """Testing that the names are read from the facets, without any record"""
+    with UKPNApiClient() as client:
+        assert get_gsp_names(client=client) == ["GSP 0 132KV", "GSP 1 132KV", "GSP 2 132KV"]
+    assert len(register_server.requests) == 1
+    assert "&rows=0&" in register_server.requests[0][1]
+
+    with pytest.raises(ValueError):
+        OpenUKPNRecords(page_size=0)
+
+
+def test_streamed_export(register_server, monkeypatch):
+    """Testing that the export is streamed beyond the limit of the pages"""
+    monkeypatch.setattr("ukpn.load.meta_data.utils.SEARCH_OFFSET_LIMIT", 2000)
+
+    with UKPNApiClient() as client:
+        records = list(iterate_records(page_size=1000, client=client))
+        assert records == register_server.register
+        assert [x[1][:10] for x in register_server.requests] == ["/search/?d", "/download/"]
+
+        assert list(iterate_records(start=2400, client=client)) == register_server.register[2400:]
+
+        # Without the export, only the records below the limit are paged through
+        assert len(list(iterate_records(page_size=1000, export=False, client=client))) == 2000
+
+
+def test_parse_json_array():
+    """Testing the parsing of an array split anywhere"""
+    array = [{"a": "],[{", "b": [1, 2.5, None]}, 12345, "x", {"c": {}}]
+    text = json.dumps(array)
+    assert list(parse_json_array(text)) == array
+    assert list(parse_json_array([text])) == array
+    assert list(parse_json_array(["[", "]"])) == []
+    assert list(parse_json_array([])) == []
+
+    with pytest.raises(ValueError):
+        list(parse_json_array(text[:-3]))
+    with pytest.raises(ValueError):
+        list(parse_json_array(['{"a": 1}']))
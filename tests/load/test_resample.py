@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from ukpn.load import OpenGSPData, ResampleGSPData, resample_gsp_dataset
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return next(iter(OpenGSPData(folder_destination="tests/data")))
+
+
+def test_resample_mean_matches_pandas(dataset):
+    """Testing the block mean against the groupby of pandas"""
+    resampled = resample_gsp_dataset(dataset, period="30Min", method="mean")
+    expected = dataset.power.to_pandas().resample("30Min").mean()
+
+    np.testing.assert_array_equal(resampled.time_utc.values, expected.index.values)
+    np.testing.assert_allclose(resampled.power.values, expected.to_numpy())
+
+
+def test_resample_methods():
+    """Testing the energy, the instantaneous value and the minimum of valid samples"""
+    time_utc = pd.date_range("2022-01-01 00:10", periods=8, freq="10Min").values
+    power = np.array([[1.0], [2.0], [3.0], [np.nan], [6.0], [np.nan], [np.nan], [8.0]])
+    dataset = xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], power)),
+        coords=dict(time_utc=time_utc, gsp_id=["gsp"]),
+    )
+
+    # 00:00 [nan, 1, 2], 00:30 [3, nan, 6], 01:00 [nan, nan, 8]
+    mean = resample_gsp_dataset(dataset, method="mean", min_valid_samples=2)
+    np.testing.assert_array_equal(mean.power.values.ravel(), [1.5, 4.5, np.nan])
+
+    energy = resample_gsp_dataset(dataset, method="energy")
+    np.testing.assert_array_equal(energy.power.values.ravel(), [0.75, 2.25, 4.0])
+
+    # With closed="right", the periods end at the instantaneous sample, 01:30 is missing
+    instantaneous = resample_gsp_dataset(
+        dataset, method="instantaneous", closed="right", label="right"
+    )
+    np.testing.assert_array_equal(
+        instantaneous.time_utc.values,
+        pd.to_datetime(["2022-01-01 00:30", "2022-01-01 01:00", "2022-01-01 01:30"]).values,
+    )
+    np.testing.assert_array_equal(instantaneous.power.values.ravel(), [3.0, np.nan, np.nan])
+
+    with pytest.raises(ValueError):
+        resample_gsp_dataset(dataset, period="25Min")
+
+
+def test_resample_streaming_windows(dataset):
+    """Testing that windows not aligned to the periods resample like the whole dataset"""
+    windows = OpenGSPData(folder_destination="tests/data", mode="window", window="1000Min")
+    resampled_windows = list(ResampleGSPData(windows, period="30Min", method="energy"))
+
+    expected = resample_gsp_dataset(dataset, period="30Min", method="energy")
+    resampled = xr.concat(resampled_windows, dim="time_utc")
+    np.testing.assert_array_equal(resampled.time_utc.values, expected.time_utc.values)
+    np.testing.assert_array_equal(resampled.power.values, expected.power.values)
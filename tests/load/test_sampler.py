@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from torch.utils.data import DataLoader
+
+from ukpn.load import OpenGSPData, SampleGSPWindows, get_daylight_mask, get_valid_window_index
+
+
+def test_valid_window_index():
+    """Testing the index against a brute force count of the NaN's of every window"""
+    rng = np.random.default_rng(0)
+    power = rng.random((300, 3))
+    power[rng.random(power.shape) < 0.05] = np.nan
+
+    gsp_positions, t0_positions = get_valid_window_index(
+        power, history_length=6, forecast_length=4, max_nans=1
+    )
+    assert gsp_positions.dtype == t0_positions.dtype == np.int32
+
+    expected = [
+        (gsp, t0)
+        for gsp in range(3)
+        for t0 in range(5, 300 - 4)
+        if np.isnan(power[t0 - 5 : t0 + 5, gsp]).sum() <= 1
+    ]
+    assert list(zip(gsp_positions, t0_positions)) == expected
+
+
+def test_sample_gsp_windows():
+    """Testing the slicing, the seeded shuffling and the reshuffling every epoch"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+    dataset = dataset.isel(time_utc=slice(0, 20000))
+    datapipe = SampleGSPWindows([dataset], history_length=12, forecast_length=6, max_nans=0)
+
+    windows = list(datapipe)
+    assert len(windows) > 0
+    for window in windows[:: len(windows) // 50]:
+        assert window["power"].shape == (18,)
+        assert not np.isnan(window["power"]).any()
+        expected = dataset.power.sel(gsp_id=window["gsp_id"]).sel(
+            time_utc=slice(None, window["t0"])
+        )
+        np.testing.assert_array_equal(window["power"][:12], expected.values[-12:])
+
+    shuffled = SampleGSPWindows(
+        [dataset], history_length=12, forecast_length=6, shuffle=True, seed=1
+    )
+    first_epoch = [(x["gsp_id"], x["t0"]) for x in shuffled]
+    second_epoch = [(x["gsp_id"], x["t0"]) for x in shuffled]
+    assert sorted(first_epoch) == sorted((x["gsp_id"], x["t0"]) for x in windows)
+    assert first_epoch != second_epoch
+
+    shuffled.set_epoch(0)
+    assert [(x["gsp_id"], x["t0"]) for x in shuffled] == first_epoch
+
+
+def test_sample_gsp_windows_workers():
+    """Testing that the DataLoader workers share the windows without duplicates"""
+    dataset = next(iter(OpenGSPData(folder_destination="tests/data")))
+    dataset = dataset.isel(time_utc=slice(0, 5000))
+    datapipe = SampleGSPWindows([dataset], history_length=12, forecast_length=6, shuffle=True)
+
+    loader = DataLoader(datapipe, batch_size=None, num_workers=2, collate_fn=lambda x: x)
+    samples = [(x["gsp_id"], x["t0"]) for x in loader]
+    assert len(samples) == len(set(samples)) == len(list(datapipe))
+
+
+def test_daylight_mask():
+    """Testing that the nights of a GSP in Kent are not sampled"""
+    pytest.importorskip("pvlib")
+    time_utc = np.arange("2022-06-21T00:00", "2022-06-22T00:00", 10, dtype="datetime64[m]")
+    daylight = get_daylight_mask(time_utc.astype("datetime64[ns]"), [[(1.1, 51.2)]])
+
+    assert not daylight[0, 0] and daylight[72, 0]
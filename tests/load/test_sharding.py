@@ -0,0 +1,83 @@
+import pytest
+import xarray as xr
+from torch.utils.data import DataLoader
+
+from ukpn.load import GatherGSPDatasets, OpenGSPData, get_shard_info, shard_items
+from ukpn.load.power_data.utils import get_gsp_file_paths
+
+
+def test_shard_items():
+    """Testing that the shards split the files deterministically and completely"""
+    file_paths = get_gsp_file_paths(folder_destination="tests/data")
+    shards = [shard_items(file_paths, shard_id=i, number_of_shards=2) for i in range(2)]
+
+    assert sorted(shards[0] + shards[1]) == sorted(file_paths)
+    assert not set(shards[0]) & set(shards[1])
+    assert shard_items(file_paths[::-1], shard_id=1, number_of_shards=2) == shards[1]
+
+    # Outside of a DataLoader worker there is a single shard
+    assert get_shard_info() == (0, 1)
+    assert shard_items(file_paths) == sorted(file_paths)
+
+    with pytest.raises(ValueError):
+        shard_items(file_paths, shard_id=2, number_of_shards=2)
+
+
+def test_gather_sharded_gsp_data():
+    """Testing that the datasets of the DataLoader workers gather into the full dataset"""
+    expected = next(iter(OpenGSPData(folder_destination="tests/data")))
+
+    loader = DataLoader(
+        OpenGSPData(folder_destination="tests/data", shard=True),
+        batch_size=None,
+        num_workers=2,
+        collate_fn=lambda x: x,
+    )
+    shard_datasets = list(loader)
+    assert len(shard_datasets) == 2
+    assert sum(x.sizes["gsp_id"] for x in shard_datasets) == expected.sizes["gsp_id"]
+
+    gathered = next(iter(GatherGSPDatasets(shard_datasets, freq="10Min")))
+    xr.testing.assert_allclose(gathered.power, expected.power.sortby("gsp_id"))
+
+    with pytest.raises(ValueError):
+        OpenGSPData(folder_destination="tests/data", shard=True, write_as_zarr=True)
+
+
+def get_window_keys(batch):
+    """GSP and t0 of every window of a batch of windows"""
+    return [(x["gsp_id"], x["t0"]) for x in batch]
+
+
+def get_batch_keys(batch):
+    """GSP and t0 of every window of a batch of BatchGSPWindows"""
+    return list(zip(batch["gsp_id"], batch["t0"].numpy().astype("datetime64[ns]")))
+
+
+def test_sharded_windows():
+    """Testing that the windows of a sharded source are yielded exactly once by the workers"""
+    expected = [
+        (x["gsp_id"], x["t0"])
+        for x in OpenGSPData(folder_destination="tests/data").sample_gsp_windows(12, 6)
+    ]
+    source = OpenGSPData(folder_destination="tests/data", shard=True)
+
+    loader = DataLoader(
+        source.sample_gsp_windows(12, 6, shuffle=True),
+        batch_size=8192,
+        num_workers=2,
+        collate_fn=get_window_keys,
+    )
+    windows = [x for batch in loader for x in batch]
+    assert len(windows) == len(set(windows)) == len(expected)
+    assert set(windows) == set(expected)
+
+    loader = DataLoader(
+        source.batch_gsp_windows(12, 6, batch_size=8192),
+        batch_size=None,
+        num_workers=2,
+        collate_fn=get_batch_keys,
+    )
+    windows = [x for batch in loader for x in batch]
+    assert len(windows) == len(set(windows)) == len(expected)
+    assert set(windows) == set(expected)
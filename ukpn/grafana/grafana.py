@@ -3,12 +3,13 @@ import logging
 import os
 import shutil
 from glob import glob
-from typing import Optional
+from typing import List, Optional
 
 from torchdata.datapipes import functional_datapipe
 from torchdata.datapipes.iter import IterDataPipe
 
 from ukpn.grafana.grafana_side_panel import download_data
+from ukpn.load.meta_data.gsp_names import GSPNameIndex, get_gsp_file_name
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +36,8 @@ class DownloadGrafanaDataIterDataPipe(IterDataPipe):
             download_directory: Set the folder destination for downloads
             new_directory: Move files from main project folder to 'test/data'
             required_data: The data that is required to download
-            gsp_name: Download for a single GSP, if None, downloads for all available GSP's
+            gsp_name: Download for a single GSP, if None, downloads for all available GSP's.
+                It is matched with the dashboard names, see `match_dashboard_gsp_name`
             commence_download: Download the data
         """
         self.download_directory = download_directory
@@ -46,14 +48,16 @@ class DownloadGrafanaDataIterDataPipe(IterDataPipe):
 
     def __iter__(self):
         """Downloading the data for each gsp"""
+        # Getting the list of gsp names
+        dashboard_names = get_gsp_names()
         if self.gsp_name is None:
-            # Getting the list of gsp names
-            gsp_names_list = get_gsp_names()
-            gsp_names_list = list(reversed(gsp_names_list))
+            gsp_names_list = list(reversed(dashboard_names))
             logger.debug(f"{gsp_names_list[-1]} GSP is not able be selected!")
             logger.debug("The problem is with the dashboard, not the code")
         else:
-            gsp_names_list = [self.gsp_name]
+            gsp_names_list = [
+                match_dashboard_gsp_name(gsp_name=self.gsp_name, dashboard_names=dashboard_names)
+            ]
 
         # Initalise chrome
         grafana = download_data(download_directory=self.download_directory)
@@ -62,16 +66,12 @@ class DownloadGrafanaDataIterDataPipe(IterDataPipe):
         for gsp_name in gsp_names_list:
             # Getting the gsp names in lower case format
             # In order to reqrite saved csv file names
-            seperator = "_"
-            gsp_name_lcase = gsp_name.lower()
-            if len(gsp_name_lcase.split()) > 1:
-                gsp_name_lcase = gsp_name_lcase.split()
-                gsp_name_lcase = seperator.join(gsp_name_lcase)
+            gsp_name_lcase = get_gsp_file_name(gsp_name)
 
             # Workflow
             status.append(grafana.click_on_gsp_box())
             status.append(grafana.search_for_dropdown())
-            status.append(grafana.select_a_gsp(gsp_name=self.gsp_name))
+            status.append(grafana.select_a_gsp(gsp_name=gsp_name))
             status.append(grafana.scroll_to_element_and_click())
             status.append(grafana.click_dataoptions_side_panel())
             status.append(grafana.click_on_data_dialog())
@@ -100,6 +100,23 @@ def get_gsp_names():
     return names
 
 
+def match_dashboard_gsp_name(gsp_name: str, dashboard_names: List[str]) -> str:
+    """The dashboard name of a GSP, matched like the GSP files with the register
+
+    Args:
+        gsp_name: Name of the GSP, e.g. "sellindge" or "SELLINDGE 132kV"
+        dashboard_names: GSP names of the dashboard, see `get_gsp_names`
+
+    Returns:
+        The matching dashboard name, or gsp_name if none matches unambiguously
+    """
+    dashboard_name = GSPNameIndex(dashboard_names).match(gsp_name)
+    if dashboard_name is None:
+        logger.info(f"{gsp_name} is selected as is in the dashboard")
+        return gsp_name
+    return dashboard_name
+
+
 def set_csv_filenames(download_directory: str, new_directory: str, gsp_name: str):
     """Function to rewrite the csv file name
 
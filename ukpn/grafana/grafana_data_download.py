@@ -18,6 +18,8 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+from ukpn.load.meta_data.gsp_names import normalise_gsp_name
+
 logger_webdriver = logging.getLogger("selenium.webdriver.remote.remote_connection")
 logger_webdriver.setLevel(logging.WARNING)
 
@@ -242,7 +244,7 @@ class automate_csv_download:
     def _check_gsp_title_match(self):
         """Checking if the GSP name and ttile of dashboard matches"""
         self.title = self.driver.title
-        if self.title == self.gsp_name:
+        if normalise_gsp_name(self.title) == normalise_gsp_name(self.gsp_name):
             return 1
         else:
             return None
@@ -7,6 +7,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 
 from ukpn.grafana.chrome import open_webpage
+from ukpn.load.meta_data.gsp_names import normalise_gsp_name
 
 logging.basicConfig(level=logging.DEBUG, format="%(asctime)s : %(levelname)s : %(message)s ")
 logger = logging.getLogger(__name__)
@@ -88,7 +89,7 @@ class main_panel(open_webpage):
         else:
             print(self.gsp_name)
             print(self.element.text)
-            if self.gsp_name in self.element.text:
+            if normalise_gsp_name(self.gsp_name) in normalise_gsp_name(self.element.text):
                 return 1
             else:
                 logger.debug(f"{self.gsp_name} does not match with the dashboard GSP")
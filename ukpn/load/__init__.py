@@ -1,13 +1,104 @@
 """Load the datapipes and functions"""
+from ukpn.load.meta_data.cache import METADATA_CACHE_TTL, MetadataCache
+from ukpn.load.meta_data.client import (
+    RETRY_STATUS_CODES,
+    UKPNApiClient,
+    get_default_client,
+    set_default_client,
+)
 from ukpn.load.meta_data.get_gsp_center_coord import (
     GetCenterCoordinatesGSPIterDataPipe as GetCenterCoordinatesGSP,
 )
-from ukpn.load.meta_data.utils import construct_url, get_gsp_names, get_metadata_from_ukpn_api
+from ukpn.load.meta_data.get_gsp_center_coord import get_gsp_center
+from ukpn.load.meta_data.gsp_names import (
+    GSPNameCandidate,
+    GSPNameIndex,
+    get_gsp_file_name,
+    normalise_gsp_name,
+)
+from ukpn.load.meta_data.records import OpenUKPNRecordsIterDataPipe as OpenUKPNRecords
+from ukpn.load.meta_data.utils import (
+    RECORDS_PAGE_SIZE,
+    SEARCH_OFFSET_LIMIT,
+    construct_export_url,
+    construct_url,
+    get_complete_records,
+    get_gsp_names,
+    get_metadata_from_ukpn_api,
+    group_records_by_gsp,
+    iterate_records,
+    parse_json_array,
+)
+from ukpn.load.power_data.batch import BatchGSPWindowsIterDataPipe as BatchGSPWindows
+from ukpn.load.power_data.batch import (
+    collate_gsp_windows,
+    empty_batch,
+    gather_gsp_windows,
+    mask_missing_power,
+)
+from ukpn.load.power_data.cache import (
+    evict_from_cache,
+    get_cache_key,
+    load_from_cache,
+    save_to_cache,
+)
+from ukpn.load.power_data.fill import FILL_METHODS
+from ukpn.load.power_data.fill import FillGSPGapsIterDataPipe as FillGSPGaps
+from ukpn.load.power_data.fill import fill_gsp_gaps, get_clear_sky_profile, get_filled_power
+from ukpn.load.power_data.gaps import AddGapIndexIterDataPipe as AddGapIndex
+from ukpn.load.power_data.gaps import (
+    add_gap_index,
+    get_complete_windows,
+    get_coverage,
+    get_gap_runs,
+    get_gsp_gaps,
+    get_longest_gap,
+)
+from ukpn.load.power_data.gather import GatherGSPDatasetsIterDataPipe as GatherGSPDatasets
 from ukpn.load.power_data.gsp import OpenGSPDataIterDataPipe as OpenGSPData
+from ukpn.load.power_data.lazy import get_gsp_file_time_range, open_gsp_data_lazy
+from ukpn.load.power_data.manifest import (
+    get_file_record,
+    get_file_status,
+    load_manifest,
+    save_manifest,
+)
+from ukpn.load.power_data.memmap import OpenGSPMemmapIterDataPipe as OpenGSPMemmap
+from ukpn.load.power_data.memmap import open_memmap_cache, save_memmap_cache
+from ukpn.load.power_data.metrics import PipelineMetrics, format_record, get_path_size
+from ukpn.load.power_data.quality import QC_FLAGS
+from ukpn.load.power_data.quality import CheckGSPQualityIterDataPipe as CheckGSPQuality
+from ukpn.load.power_data.quality import add_quality_flags, get_quality_flags
+from ukpn.load.power_data.resample import RESAMPLE_METHODS
+from ukpn.load.power_data.resample import ResampleGSPDataIterDataPipe as ResampleGSPData
+from ukpn.load.power_data.resample import get_period_starts, resample_gsp_dataset
+from ukpn.load.power_data.sampler import SampleGSPWindowsIterDataPipe as SampleGSPWindows
+from ukpn.load.power_data.sampler import get_daylight_mask, get_valid_window_index
 from ukpn.load.power_data.utils import (
+    POWER_DTYPES,
+    UKPN_CSV_SCHEMA,
+    assemble_gsp_dataset,
     bst_to_utc,
     check_for_negative_data,
+    check_memory_budget,
+    convert_gsp_data_to_utc,
     convert_xarray_to_netcdf,
+    convert_xarray_to_zarr,
+    create_gsp_dataset,
+    gather_gsp_datasets,
     get_gsp_data_in_dict,
+    get_gsp_file_paths,
+    get_power_encoding,
+    get_rss_bytes,
+    iterate_gsp_data,
+    iterate_gsp_dataset_windows,
+    iterate_over_gsp_files,
     load_csv_to_pandas,
+    load_gsp_file,
+    localize_datetime_index,
+    map_over_gsp_files,
+    merge_gsp_data_into_dataset,
+    preprocess_gsp_data,
+    to_naive_utc,
 )
+from ukpn.load.sharding import SHARD_ATTRS, get_shard_info, shard_items
@@ -0,0 +1,113 @@
+"""On-disk cache of the responses of the UKPN api"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Default time to live of the cached responses, a day
+METADATA_CACHE_TTL = 24 * 3600
+
+
+class MetadataCache:
+    """Keeps the json responses of the api in a folder, one file per url
+
+    Every entry holds the response, the time it was fetched and its ETag and
+    Last-Modified validators. The fresh entries are served without a request, the
+    expired ones are revalidated with a conditional request. In the offline mode
+    only the cached entries are served, however old they are.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: Optional[float] = METADATA_CACHE_TTL,
+        offline: bool = False,
+    ):
+        """Opens the cache
+
+        Args:
+            cache_dir: Folder of the cache, created if needed, "~" is expanded
+            ttl: Seconds during which an entry is served without a request, the
+                entries never expire if None
+            offline: If true, no request is sent and only the cached entries are served
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+        self.offline = offline
+        self.stats = dict(hits=0, misses=0, revalidated=0, stale=0)
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_path(self, api_url: str) -> str:
+        """Path of the entry of a url"""
+        return os.path.join(self.cache_dir, hashlib.sha256(api_url.encode()).hexdigest() + ".json")
+
+    def get(self, api_url: str) -> Optional[Dict]:
+        """The entry of a url, None if it is not cached or unreadable"""
+        try:
+            with open(self.get_path(api_url)) as entry_file:
+                entry = json.load(entry_file)
+        except (FileNotFoundError, ValueError):
+            return None
+        return entry if entry.get("url") == api_url else None
+
+    def put(
+        self,
+        api_url: str,
+        data: Dict,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Dict:
+        """Saves the response of a url, replacing its entry at once"""
+        entry = dict(
+            url=api_url,
+            fetched_at=time.time(),
+            etag=etag,
+            last_modified=last_modified,
+            data=data,
+        )
+        self._write(entry)
+        return entry
+
+    def refresh(self, entry: Dict) -> Dict:
+        """Restarts the time to live of an entry which was revalidated"""
+        entry = dict(entry, fetched_at=time.time())
+        self._write(entry)
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        """If the entry can be served without a request"""
+        return self.ttl is None or time.time() - entry["fetched_at"] < self.ttl
+
+    def get_validators(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """Headers of the conditional request revalidating an entry"""
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def count(self, name: str):
+        """Increments a counter of the stats"""
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        """Removes every entry of the cache"""
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _write(self, entry: Dict):
+        """Writes an entry next to its file first, so readers never see half of it"""
+        path = self.get_path(entry["url"])
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w") as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(temporary_path, path)
@@ -0,0 +1,259 @@
+"""Pooled HTTP client of the UKPN api with concurrent requests and retries"""
+import codecs
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ukpn.load.meta_data.cache import MetadataCache
+
+logger = logging.getLogger(__name__)
+
+# Status codes of the responses which are retried
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class UKPNApiClient:
+    """Sends the requests of the UKPN api through a single pooled session
+
+    The connections are kept alive between the requests. Many urls can be requested
+    at once by a bounded pool of threads. The rate limited (429) and failed (5xx)
+    responses, the timeouts and the connection errors are retried with an exponential
+    backoff, honouring the Retry-After header of the response. With a MetadataCache,
+    the fresh responses are served from disk, the expired ones are revalidated with a
+    conditional request and the cached ones are served if the api cannot be reached.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        cache: Optional[MetadataCache] = None,
+    ):
+        """Creates the session of the client
+
+        Args:
+            max_workers: Largest number of concurrent requests, and of pooled connections
+            timeout: Timeout of the connection and of every read in seconds
+            max_retries: Number of retries after the first attempt
+            backoff_factor: Wait before the first retry in seconds, doubled at every retry
+            max_backoff: Longest wait between two attempts in seconds
+            cache: If given, the on-disk cache of the responses
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+        if max_retries < 0:
+            raise ValueError(f"max_retries must be at least 0, got {max_retries}")
+
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_settings(self) -> Dict:
+        """Keyword arguments creating a client like this one, with its own session"""
+        return dict(
+            max_workers=self.max_workers,
+            timeout=self.timeout,
+            max_retries=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            max_backoff=self.max_backoff,
+            cache=self.cache,
+        )
+
+    def get_json(self, api_url: str) -> Optional[Dict]:
+        """Requests the json data of a url, or serves it from the cache
+
+        Args:
+            api_url: The api url link that emits json format data
+
+        Returns:
+            The parsed json, None if the response is unsuccessful after the retries
+            and the url is not cached
+        """
+        if self.cache is None:
+            response = self._get_response(api_url)
+            return None if response is None else response.json()
+
+        entry = self.cache.get(api_url)
+        if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+            self.cache.count("hits")
+            return entry["data"]
+        if self.cache.offline:
+            logger.info(f"{api_url} is not cached and the cache is offline")
+            self.cache.count("misses")
+            return None
+
+        response = self._get_response(api_url, headers=self.cache.get_validators(entry))
+        if response is None:
+            if entry is None:
+                self.cache.count("misses")
+                return None
+            logger.info(f"Serving the expired response of {api_url}")
+            self.cache.count("stale")
+            return entry["data"]
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry)
+            self.cache.count("revalidated")
+            return entry["data"]
+
+        data = response.json()
+        self.cache.put(
+            api_url,
+            data=data,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self.cache.count("misses")
+        return data
+
+    def iter_text(self, api_url: str, chunk_size: int = 2**16) -> Iterator[str]:
+        """Streams the text of a response as it arrives, bypassing the cache
+
+        Only the start of the response is retried, an error while it is streamed is
+        raised.
+
+        Args:
+            api_url: The api url link
+            chunk_size: Number of bytes read at once
+
+        Returns:
+            The consecutive pieces of the text, nothing if the response is unsuccessful
+            after the retries
+        """
+        response = self._get_response(api_url, stream=True)
+        if response is None:
+            return
+
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")()
+        with response:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def _get_response(
+        self, api_url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False
+    ) -> Optional[requests.Response]:
+        """Sends the request, retrying the failed ones
+
+        Returns:
+            The successful (200) or not modified (304) response, None otherwise
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(
+                    api_url, headers=headers, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if attempt == self.max_retries:
+                    logger.info(f"The request to {api_url} failed: {error}")
+                    return None
+                self._wait(attempt=attempt)
+                continue
+
+            if response.status_code in (200, 304):
+                logger.info(f"The response from the link {api_url} is successful")
+                return response
+            response.close()
+
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                logger.info(
+                    f"The response from the link {api_url} is unsuccessful "
+                    f"({response.status_code})"
+                )
+                return None
+
+            logger.debug(f"Retrying {api_url} after a {response.status_code} response")
+            self._wait(attempt=attempt, retry_after=response.headers.get("Retry-After"))
+
+        return None
+
+    def get_many_json(self, api_urls: Sequence[str]) -> List[Optional[Dict]]:
+        """Requests the json data of many urls concurrently
+
+        At most max_workers requests are in flight at once.
+
+        Args:
+            api_urls: The api url links
+
+        Returns:
+            The parsed json of every url in the same order, None for the unsuccessful ones
+        """
+        if len(api_urls) <= 1 or self.max_workers == 1:
+            return [self.get_json(x) for x in api_urls]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(api_urls))) as pool:
+            return list(pool.map(self.get_json, api_urls))
+
+    def close(self):
+        """Closes the pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _wait(self, attempt: int, retry_after: Optional[str] = None):
+        """Sleeps before the next attempt"""
+        wait = self.backoff_factor * 2**attempt
+        if retry_after is not None:
+            try:
+                wait = max(wait, float(retry_after))
+            except ValueError:
+                # Retry-After may also be an http date, the backoff is used instead
+                pass
+        time.sleep(min(wait, self.max_backoff))
+
+
+# Default client of every process, a forked worker does not reuse the sockets of its parent
+# but gets a new client with the settings of the installed one, e.g. its cache
+_default_clients = {}
+_default_client_settings = {}
+
+
+def get_default_client() -> UKPNApiClient:
+    """The client shared by the functions requesting the api, created on first use"""
+    process_id = os.getpid()
+    if process_id not in _default_clients:
+        _default_clients.clear()
+        _default_clients[process_id] = UKPNApiClient(**_default_client_settings)
+    return _default_clients[process_id]
+
+
+def set_default_client(client: Optional[UKPNApiClient]):
+    """Replaces the client shared by the functions requesting the api
+
+    For example to cache every response of `get_gsp_names` and GetCenterCoordinatesGSP:
+    set_default_client(UKPNApiClient(cache=MetadataCache("~/.cache/ukpn"))). The
+    processes forked afterwards, e.g. the DataLoader workers, use a client with the
+    same settings and cache.
+
+    Args:
+        client: The new default client, or None to go back to a client without cache
+    """
+    _default_clients.clear()
+    _default_client_settings.clear()
+    if client is not None:
+        _default_clients[os.getpid()] = client
+        _default_client_settings.update(client.get_settings())
@@ -2,13 +2,21 @@
 import logging
 import os
 from glob import glob
-from typing import Dict
+from typing import Dict, List, Optional
 
 from shapely.geometry import Polygon
 from torchdata.datapipes import functional_datapipe
 from torchdata.datapipes.iter import IterDataPipe
 
-from ukpn.load.meta_data.utils import construct_url, get_gsp_names, get_metadata_from_ukpn_api
+from ukpn.load.meta_data.client import UKPNApiClient, get_default_client
+from ukpn.load.meta_data.gsp_names import GSPNameIndex
+from ukpn.load.meta_data.utils import (
+    construct_url,
+    get_complete_records,
+    get_gsp_names,
+    group_records_by_gsp,
+)
+from ukpn.load.sharding import shard_items
 
 logger = logging.getLogger(__name__)
 
@@ -17,69 +25,124 @@ logger = logging.getLogger(__name__)
 class GetCenterCoordinatesGSPIterDataPipe(IterDataPipe):
     """This Data pipe gives a dictionary of a center long/lat for given GSP csv data"""
 
-    def __init__(self, folder_destination: str = None, file_format: str = "*.csv"):
+    def __init__(
+        self,
+        folder_destination: str = None,
+        file_format: str = "*.csv",
+        shard: bool = False,
+        bulk: bool = True,
+        client: Optional[UKPNApiClient] = None,
+    ):
         """Derives a syntax GSP name for the api call
 
         Args:
             folder_destination: Folder that contains GSP csv files
             file_format: Default file format for the GSPs are "*.csv"
+            shard: If true, every DataLoader worker of every distributed rank only gets
+                the coordinates of its own share of the GSP files, see `shard_items`
+            bulk: If true, the complete register is downloaded once and the records of
+                every GSP are looked up in it, instead of concurrent requests per GSP
+            client: Client sending the requests, the shared default client if None
         """
+        self.shard = shard
+        self.client = client
+
         # Getting the file paths
         file_paths = os.path.join(folder_destination, file_format)
         file_paths = [x for x in glob(file_paths)]
 
-        # Get all the gsp names
-        gsp_names = get_gsp_names()
-        self.gsp_name_dict = {}
-        for file_path in file_paths:
-            base_name = os.path.basename(file_path)
-            file_name = os.path.splitext(base_name)[0]
-            i = 0
-            while i < len(gsp_names):
-                if file_name.upper() in gsp_names[i]:
-                    # Joining with + seperator
-                    gsp_name = gsp_names[i].split(" ")
-                    gsp_name = "+".join(gsp_name)
-                    self.gsp_name_dict[file_name] = gsp_name
-                i += 1
+        # The complete register holds the names and the records of every GSP, the
+        # names alone only need the facets of its first page
+        self.records_by_gsp = None
+        if bulk:
+            data_json = get_complete_records(client=client)
+            gsp_names = get_gsp_names(data_json=data_json)
+            if isinstance(data_json, Dict) and data_json.get("nhits", 0) <= len(
+                data_json["records"]
+            ):
+                self.records_by_gsp = group_records_by_gsp(data_json=data_json)
+            else:
+                logger.info("Paging through the register failed, the GSPs are requested one by one")
+        else:
+            gsp_names = get_gsp_names(client=client)
+
+        # Matching the file names with the gsp names of the register
+        file_names = [os.path.splitext(os.path.basename(x))[0] for x in file_paths]
+        self.register_name_dict, self.ambiguous_names = GSPNameIndex(gsp_names).match_all(
+            file_names
+        )
+        unmatched = set(file_names) - set(self.register_name_dict) - set(self.ambiguous_names)
+        if unmatched:
+            logger.warning(f"No GSP of the register matches the files {sorted(unmatched)}")
+
+        # Joining with + seperator
+        self.gsp_name_dict = {
+            file_name: "+".join(gsp_name.split(" "))
+            for file_name, gsp_name in self.register_name_dict.items()
+        }
 
     def __iter__(self):
         """Getting the geom center of the coordinates"""
 
+        # Only the GSPs of this shard are requested
+        file_names = list(self.gsp_name_dict)
+        if self.shard:
+            file_names = shard_items(file_names)
+
+        if self.records_by_gsp is not None:
+            # Looking the records up in the register
+            records = [self.records_by_gsp.get(self.register_name_dict[x], []) for x in file_names]
+        else:
+            # Requesting every GSP concurrently
+            client = self.client if self.client is not None else get_default_client()
+            api_urls = [construct_url(gsp_names=self.gsp_name_dict[x]) for x in file_names]
+            records = [
+                None if data_json is None else data_json["records"]
+                for data_json in client.get_many_json(api_urls)
+            ]
+
         # Iterating through each_gsp
         gsp_center_coords = {}
-        for file_name, gsp_name in self.gsp_name_dict.items():
-
-            # Constructing the url
-            api_url = construct_url(gsp_names=gsp_name)
-            # Getting the data
-            data_json = get_metadata_from_ukpn_api(api_url=api_url)
-
-            # Getting the records
-            data_records = data_json["records"]
-
-            # Getting the coordinates
-            coords_list = []
-            for item in data_records:
-                if isinstance(item, Dict):
-                    try:
-                        coordinates = item["geometry"]["coordinates"]
-                    except KeyError:
-                        logger.debug(f"Some of the GSPs in {file_name} has no coordinates provided")
-                        pass
-                    else:
-                        if coordinates is None:
-                            pass
-                        else:
-                            coords_list.append(coordinates)
-            try:
-                polygon_geom = Polygon(coords_list)
-            except ValueError:
-                logger.info("To get a center for a polygon, one need four coordinates")
-                logger.debug(f"For {file_name}, coordinates are {coords_list}")
-                pass
-            else:
-                gsp_center = list(polygon_geom.centroid.coords)
+        for file_name, data_records in zip(file_names, records):
+            if data_records is None:
+                continue
+
+            gsp_center = get_gsp_center(data_records=data_records, file_name=file_name)
+            if gsp_center is not None:
                 gsp_center_coords[file_name] = gsp_center
 
         yield gsp_center_coords
+
+
+def get_gsp_center(data_records: List[Dict], file_name: str) -> Optional[List]:
+    """Center of the polygon of the coordinates of the records of a GSP
+
+    Args:
+        data_records: Records of the GSP in the register
+        file_name: Name of the GSP file, for the logs
+
+    Returns:
+        The long/lat of the center, None if there are not enough coordinates
+    """
+    # Getting the coordinates
+    coords_list = []
+    for item in data_records:
+        if isinstance(item, Dict):
+            try:
+                coordinates = item["geometry"]["coordinates"]
+            except KeyError:
+                logger.debug(f"Some of the GSPs in {file_name} has no coordinates provided")
+                pass
+            else:
+                if coordinates is None:
+                    pass
+                else:
+                    coords_list.append(coordinates)
+    try:
+        polygon_geom = Polygon(coords_list)
+    except ValueError:
+        logger.info("To get a center for a polygon, one need four coordinates")
+        logger.debug(f"For {file_name}, coordinates are {coords_list}")
+        return None
+    else:
+        return list(polygon_geom.centroid.coords)
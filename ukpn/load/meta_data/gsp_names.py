@@ -0,0 +1,164 @@
+"""Index of the GSP names, matching the file, register and dashboard names"""
+import logging
+import re
+from bisect import bisect_left
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Voltage suffixes of the register names, e.g. "132KV" or "33kV"
+VOLTAGE_TOKEN = re.compile(r"^\d+(\.\d+)?KV$")
+
+# Smallest similarity of the fuzzy matches
+FUZZY_CUTOFF = 0.8
+
+
+class GSPNameCandidate(NamedTuple):
+    """A GSP name matching a lookup, with its score and the kind of match"""
+
+    name: str
+    score: float
+    match: str
+
+
+def normalise_gsp_name(name: str) -> str:
+    """Normalised key of a GSP name
+
+    The name is split into upper case words on anything which is not a letter or a
+    digit, so underscores, spaces and case do not matter, and the voltage suffixes are
+    dropped, e.g. "canterbury_north" and "CANTERBURY NORTH 132kV" give the same key.
+
+    Args:
+        name: File, register or dashboard name of a GSP
+    """
+    tokens = re.split(r"[^0-9A-Z.]+", name.upper())
+    tokens = [x.strip(".") for x in tokens if x.strip(".") and not VOLTAGE_TOKEN.match(x)]
+    return " ".join(tokens)
+
+
+def get_gsp_file_name(gsp_name: str) -> str:
+    """Name of the csv file of a GSP, lower case words joined by underscores
+
+    Args:
+        gsp_name: Register or dashboard name of the GSP
+    """
+    return "_".join(gsp_name.lower().split())
+
+
+class GSPNameIndex:
+    """Looks up the GSP names matching a name, exactly, by prefix or fuzzily
+
+    The names are indexed by their normalised key, see `normalise_gsp_name`. An exact
+    match of the keys scores 1, a match of the leading words of one key with the
+    other scores between 0.5 and 0.9 depending on the share of the words matched,
+    and a fuzzy match scores half of the similarity of the keys.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        """Indexes the names
+
+        Args:
+            names: GSP names, e.g. from `get_gsp_names`
+        """
+        self.names_by_key: Dict[str, List[str]] = {}
+        for name in names:
+            self.names_by_key.setdefault(normalise_gsp_name(name), []).append(name)
+        self.keys = sorted(self.names_by_key)
+
+    def lookup(
+        self, name: str, fuzzy_cutoff: float = FUZZY_CUTOFF, max_candidates: int = 5
+    ) -> List[GSPNameCandidate]:
+        """Ranked candidates of a name, the best first
+
+        Args:
+            name: Name to look up, e.g. the name of a GSP file
+            fuzzy_cutoff: Smallest similarity of the fuzzy matches, which are only
+                looked for if there is no exact or prefix match
+            max_candidates: Largest number of candidates returned
+
+        Returns:
+            The candidates with their score and "exact", "prefix" or "fuzzy"
+        """
+        key = normalise_gsp_name(name)
+        if not key:
+            return []
+
+        scores = {}
+        for candidate in self.names_by_key.get(key, []):
+            scores[candidate] = (1.0, "exact")
+
+        # Keys starting with the words of the name
+        words = key.split(" ")
+        position = bisect_left(self.keys, key + " ")
+        while position < len(self.keys) and self.keys[position].startswith(key + " "):
+            other_key = self.keys[position]
+            score = 0.5 + 0.4 * len(words) / len(other_key.split(" "))
+            for candidate in self.names_by_key[other_key]:
+                scores.setdefault(candidate, (score, "prefix"))
+            position += 1
+
+        # Keys which are the leading words of the name
+        for i in range(len(words) - 1, 0, -1):
+            other_key = " ".join(words[:i])
+            score = 0.5 + 0.4 * i / len(words)
+            for candidate in self.names_by_key.get(other_key, []):
+                scores.setdefault(candidate, (score, "prefix"))
+
+        if not scores:
+            for other_key in self.keys:
+                similarity = SequenceMatcher(None, key, other_key).ratio()
+                if similarity >= fuzzy_cutoff:
+                    for candidate in self.names_by_key[other_key]:
+                        scores[candidate] = (0.5 * similarity, "fuzzy")
+
+        candidates = [GSPNameCandidate(x, *scores[x]) for x in scores]
+        candidates.sort(key=lambda x: (-x.score, x.name))
+        return candidates[:max_candidates]
+
+    def match(self, name: str, fuzzy_cutoff: float = FUZZY_CUTOFF) -> Optional[str]:
+        """The best GSP name of a name, None if there is none or the best is ambiguous
+
+        Args:
+            name: Name to look up, e.g. the name of a GSP file
+            fuzzy_cutoff: Smallest similarity of the fuzzy matches
+        """
+        candidates = self.lookup(name, fuzzy_cutoff=fuzzy_cutoff)
+        if not candidates:
+            logger.info(f"No GSP name matches {name}")
+            return None
+        if len(candidates) > 1 and candidates[1].score == candidates[0].score:
+            tied = [x.name for x in candidates if x.score == candidates[0].score]
+            logger.warning(f"{name} matches several GSP names equally well: {tied}")
+            return None
+        if candidates[0].match != "exact":
+            logger.info(f"{name} is matched to {candidates[0].name} ({candidates[0].match})")
+        return candidates[0].name
+
+    def match_all(
+        self, names: Iterable[str], fuzzy_cutoff: float = FUZZY_CUTOFF
+    ) -> Tuple[Dict[str, str], Dict[str, List[GSPNameCandidate]]]:
+        """Matches every name, reporting the ones which are ambiguous
+
+        Args:
+            names: Names to look up, e.g. the names of the GSP files
+            fuzzy_cutoff: Smallest similarity of the fuzzy matches
+
+        Returns:
+            The best GSP name of every name with an unambiguous match, and the
+            candidates of every name with several equally good ones
+        """
+        matches, ambiguities = {}, {}
+        for name in names:
+            candidates = self.lookup(name, fuzzy_cutoff=fuzzy_cutoff)
+            if not candidates:
+                continue
+            tied = [x for x in candidates if x.score == candidates[0].score]
+            if len(tied) > 1:
+                ambiguities[name] = tied
+            else:
+                matches[name] = candidates[0].name
+
+        if ambiguities:
+            logger.warning(f"{len(ambiguities)} names match several GSP names: {ambiguities}")
+        return matches, ambiguities
@@ -0,0 +1,58 @@
+"""Datapipe streaming the records of a UKPN dataset"""
+import logging
+from typing import Dict, Optional
+
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.meta_data.client import UKPNApiClient
+from ukpn.load.meta_data.utils import RECORDS_PAGE_SIZE, iterate_records
+
+logger = logging.getLogger(__name__)
+
+
+@functional_datapipe("open_ukpn_records")
+class OpenUKPNRecordsIterDataPipe(IterDataPipe):
+    """This Data pipe yields the records of a UKPN dataset one by one
+
+    The records are requested page by page, or streamed from the export of the
+    dataset beyond the limit of the pages, see `iterate_records`, so that the whole
+    dataset is never held in memory.
+    """
+
+    def __init__(
+        self,
+        dataset_name: str = "embedded-capacity-register",
+        refine: Optional[Dict[str, str]] = None,
+        page_size: int = RECORDS_PAGE_SIZE,
+        export: Optional[bool] = None,
+        client: Optional[UKPNApiClient] = None,
+    ):
+        """Sets the dataset to be streamed
+
+        Args:
+            dataset_name: Name of the dataset, defined by UKPN
+            refine: Refiners of the records, facet name to value, e.g.
+                {"energy_conversion_technology_1": "Photovoltaic"}
+            page_size: Number of records of a page
+            export: If true, the export is always streamed, if false it never is
+            client: Client sending the requests, the shared default client if None
+        """
+        if page_size < 1:
+            raise ValueError(f"page_size must be at least 1, got {page_size}")
+
+        self.dataset_name = dataset_name
+        self.refine = refine
+        self.page_size = page_size
+        self.export = export
+        self.client = client
+
+    def __iter__(self):
+        """Yielding the records as they arrive"""
+        yield from iterate_records(
+            dataset_name=self.dataset_name,
+            refine=self.refine,
+            page_size=self.page_size,
+            export=self.export,
+            client=self.client,
+        )
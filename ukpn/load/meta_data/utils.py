@@ -1,9 +1,10 @@
 """This class is ued to retrieve data through API calls"""
 import json
 import logging
-from typing import Dict, Optional
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
 
-import requests
+from ukpn.load.meta_data.client import UKPNApiClient, get_default_client
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +19,17 @@ FACETS = [
 
 REFINE_FACETS = ["energy_conversion_technology_1", "grid_supply_point"]
 
+# Records api of UKPN, with the search and the download (export) endpoints
+UKPN_API_URL = "https://ukpowernetworks.opendatasoft.com/api/records/1.0"
 
-def get_metadata_from_ukpn_api(api_url: str):
+# Largest start + rows of the search endpoint, the records beyond are only exported
+SEARCH_OFFSET_LIMIT = 10000
+
+# Default number of records of a page of the search endpoint
+RECORDS_PAGE_SIZE = 1000
+
+
+def get_metadata_from_ukpn_api(api_url: str, client: Optional[UKPNApiClient] = None):
     """Function to get the metadata from url api call
 
     This function retrievs metadata through api calls
@@ -27,22 +37,11 @@ def get_metadata_from_ukpn_api(api_url: str):
 
     Args:
         api_url: The api url link that emiits json format data
+        client: Client sending the request, the shared default client if None
     """
-
-    response_api = requests.head(api_url)
-    if not response_api.status_code == 200:
-        logger.info(f"The response from the link {api_url} is unsuccessful")
-        return None
-    else:
-        logger.info(f"The resposne from the link {api_url} is successful")
-
-        # Get the data from the resposne
-        response_api = requests.get(api_url)
-        raw_data = response_api.text
-
-        # Parse the data into json format
-        data_json = json.loads(raw_data)
-        return data_json
+    if client is None:
+        client = get_default_client()
+    return client.get_json(api_url)
 
 
 def construct_url(
@@ -50,6 +49,8 @@ def construct_url(
     gsp_names: str = None,
     number_of_records: str = "5000",
     get_complete_records: Optional[bool] = False,
+    start: Optional[int] = None,
+    refine: Optional[Dict[str, str]] = None,
 ):
     """This function constructs a downloadable url of UKPN PV JSON data
 
@@ -61,6 +62,8 @@ def construct_url(
         gsp_names: The data needed for the GSPs
         number_of_records: Number of records needed to be extracted
         get_complete_records: If yes, gets the link to extract entire ukpn api records
+        start: Offset of the first record, to get the records of a page
+        refine: Refiners of the complete records, facet name to value
 
     Retunrs:
         final_url:
@@ -81,7 +84,7 @@ def construct_url(
     REFINE_FACET_VARIABLES = ["Photovoltaic"]
 
     # Constructing a base url
-    base_url = "https://ukpowernetworks.opendatasoft.com/api/records/1.0/search/?dataset="
+    base_url = UKPN_API_URL + "/search/?dataset="
     base_url = base_url + dataset_name
 
     # A seperator in the url
@@ -92,6 +95,8 @@ def construct_url(
 
     # Number of records needed to be extracted
     total_rows = str("&rows=" + number_of_records)
+    if start:
+        total_rows = total_rows + "&start=" + str(start)
 
     # A facet questionare in the url
     facet_questionare = "facet="
@@ -104,6 +109,8 @@ def construct_url(
     # Get the entire records
     if get_complete_records:
         final_url = [base_url, facet_str]
+        if refine:
+            final_url.append(get_refiners(refine))
         final_url = seperator.join(final_url)
         return final_url
     else:
@@ -129,9 +136,42 @@ def construct_url(
         return final_url
 
 
-def get_gsp_names():
+def get_refiners(refine: Dict[str, str]) -> str:
+    """Refiners of a url, e.g. <refine.grid_supply_point=CANTERBURY+NORTH>
+
+    Args:
+        refine: Facet name to value
+    """
+    return "&".join(f"refine.{k}=" + "+".join(str(v).split(" ")) for k, v in refine.items())
+
+
+def construct_export_url(
+    dataset_name: str = "embedded-capacity-register", refine: Optional[Dict[str, str]] = None
+) -> str:
+    """Constructs the url exporting every record of a dataset as a json array
+
+    Unlike the search urls of `construct_url`, the export has no limit on the number
+    of records and is meant to be streamed, see `iterate_records`.
+
+    Args:
+        dataset_name: Name of the dataset, defined by UKPN
+        refine: Refiners of the records, facet name to value
+    """
+    final_url = UKPN_API_URL + "/download/?dataset=" + dataset_name + "&format=json"
+    if refine:
+        final_url = final_url + "&" + get_refiners(refine)
+    return final_url
+
+
+def get_gsp_names(data_json: Optional[Dict] = None, client: Optional[UKPNApiClient] = None):
     """This function extracts all the Syntaxed GSP names from the api
 
+    Args:
+        data_json: Response of the register with its facet groups, e.g. from
+            `get_complete_records`. If None, only the facets are requested, without
+            any record
+        client: Client sending the request, the shared default client if None
+
     Returns:
         ['BRAMFORD GRID 132kV',
         'WALPOLE GIS 132KV',
@@ -140,9 +180,10 @@ def get_gsp_names():
         'RAYLEIGH MAIN 132KV'
         ...]
     """
-    # Getting all the records
-    api_url = construct_url(get_complete_records=True)
-    data_json = get_metadata_from_ukpn_api(api_url=api_url)
+    # The facet groups come with every page, the first one is enough
+    if data_json is None:
+        api_url = construct_url(get_complete_records=True, number_of_records="0")
+        data_json = get_metadata_from_ukpn_api(api_url=api_url, client=client)
 
     # Getting all the gsp_names
     if isinstance(data_json, Dict):
@@ -160,3 +201,200 @@ def get_gsp_names():
     for each_gsp in gsp_group:
         gsp_names.append(each_gsp["name"])
     return gsp_names
+
+
+def get_complete_records(
+    client: Optional[UKPNApiClient] = None, page_size: int = 5000
+) -> Optional[Dict]:
+    """Downloads the complete Embedded Capacity Register
+
+    The first page holds the facet groups, the records of the register beyond it are
+    requested page by page, see `iterate_records`.
+
+    Args:
+        client: Client sending the requests, the shared default client if None
+        page_size: Number of records of a page
+
+    Returns:
+        The json response of the first page with the records of every page, None if
+        the request failed
+    """
+    api_url = construct_url(get_complete_records=True, number_of_records=str(page_size))
+    data_json = get_metadata_from_ukpn_api(api_url=api_url, client=client)
+
+    if isinstance(data_json, Dict) and data_json.get("nhits", 0) > len(data_json["records"]):
+        records = iterate_records(
+            page_size=page_size, start=len(data_json["records"]), client=client
+        )
+        data_json = dict(data_json, records=data_json["records"] + list(records))
+
+    if isinstance(data_json, Dict) and data_json.get("nhits", 0) > len(data_json["records"]):
+        logger.warning(
+            f"Only {len(data_json['records'])} of the {data_json['nhits']} records "
+            "of the register were returned"
+        )
+    return data_json
+
+
+def iterate_records(
+    dataset_name: str = "embedded-capacity-register",
+    refine: Optional[Dict[str, str]] = None,
+    page_size: int = RECORDS_PAGE_SIZE,
+    start: int = 0,
+    export: Optional[bool] = None,
+    client: Optional[UKPNApiClient] = None,
+) -> Iterator[Dict]:
+    """Iterates over the records of a dataset, page by page or from the streamed export
+
+    The pages of the search endpoint are requested max_workers at a time, so only
+    these pages are held in memory. The search endpoint stops at SEARCH_OFFSET_LIMIT
+    records, larger datasets are streamed from the export endpoint, whose json array
+    is parsed record by record as it arrives.
+
+    Args:
+        dataset_name: Name of the dataset, defined by UKPN
+        refine: Refiners of the records, facet name to value
+        page_size: Number of records of a page of the search endpoint
+        start: Offset of the first record
+        export: If true, the export is streamed, if false the pages are requested, and
+            if None the export is only streamed if the pages cannot reach every record
+        client: Client sending the requests, the shared default client if None
+
+    Returns:
+        The records, in the order of the dataset
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be at least 1, got {page_size}")
+    if client is None:
+        client = get_default_client()
+    if not export and start >= SEARCH_OFFSET_LIMIT:
+        if export is False:
+            raise ValueError(f"start must be below {SEARCH_OFFSET_LIMIT} without the export")
+        export = True
+
+    if not export:
+        page = client.get_json(
+            construct_url(
+                dataset_name=dataset_name,
+                number_of_records=str(min(page_size, SEARCH_OFFSET_LIMIT - start)),
+                get_complete_records=True,
+                start=start,
+                refine=refine,
+            )
+        )
+        if page is None:
+            return
+        number_of_records = page.get("nhits", 0)
+
+        if export is False or number_of_records <= SEARCH_OFFSET_LIMIT:
+            if number_of_records > SEARCH_OFFSET_LIMIT:
+                logger.warning(
+                    f"Only the first {SEARCH_OFFSET_LIMIT} of the {number_of_records} "
+                    f"records of {dataset_name} can be paged, see export"
+                )
+            yield from page["records"]
+            yield from _iterate_pages(
+                client=client,
+                dataset_name=dataset_name,
+                refine=refine,
+                page_size=page_size,
+                start=start + len(page["records"]),
+                end=min(number_of_records, SEARCH_OFFSET_LIMIT),
+            )
+            return
+        logger.info(f"{dataset_name} has {number_of_records} records, streaming the export")
+
+    records = parse_json_array(client.iter_text(construct_export_url(dataset_name, refine)))
+    yield from islice(records, start, None)
+
+
+def _iterate_pages(
+    client: UKPNApiClient,
+    dataset_name: str,
+    refine: Optional[Dict[str, str]],
+    page_size: int,
+    start: int,
+    end: int,
+) -> Iterator[Dict]:
+    """Records of the pages between two offsets, requested max_workers at a time"""
+    starts = list(range(start, end, page_size))
+    for i in range(0, len(starts), client.max_workers):
+        api_urls = [
+            construct_url(
+                dataset_name=dataset_name,
+                number_of_records=str(min(page_size, end - x)),
+                get_complete_records=True,
+                start=x,
+                refine=refine,
+            )
+            for x in starts[i : i + client.max_workers]
+        ]
+        for api_url, page in zip(api_urls, client.get_many_json(api_urls)):
+            if page is None:
+                logger.warning(f"The records of {api_url} are missing")
+                continue
+            yield from page["records"]
+
+
+def parse_json_array(chunks: Iterable[str]) -> Iterator:
+    """Parses the elements of a json array as its text arrives
+
+    Args:
+        chunks: Consecutive pieces of the text of the array
+
+    Returns:
+        The elements of the array, each as soon as its text is complete
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, opened = "", 0, False
+    for chunk in chunks:
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != "[":
+                    raise ValueError("The text is not a json array")
+                opened, position = True, position + 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                break
+            if end == len(buffer):
+                # A number may continue in the next chunk
+                break
+            yield element
+            position = end
+
+    # Nothing arrives if the request failed, which is logged by the client
+    if opened:
+        raise ValueError("The json array is incomplete")
+
+
+def group_records_by_gsp(
+    data_json: Dict, technology: Optional[str] = "Photovoltaic"
+) -> Dict[str, List[Dict]]:
+    """Indexes the records of the register by grid supply point
+
+    The records keep the order of the response, and are filtered like the refiners
+    of `construct_url`, so that every group holds the records of the request of
+    that GSP.
+
+    Args:
+        data_json: Complete records of the register, see `get_complete_records`
+        technology: Energy conversion technology of the records, all if None
+    """
+    records_by_gsp = {}
+    for record in data_json["records"]:
+        fields = record.get("fields", {})
+        if technology is not None and fields.get("energy_conversion_technology_1") != technology:
+            continue
+        records_by_gsp.setdefault(fields.get("grid_supply_point"), []).append(record)
+    return records_by_gsp
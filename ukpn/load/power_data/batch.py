@@ -0,0 +1,203 @@
+"""Batches of GSP training windows as contiguous torch tensors"""
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.power_data.sampler import SampleGSPWindowsIterDataPipe
+
+logger = logging.getLogger(__name__)
+
+
+def gather_gsp_windows(
+    power: np.ndarray,
+    gsp_positions: np.ndarray,
+    t0_positions: np.ndarray,
+    history_length: int,
+    forecast_length: int,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Gathers a batch of windows from the power array with a single fancy index
+
+    Args:
+        power: The C contiguous (time_utc, gsp_id) power array
+        gsp_positions: GSP position of every window
+        t0_positions: t0 position of every window
+        history_length: Number of datetimes up to and including t0
+        forecast_length: Number of datetimes after t0
+        out: Optional (batch, history_length + forecast_length) array to gather into,
+            of the data type of power
+
+    Returns:
+        The (batch, history_length + forecast_length) windows
+    """
+    offsets = np.arange(-history_length + 1, forecast_length + 1)
+    flat_index = (np.asarray(t0_positions)[:, None] + offsets) * power.shape[1]
+    flat_index += np.asarray(gsp_positions)[:, None]
+    return np.take(power.reshape(-1), flat_index, out=out)
+
+
+def empty_batch(
+    shape: Sequence[int], dtype: str = "float32", pin_memory: bool = False
+) -> torch.Tensor:
+    """Preallocated tensor of a batch, in pinned memory if asked for and CUDA is available
+
+    Args:
+        shape: Shape of the tensor
+        dtype: Data type of the tensor, e.g. "float32"
+        pin_memory: If true, the tensor is allocated in pinned memory
+    """
+    return torch.empty(
+        tuple(shape),
+        dtype=getattr(torch, dtype),
+        pin_memory=pin_memory and torch.cuda.is_available(),
+    )
+
+
+def mask_missing_power(power: torch.Tensor, fill_value: float = 0.0) -> torch.Tensor:
+    """Replaces the NaN's of a batch in place and returns the mask of the values present
+
+    Args:
+        power: The (batch, window) power tensor on the CPU
+        fill_value: Value of the missing power
+    """
+    values = power.numpy()
+    mask = torch.empty(power.shape, dtype=torch.bool, pin_memory=power.is_pinned())
+    np.logical_not(np.isnan(values), out=mask.numpy())
+    np.copyto(values, fill_value, where=~mask.numpy())
+    return mask
+
+
+def collate_gsp_windows(
+    windows: List[Dict],
+    fill_value: float = 0.0,
+    pin_memory: bool = False,
+    dtype: str = "float32",
+) -> Dict:
+    """Collates windows of SampleGSPWindows into one preallocated batch
+
+    Args:
+        windows: The windows, dictionaries of the power, the GSP name and the t0
+        fill_value: Value of the missing power in the power tensor
+        pin_memory: If true and CUDA is available, the tensors are in pinned memory
+        dtype: Data type of the power tensor, e.g. "float32"
+
+    Returns:
+        The batch, see BatchGSPWindows, without the GSP positions
+    """
+    power = empty_batch((len(windows), len(windows[0]["power"])), dtype, pin_memory)
+    np.stack([x["power"] for x in windows], out=power.numpy())
+
+    return dict(
+        power=power,
+        mask=mask_missing_power(power, fill_value=fill_value),
+        gsp_id=np.array([x["gsp_id"] for x in windows]),
+        t0=torch.from_numpy(
+            np.array([x["t0"] for x in windows], dtype="datetime64[ns]").view(np.int64)
+        ),
+    )
+
+
+@functional_datapipe("batch_gsp_windows")
+class BatchGSPWindowsIterDataPipe(SampleGSPWindowsIterDataPipe):
+    """Draws batches of (GSP, t0) training windows as contiguous torch tensors
+
+    The windows are indexed, shuffled and shared between the DataLoader workers like in
+    SampleGSPWindows, but every batch is gathered from the power array with a single
+    fancy index, straight into the preallocated memory of a contiguous tensor.
+
+    Every batch is a dictionary of
+        power: (batch, window) tensor, with fill_value for the missing values
+        mask: (batch, window) boolean tensor, true where the power is there
+        gsp_index: (batch,) position of the GSP in the dataset
+        gsp_id: (batch,) array of the GSP names
+        t0: (batch,) t0 in nanoseconds since the epoch
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        history_length: int,
+        forecast_length: int,
+        batch_size: int = 32,
+        drop_last: bool = False,
+        fill_value: float = 0.0,
+        pin_memory: bool = False,
+        dtype: str = "float32",
+        max_nans: int = 0,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+        gsp_coordinates: Optional[Dict[str, Sequence[float]]] = None,
+        min_elevation: float = 0.0,
+    ):
+        """Samples the batches of training windows
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            history_length: Number of datetimes up to and including t0
+            forecast_length: Number of datetimes after t0
+            batch_size: Number of windows in every batch
+            drop_last: If true, the last incomplete batch of every dataset is dropped
+            fill_value: Value of the missing power in the power tensor
+            pin_memory: If true and CUDA is available, the tensors are in pinned memory
+            dtype: Data type of the power tensor, e.g. "float32"
+            max_nans: Largest number of missing values in a window
+            shuffle: If true, the windows are batched in a random order
+            seed: Seed of the shuffling, drawn once if None
+            gsp_coordinates: If given, only the t0's in daylight are sampled
+            min_elevation: Solar elevation in degrees above which it is daylight
+        """
+        super().__init__(
+            source_datapipe=source_datapipe,
+            history_length=history_length,
+            forecast_length=forecast_length,
+            max_nans=max_nans,
+            shuffle=shuffle,
+            seed=seed,
+            gsp_coordinates=gsp_coordinates,
+            min_elevation=min_elevation,
+        )
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.fill_value = fill_value
+        self.pin_memory = pin_memory
+        self.dtype = dtype
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yields the batches of every dataset"""
+        for power, time_utc, gsp_names, gsp_positions, t0_positions in self._iterate_index():
+            # A single contiguous copy in the data type of the tensors, to gather from
+            power = np.ascontiguousarray(power, dtype=self.dtype)
+            t0_nanoseconds = time_utc.astype("datetime64[ns]").view(np.int64)
+
+            for start in range(0, len(t0_positions), self.batch_size):
+                batch_gsps = gsp_positions[start : start + self.batch_size]
+                batch_t0s = t0_positions[start : start + self.batch_size]
+                if self.drop_last and len(batch_t0s) < self.batch_size:
+                    break
+
+                # Gathering straight into the memory of the tensor
+                power_batch = empty_batch(
+                    (len(batch_t0s), self.history_length + self.forecast_length),
+                    dtype=self.dtype,
+                    pin_memory=self.pin_memory,
+                )
+                gather_gsp_windows(
+                    power=power,
+                    gsp_positions=batch_gsps,
+                    t0_positions=batch_t0s,
+                    history_length=self.history_length,
+                    forecast_length=self.forecast_length,
+                    out=power_batch.numpy(),
+                )
+                batch = dict(
+                    power=power_batch,
+                    mask=mask_missing_power(power_batch, fill_value=self.fill_value),
+                )
+                batch["gsp_index"] = torch.from_numpy(batch_gsps.astype(np.int64))
+                batch["gsp_id"] = gsp_names[batch_gsps]
+                batch["t0"] = torch.from_numpy(t0_nanoseconds[batch_t0s])
+                yield batch
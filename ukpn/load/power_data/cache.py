@@ -0,0 +1,135 @@
+"""Parquet cache of the parsed and cleaned GSP dataframes"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+import pandas as pd
+
+from ukpn.load.power_data.manifest import get_file_record
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the parsing or the cleaning changes, to invalidate the cached dataframes
+PIPELINE_VERSION = "1"
+
+# Default size limit of the cache folder, 2 GB
+MAX_CACHE_BYTES = 2 * 1024**3
+
+
+def get_cache_key(
+    file_path: str, preprocess_kwargs: Optional[Dict] = None, csv_schema: Optional[Dict] = None
+) -> str:
+    """Key of a GSP dataframe in the cache
+
+    The key depends on the name and the content of the file, the pipeline version, the
+    csv schema and the pre-processing options, so any change to either gives a new
+    entry. The column of the cached dataframe is named after the file, so two files
+    with the same content have their own entries.
+
+    Args:
+        file_path: Path of the GSP file
+        preprocess_kwargs: Keyword arguments the dataframe is pre-processed with
+        csv_schema: Keyword arguments the csv file is parsed with
+    """
+    key_parts = dict(
+        file_name=os.path.basename(file_path),
+        sha256=get_file_record(file_path)["sha256"],
+        pipeline_version=PIPELINE_VERSION,
+        preprocess_kwargs=preprocess_kwargs,
+        csv_schema=csv_schema,
+    )
+    return hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()
+
+
+def load_from_cache(
+    cache_dir: str, cache_key: str, freq: Optional[str] = None
+) -> Optional[pd.DataFrame]:
+    """Loads a GSP dataframe from the cache, None if it is not cached
+
+    Args:
+        cache_dir: Folder of the cache
+        cache_key: Key of the dataframe, see `get_cache_key`
+        freq: Frequency to restore on the datetime index, which parquet does not keep
+    """
+    cache_path = os.path.join(cache_dir, cache_key + ".parquet")
+    try:
+        data_frame = pd.read_parquet(cache_path, engine="fastparquet")
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+    # Marking the entry as recently used
+    try:
+        os.utime(cache_path)
+    except FileNotFoundError:
+        pass
+
+    if freq is not None:
+        data_frame.index = pd.DatetimeIndex(data_frame.index, freq=freq)
+
+    return data_frame
+
+
+def save_to_cache(
+    data_frame: pd.DataFrame,
+    cache_dir: str,
+    cache_key: str,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+) -> None:
+    """Saves a GSP dataframe to the cache and evicts the least recently used entries
+
+    Args:
+        data_frame: The parsed, and possibly pre-processed, GSP dataframe
+        cache_dir: Folder of the cache
+        cache_key: Key of the dataframe, see `get_cache_key`
+        max_cache_bytes: Size limit of the cache folder
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, cache_key + ".parquet")
+
+    # Writing next to the entry first, so concurrent workers never read a partial file
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    data_frame.to_parquet(temporary_path, engine="fastparquet")
+    os.replace(temporary_path, cache_path)
+
+    evict_from_cache(cache_dir=cache_dir, max_cache_bytes=max_cache_bytes)
+
+
+def evict_from_cache(cache_dir: str, max_cache_bytes: int = MAX_CACHE_BYTES) -> int:
+    """Deletes the least recently used entries until the cache fits in its size limit
+
+    Args:
+        cache_dir: Folder of the cache
+        max_cache_bytes: Size limit of the cache folder
+
+    Returns:
+        The number of evicted entries
+    """
+    cache_entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".parquet"):
+            try:
+                entry_stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            cache_entries.append((entry_stat.st_mtime, entry_stat.st_size, entry.path))
+
+    # Oldest entries first
+    cache_entries.sort()
+    cache_bytes = sum(x[1] for x in cache_entries)
+    evicted = 0
+    for _, size, path in cache_entries:
+        if cache_bytes <= max_cache_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        cache_bytes -= size
+        evicted += 1
+
+    if evicted:
+        logger.info(f"Evicted {evicted} entries from the cache {cache_dir}")
+
+    return evicted
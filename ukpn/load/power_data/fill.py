@@ -0,0 +1,317 @@
+"""Bounded, vectorized filling of the short gaps of the GSP power"""
+import logging
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.power_data.gaps import _check_gap_index, _get_number_of_intervals, get_gap_runs
+
+logger = logging.getLogger(__name__)
+
+FILL_METHODS = ("linear", "clear_sky")
+
+
+def get_filled_power(
+    power: np.ndarray,
+    max_gap_length: Union[int, np.ndarray],
+    method: Union[str, Sequence[str]] = "linear",
+    clear_sky: Optional[np.ndarray] = None,
+    min_clear_sky: float = 10.0,
+    gap_runs: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Fills the gaps of a (time_utc, gsp_id) power array up to a maximum length
+
+    Every value of every fillable gap is computed at once from the run-length gaps,
+    there is no loop over the GSPs or the gaps. Only the gaps with a valid value on
+    both sides are filled, with either a straight line between the two values or, for
+    "clear_sky", the clear sky profile scaled by a straight line between the ratios
+    of the power to the clear sky on both sides.
+
+    Args:
+        power: The aligned power array
+        max_gap_length: Longest gap in intervals which is filled, one for every GSP
+            or a single one
+        method: One of FILL_METHODS, for every GSP or a single one
+        clear_sky: Clear sky (time_utc, gsp_id) or (time_utc,) array, needed by the
+            "clear_sky" method, e.g. from `get_clear_sky_profile`
+        min_clear_sky: Clear sky below which the ratio at a side is unreliable, the
+            ratio of the other side is used instead, or a straight line at night
+        gap_runs: The runs of `get_gap_runs`, computed from the power if None
+
+    Returns:
+        The filled power, the boolean array of the imputed values and the boolean
+        array of the runs which were filled
+    """
+    number_of_datetimes, number_of_gsps = power.shape
+    methods = np.broadcast_to(np.asarray(method), (number_of_gsps,))
+    if not np.isin(methods, FILL_METHODS).all():
+        raise ValueError(f"method must be one of {FILL_METHODS}, got {set(methods)}")
+    use_clear_sky = methods == "clear_sky"
+    if use_clear_sky.any() and clear_sky is None:
+        raise ValueError("The clear_sky method needs the clear sky profile")
+
+    gsp_positions, starts, lengths = get_gap_runs(power) if gap_runs is None else gap_runs
+    max_gap_lengths = np.broadcast_to(np.asarray(max_gap_length), (number_of_gsps,))
+    filled_runs = (
+        (lengths <= max_gap_lengths[gsp_positions])
+        & (starts > 0)
+        & (starts + lengths < number_of_datetimes)
+    )
+    gsps, starts, lengths = gsp_positions[filled_runs], starts[filled_runs], lengths[filled_runs]
+
+    # Position of every imputed value and its distance from the start of its gap
+    steps = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = np.repeat(starts, lengths) + steps
+    columns = np.repeat(gsps, lengths)
+    weights = (steps + 1) / np.repeat(lengths + 1, lengths)
+
+    left = power[starts - 1, gsps]
+    right = power[starts + lengths, gsps]
+    values = _interpolate(left, right, lengths, weights)
+
+    if use_clear_sky.any():
+        clear_sky = np.broadcast_to(
+            clear_sky.reshape(number_of_datetimes, -1), (number_of_datetimes, number_of_gsps)
+        )
+        values = np.where(
+            use_clear_sky[columns],
+            _get_clear_sky_values(
+                left=left,
+                right=right,
+                clear_sky=clear_sky,
+                starts=starts,
+                lengths=lengths,
+                gsps=gsps,
+                rows=rows,
+                columns=columns,
+                weights=weights,
+                min_clear_sky=min_clear_sky,
+                linear_values=values,
+            ),
+            values,
+        )
+
+    filled_power = power.copy()
+    filled_power[rows, columns] = values
+    imputed = np.zeros(power.shape, dtype=bool)
+    imputed[rows, columns] = True
+
+    return filled_power, imputed, filled_runs
+
+
+def _interpolate(
+    left: np.ndarray, right: np.ndarray, lengths: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """Straight lines from the left to the right value of every gap"""
+    left = np.repeat(left, lengths)
+    return left + weights * (np.repeat(right, lengths) - left)
+
+
+def _get_clear_sky_values(
+    left: np.ndarray,
+    right: np.ndarray,
+    clear_sky: np.ndarray,
+    starts: np.ndarray,
+    lengths: np.ndarray,
+    gsps: np.ndarray,
+    rows: np.ndarray,
+    columns: np.ndarray,
+    weights: np.ndarray,
+    min_clear_sky: float,
+    linear_values: np.ndarray,
+) -> np.ndarray:
+    """The clear sky profile scaled by the interpolated clear sky ratios"""
+    clear_sky_left = clear_sky[starts - 1, gsps]
+    clear_sky_right = clear_sky[starts + lengths, gsps]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_left = np.where(clear_sky_left >= min_clear_sky, left / clear_sky_left, np.nan)
+        ratio_right = np.where(clear_sky_right >= min_clear_sky, right / clear_sky_right, np.nan)
+    ratio_left, ratio_right = (
+        np.where(np.isnan(ratio_left), ratio_right, ratio_left),
+        np.where(np.isnan(ratio_right), ratio_left, ratio_right),
+    )
+
+    values = _interpolate(ratio_left, ratio_right, lengths, weights) * clear_sky[rows, columns]
+
+    # Gaps at night have no reliable ratio on either side
+    return np.where(np.isnan(values), linear_values, values)
+
+
+def fill_gsp_gaps(
+    xarray_dataset: xr.Dataset,
+    max_gap_length: Union[int, str, Dict[str, Union[int, str]]],
+    method: Union[str, Dict[str, str]] = "linear",
+    clear_sky: Optional[np.ndarray] = None,
+    min_clear_sky: float = 10.0,
+) -> xr.Dataset:
+    """Fills the short gaps of the power of the GSP dataset
+
+    The imputed values are marked in an "imputed" variable. If the dataset has a gap
+    index, see `add_gap_index`, the gaps are read from it and the filled gaps are
+    removed from it.
+
+    Args:
+        xarray_dataset: The aligned GSP dataset, on a regular time grid
+        max_gap_length: Longest gap which is filled, a number of intervals or a duration
+            like "1H", either a single one or one per GSP name, the GSPs with 0 or
+            missing from the dictionary are not filled
+        method: One of FILL_METHODS, either a single one or one per GSP name, GSPs
+            missing from the dictionary are filled linearly
+        clear_sky: Clear sky (time_utc, gsp_id) or (time_utc,) array of the "clear_sky"
+            method, e.g. from `get_clear_sky_profile`, only read for the GSPs of that
+            method, the other columns may be NaN
+        min_clear_sky: Clear sky below which the ratio at a side is unreliable
+    """
+    gsp_ids = xarray_dataset.gsp_id.values
+    if not isinstance(max_gap_length, dict):
+        max_gap_length = {x: max_gap_length for x in gsp_ids}
+    max_gap_lengths = np.array(
+        [
+            _get_number_of_intervals(xarray_dataset, max_gap_length[x], minimum=0)
+            if x in max_gap_length
+            else 0
+            for x in gsp_ids
+        ]
+    )
+    if isinstance(method, dict):
+        method = [method.get(x, "linear") for x in gsp_ids]
+
+    gap_runs = None
+    has_gap_index = "gap_start" in xarray_dataset
+    if has_gap_index:
+        _check_gap_index(xarray_dataset)
+        # The gaps of the GSPs which are not in the dataset any more are left out
+        gap_positions = xarray_dataset.indexes["gsp_id"].get_indexer(
+            xarray_dataset.gap_gsp_id.values
+        )
+        selected = np.flatnonzero(gap_positions >= 0)
+        gap_runs = (
+            gap_positions[selected].astype(np.int32),
+            xarray_dataset.gap_start.values[selected],
+            xarray_dataset.gap_length.values[selected],
+        )
+
+    power = xarray_dataset.power.transpose("time_utc", "gsp_id").values
+    filled_power, imputed, filled_runs = get_filled_power(
+        power,
+        max_gap_length=max_gap_lengths,
+        method=method,
+        clear_sky=clear_sky,
+        min_clear_sky=min_clear_sky,
+        gap_runs=gap_runs,
+    )
+    logger.info(f"{int(filled_runs.sum())} gaps of {int(imputed.sum())} values are filled")
+
+    xarray_dataset = xarray_dataset.assign(
+        power=(("time_utc", "gsp_id"), filled_power),
+        imputed=(("time_utc", "gsp_id"), imputed),
+    )
+
+    if has_gap_index:
+        # Only the gaps which are left stay in the index
+        remaining = np.ones(xarray_dataset.sizes["gap"], dtype=bool)
+        remaining[selected[filled_runs]] = False
+        xarray_dataset = xarray_dataset.isel(gap=remaining).assign(
+            gsp_gap_count=(
+                "gsp_id",
+                np.bincount(gap_runs[0][~filled_runs], minlength=len(gsp_ids)),
+            )
+        )
+
+    return xarray_dataset
+
+
+def get_clear_sky_profile(
+    time_utc: np.ndarray, gsp_coordinates: Sequence[Sequence[float]]
+) -> np.ndarray:
+    """Clear sky global horizontal irradiance (time_utc, gsp_id) array in W/m2
+
+    Uses the Haurwitz model of pvlib, which only depends on the solar position.
+
+    Args:
+        time_utc: Naive UTC datetimes
+        gsp_coordinates: Longitude and latitude of every GSP, e.g. the centers from
+            GetCenterCoordinatesGSP
+    """
+    import pvlib
+
+    times = pd.DatetimeIndex(time_utc).tz_localize("UTC")
+    clear_sky = np.zeros((len(times), len(gsp_coordinates)))
+    for i, coordinates in enumerate(gsp_coordinates):
+        longitude, latitude = np.ravel(coordinates)[:2]
+        location = pvlib.location.Location(latitude=latitude, longitude=longitude)
+        clear_sky[:, i] = location.get_clearsky(times, model="haurwitz")["ghi"].to_numpy()
+    return clear_sky
+
+
+@functional_datapipe("fill_gsp_gaps")
+class FillGSPGapsIterDataPipe(IterDataPipe):
+    """Fills the short gaps of the power of every dataset, marking the imputed values
+
+    In the streaming modes of OpenGSPData every dataset is filled on its own, so the
+    gaps spanning two consecutive datasets are not filled.
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        max_gap_length: Union[int, str, Dict[str, Union[int, str]]],
+        method: Union[str, Dict[str, str]] = "linear",
+        gsp_coordinates: Optional[Dict[str, Sequence[float]]] = None,
+        min_clear_sky: float = 10.0,
+    ):
+        """Fills the gaps of the GSP datasets
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            max_gap_length: Longest gap which is filled, a number of intervals or a
+                duration, either a single one or one per GSP name
+            method: One of FILL_METHODS, either a single one or one per GSP name
+            gsp_coordinates: Longitude and latitude of the GSP names of the "clear_sky"
+                method, e.g. from GetCenterCoordinatesGSP
+            min_clear_sky: Clear sky in W/m2 below which the ratio at a side is unreliable
+        """
+        methods = set(method.values()) if isinstance(method, dict) else {method}
+        if not methods <= set(FILL_METHODS):
+            raise ValueError(f"method must be one of {FILL_METHODS}, got {methods}")
+        if "clear_sky" in methods and gsp_coordinates is None:
+            raise ValueError("The clear_sky method needs the gsp_coordinates")
+
+        self.source_datapipe = source_datapipe
+        self.max_gap_length = max_gap_length
+        self.method = method
+        self.gsp_coordinates = gsp_coordinates
+        self.min_clear_sky = min_clear_sky
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields every dataset with its short gaps filled"""
+        for xarray_dataset in self.source_datapipe:
+            gsp_ids = list(xarray_dataset.gsp_id.values)
+            if isinstance(self.method, dict):
+                clear_sky_gsps = [x for x in gsp_ids if self.method.get(x) == "clear_sky"]
+            else:
+                clear_sky_gsps = gsp_ids if self.method == "clear_sky" else []
+
+            # The clear sky profile is only computed for the GSPs filled with it
+            clear_sky = None
+            if clear_sky_gsps:
+                missing = [x for x in clear_sky_gsps if x not in self.gsp_coordinates]
+                if missing:
+                    raise ValueError(f"The clear_sky method needs the coordinates of {missing}")
+                clear_sky = np.full((xarray_dataset.sizes["time_utc"], len(gsp_ids)), np.nan)
+                clear_sky[:, [gsp_ids.index(x) for x in clear_sky_gsps]] = get_clear_sky_profile(
+                    time_utc=xarray_dataset.time_utc.values,
+                    gsp_coordinates=[self.gsp_coordinates[x] for x in clear_sky_gsps],
+                )
+
+            yield fill_gsp_gaps(
+                xarray_dataset=xarray_dataset,
+                max_gap_length=self.max_gap_length,
+                method=self.method,
+                clear_sky=clear_sky,
+                min_clear_sky=self.min_clear_sky,
+            )
@@ -0,0 +1,249 @@
+"""Run-length index of the gaps in the GSP power, queried without the power array"""
+import logging
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+logger = logging.getLogger(__name__)
+
+
+def get_gap_runs(power: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Run-length encodes the NaN's of a (time_utc, gsp_id) power array in one pass
+
+    Args:
+        power: The aligned power array
+
+    Returns:
+        The GSP position, the start position and the length of every run of NaN's,
+        sorted by GSP and then by start
+    """
+    number_of_gsps = power.shape[1]
+
+    # Padding every GSP with valid values, so every run has a start and an end
+    missing = np.zeros((number_of_gsps, power.shape[0] + 2), dtype=np.int8)
+    missing[:, 1:-1] = np.isnan(power).T
+    edges = np.diff(missing, axis=1)
+
+    # The row major order of nonzero sorts the runs by GSP and then by start
+    gsp_positions, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    return gsp_positions.astype(np.int32), starts.astype(np.int64), (ends - starts).astype(np.int64)
+
+
+def add_gap_index(xarray_dataset: xr.Dataset, variable: str = "power") -> xr.Dataset:
+    """Adds the run-length index of the gaps of every GSP to the dataset
+
+    The runs of NaN's are stored over a "gap" dimension, sorted by GSP and then by
+    start, with their GSP ("gap_gsp_id"), their start position in time_utc ("gap_start")
+    and their length in intervals ("gap_length"). "gsp_gap_count" is the number of runs
+    of every GSP. The index is written with the dataset, and the query functions only
+    read it. The positions are relative to the time grid of the dataset, which is kept
+    in the attributes of "gap_start", so the index has to be rebuilt after selecting
+    datetimes, while a selection of GSPs keeps it valid.
+
+    Args:
+        xarray_dataset: The aligned GSP dataset, on a regular time grid
+        variable: Variable to index the gaps of
+    """
+    power = xarray_dataset[variable].transpose("time_utc", "gsp_id").values
+    gsp_positions, starts, lengths = get_gap_runs(power)
+
+    logger.info(f"{len(starts)} gaps of {int(lengths.sum())} intervals are indexed")
+    time_utc = xarray_dataset.indexes["time_utc"]
+    time_grid = dict(time_origin=str(time_utc[0]) if len(time_utc) else "", time_size=len(time_utc))
+    return xarray_dataset.assign(
+        gap_gsp_id=("gap", xarray_dataset.gsp_id.values[gsp_positions]),
+        gap_start=("gap", starts, time_grid),
+        gap_length=("gap", lengths),
+        gsp_gap_count=("gsp_id", np.bincount(gsp_positions, minlength=power.shape[1])),
+    )
+
+
+def get_gsp_gaps(xarray_dataset: xr.Dataset, gsp_id: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Start positions and lengths of the gaps of a GSP, read from the gap index
+
+    Args:
+        xarray_dataset: Dataset with the gap index, see `add_gap_index`
+        gsp_id: Name of the GSP
+    """
+    _check_gap_index(xarray_dataset)
+
+    gsp_position = xarray_dataset.indexes["gsp_id"].get_loc(gsp_id)
+    gap_counts = xarray_dataset["gsp_gap_count"].values
+    offset = int(gap_counts[:gsp_position].sum())
+    gaps = slice(offset, offset + int(gap_counts[gsp_position]))
+
+    # The offsets only hold while the GSPs are those of the index, in the same order
+    gap_gsp_ids = xarray_dataset["gap_gsp_id"].values
+    if len(gap_gsp_ids[gaps]) != gap_counts[gsp_position] or (gap_gsp_ids[gaps] != gsp_id).any():
+        gaps = np.flatnonzero(gap_gsp_ids == gsp_id)
+
+    return xarray_dataset["gap_start"].values[gaps], xarray_dataset["gap_length"].values[gaps]
+
+
+def get_longest_gap(xarray_dataset: xr.Dataset, gsp_id: str) -> Optional[Dict]:
+    """The longest gap of a GSP, the earliest one if several are as long
+
+    Args:
+        xarray_dataset: Dataset with the gap index, see `add_gap_index`
+        gsp_id: Name of the GSP
+
+    Returns:
+        The first and last missing datetimes and the length of the gap in intervals,
+        None if the GSP has no gap
+    """
+    starts, lengths = get_gsp_gaps(xarray_dataset=xarray_dataset, gsp_id=gsp_id)
+    if len(starts) == 0:
+        return None
+
+    longest = int(np.argmax(lengths))
+    time_utc = xarray_dataset.indexes["time_utc"]
+    return dict(
+        start=time_utc[starts[longest]],
+        end=time_utc[starts[longest] + lengths[longest] - 1],
+        length=int(lengths[longest]),
+    )
+
+
+def get_coverage(
+    xarray_dataset: xr.Dataset,
+    gsp_id: str,
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+) -> float:
+    """Fraction of the datetimes of a GSP between start and end which are not missing
+
+    Args:
+        xarray_dataset: Dataset with the gap index, see `add_gap_index`
+        gsp_id: Name of the GSP
+        start: First datetime, inclusive, the start of the dataset if None
+        end: Last datetime, inclusive, the end of the dataset if None
+
+    Returns:
+        The coverage, NaN if there is no datetime between start and end
+    """
+    first, last = _get_time_positions(xarray_dataset=xarray_dataset, start=start, end=end)
+    if last <= first:
+        return np.nan
+
+    starts, lengths = get_gsp_gaps(xarray_dataset=xarray_dataset, gsp_id=gsp_id)
+    overlaps = np.minimum(starts + lengths, last) - np.maximum(starts, first)
+    missing = int(np.clip(overlaps, 0, None).sum())
+
+    return 1 - missing / (last - first)
+
+
+def get_complete_windows(
+    xarray_dataset: xr.Dataset,
+    gsp_id: str,
+    length: Union[int, str],
+    start: Optional[Union[str, pd.Timestamp]] = None,
+    end: Optional[Union[str, pd.Timestamp]] = None,
+) -> pd.DataFrame:
+    """The runs of a GSP without missing values which hold a window of the length
+
+    Every datetime from the start of a run up to `length - 1` intervals before its last
+    datetime starts a complete window.
+
+    Args:
+        xarray_dataset: Dataset with the gap index, see `add_gap_index`
+        gsp_id: Name of the GSP
+        length: Length of the windows, a number of intervals or a duration like "1D"
+        start: First datetime of the windows, the start of the dataset if None
+        end: Last datetime of the windows, the end of the dataset if None
+
+    Returns:
+        The first and last datetimes of every run and the number of windows in it
+    """
+    length = _get_number_of_intervals(xarray_dataset=xarray_dataset, length=length)
+    first, last = _get_time_positions(xarray_dataset=xarray_dataset, start=start, end=end)
+    starts, lengths = get_gsp_gaps(xarray_dataset=xarray_dataset, gsp_id=gsp_id)
+
+    # The complete runs lie between the gaps
+    run_starts = np.clip(np.concatenate([[first], starts + lengths]), first, last)
+    run_ends = np.clip(np.concatenate([starts, [last]]), first, last)
+    windows = run_ends - run_starts - length + 1
+    runs = windows > 0
+
+    time_utc = xarray_dataset.indexes["time_utc"]
+    return pd.DataFrame(
+        dict(
+            start=time_utc[run_starts[runs]],
+            end=time_utc[run_ends[runs] - 1],
+            windows=windows[runs],
+        )
+    )
+
+
+def _check_gap_index(xarray_dataset: xr.Dataset):
+    """Raises a ValueError if the dataset has no gap index or another time grid"""
+    if "gap_gsp_id" not in xarray_dataset:
+        raise ValueError("The dataset has no gap index, see add_gap_index")
+
+    time_utc = xarray_dataset.indexes["time_utc"]
+    attrs = xarray_dataset["gap_start"].attrs
+    time_origin = str(time_utc[0]) if len(time_utc) else ""
+    if attrs.get("time_origin") != time_origin or attrs.get("time_size") != len(time_utc):
+        raise ValueError(
+            "The gap index was built on another time grid, the datetimes were selected "
+            "after add_gap_index, which has to be applied again"
+        )
+
+
+def _get_time_positions(
+    xarray_dataset: xr.Dataset,
+    start: Optional[Union[str, pd.Timestamp]],
+    end: Optional[Union[str, pd.Timestamp]],
+) -> Tuple[int, int]:
+    """Positions of the first datetime from start and after the last one up to end"""
+    time_utc = xarray_dataset.indexes["time_utc"]
+    first = 0 if start is None else int(time_utc.searchsorted(pd.Timestamp(start), "left"))
+    last = len(time_utc) if end is None else int(time_utc.searchsorted(pd.Timestamp(end), "right"))
+    return first, last
+
+
+def _get_number_of_intervals(
+    xarray_dataset: xr.Dataset, length: Union[int, str], minimum: int = 1
+) -> int:
+    """Number of intervals of the time grid in a length, which must be at least minimum"""
+    if isinstance(length, str):
+        time_utc = xarray_dataset.indexes["time_utc"]
+        if len(time_utc) < 2:
+            raise ValueError("The time grid needs two datetimes to convert durations")
+        number_of_intervals = pd.Timedelta(length) / (time_utc[1] - time_utc[0])
+        if number_of_intervals != int(number_of_intervals):
+            raise ValueError(f"{length} is not a whole number of intervals of the time grid")
+        length = int(number_of_intervals)
+
+    if length < minimum:
+        raise ValueError(f"length must be at least {minimum} intervals, got {length}")
+    return length
+
+
+@functional_datapipe("add_gap_index")
+class AddGapIndexIterDataPipe(IterDataPipe):
+    """Adds the run-length index of the gaps to every dataset
+
+    In the streaming modes of OpenGSPData every dataset is indexed on its own, so the
+    positions are relative to the time grid of each dataset.
+    """
+
+    def __init__(self, source_datapipe: IterDataPipe, variable: str = "power"):
+        """Indexes the gaps of the GSP datasets
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            variable: Variable to index the gaps of
+        """
+        self.source_datapipe = source_datapipe
+        self.variable = variable
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields every dataset with its gap index"""
+        for xarray_dataset in self.source_datapipe:
+            yield add_gap_index(xarray_dataset=xarray_dataset, variable=self.variable)
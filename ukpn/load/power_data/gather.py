@@ -0,0 +1,51 @@
+"""Gathering of the GSP datasets loaded by separate shards"""
+import logging
+from typing import Iterator, Optional
+
+import torch.distributed as dist
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.power_data.utils import gather_gsp_datasets
+
+logger = logging.getLogger(__name__)
+
+
+@functional_datapipe("gather_gsp_datasets")
+class GatherGSPDatasetsIterDataPipe(IterDataPipe):
+    """Gathers the datasets of every shard into the full aligned dataset
+
+    For pipelines which need every GSP at once after a sharded OpenGSPData, e.g. from a
+    DataLoader whose workers each load their own GSP files.
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        freq: Optional[str] = None,
+        across_ranks: bool = False,
+    ):
+        """Gathers the datasets
+
+        Args:
+            source_datapipe: Datapipe or DataLoader yielding the datasets of the shards
+            freq: Frequency of the time grid, used to keep the gathered grid regular
+            across_ranks: If true and torch.distributed is initialized, the datasets of
+                every rank are gathered too, and every rank yields the full dataset
+        """
+        self.source_datapipe = source_datapipe
+        self.freq = freq
+        self.across_ranks = across_ranks
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields the gathered dataset"""
+        xarray_datasets = list(self.source_datapipe)
+
+        if self.across_ranks and dist.is_available() and dist.is_initialized():
+            rank_datasets = [None] * dist.get_world_size()
+            dist.all_gather_object(rank_datasets, xarray_datasets)
+            xarray_datasets = [x for datasets in rank_datasets for x in datasets]
+
+        logger.info(f"Gathering {len(xarray_datasets)} datasets")
+        yield gather_gsp_datasets(xarray_datasets=xarray_datasets, freq=self.freq)
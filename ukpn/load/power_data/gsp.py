@@ -1,34 +1,76 @@
 """GSP Loader"""
 import logging
+import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, Iterator, Optional, Union
 
+import numpy as np
 import pandas as pd
 import xarray as xr
 from torchdata.datapipes import functional_datapipe
 from torchdata.datapipes.iter import IterDataPipe
 
+from ukpn.load.power_data.lazy import open_gsp_data_lazy
+from ukpn.load.power_data.manifest import get_file_status, load_manifest, save_manifest
+from ukpn.load.power_data.memmap import save_memmap_cache
+from ukpn.load.power_data.metrics import PipelineMetrics, get_path_size
 from ukpn.load.power_data.utils import (
-    bst_to_utc,
-    check_for_negative_data,
+    POWER_DTYPES,
+    assemble_gsp_dataset,
     convert_xarray_to_netcdf,
+    convert_xarray_to_zarr,
     get_gsp_data_in_dict,
+    get_gsp_file_paths,
+    get_power_encoding,
+    iterate_gsp_data,
+    iterate_gsp_dataset_windows,
+    merge_gsp_data_into_dataset,
+    to_naive_utc,
 )
+from ukpn.load.sharding import get_shard_info, shard_items
 
 logger = logging.getLogger(__name__)
 
+STREAMING_MODES = ("dataset", "gsp", "window")
+
 
 @functional_datapipe("open_gsp_data")
 class OpenGSPDataIterDataPipe(IterDataPipe):
-    """This method loads GSP power data from .csv files and writes data into NetCDF file"""
+    """This method loads GSP power data from .csv files and writes data into NetCDF file
+
+    By default the whole aligned dataset is yielded once. The "gsp" mode streams every
+    GSP as soon as it is cleaned, the "window" mode yields time windows of the aligned
+    array once every GSP file has been loaded.
+    """
 
     def __init__(
         self,
-        folder_destination: Path[Union, str],
+        folder_destination: Union[Path, str],
         freq: str = "10Min",
         folder_to_save: Optional[str] = None,
         file_name: Optional[str] = None,
         write_as_netcdf: bool = False,
+        ambiguous: str = "standard",
+        nonexistent: str = "standard",
+        max_workers: Optional[int] = None,
+        executor: str = "process",
+        incremental: bool = False,
+        write_as_zarr: bool = False,
+        zarr_file_name: Optional[str] = None,
+        zarr_chunks: Optional[Dict[str, int]] = None,
+        zarr_compressor: Optional[str] = "zstd",
+        zarr_append: bool = False,
+        cache_dir: Optional[str] = None,
+        mode: str = "dataset",
+        window: str = "7D",
+        lazy: bool = False,
+        csv_schema: Optional[Dict] = None,
+        dtype: str = "float64",
+        memory_limit: Optional[int] = None,
+        memmap_folder: Optional[str] = None,
+        shard: bool = False,
+        metrics: Optional[PipelineMetrics] = None,
     ):
         """This function reads the csv data into a big dataframe
 
@@ -38,6 +80,54 @@ class OpenGSPDataIterDataPipe(IterDataPipe):
             folder_to_save: Folder to save the netcdf files
             file_name: Intended file name for the netcdf file
             write_as_netcdf: If true, writes the data into a NetCDF file
+            ambiguous: Policy for the repeated autumn hour when converting to UTC,
+                one of "standard" (the default), "daylight", "infer" or "NaT"
+            nonexistent: Policy for the skipped spring hour when converting to UTC,
+                one of "standard", "shift_forward", "shift_backward" or "NaT"
+            max_workers: Number of workers loading and pre-processing the GSPs in parallel,
+                if None the GSPs are processed serially
+            executor: Either "process" or "thread", the type of the pool of workers
+            incremental: If true, only the files or rows that changed since the last run
+                are processed and merged into the stored NetCDF file, which is tracked
+                by a manifest saved next to it. The GSPs whose files were deleted are
+                dropped from it. The appended rows are converted to UTC on their own,
+                so ambiguous="infer" is not supported
+            write_as_zarr: If true, writes the data into a chunked and compressed Zarr store
+            zarr_file_name: Name of the Zarr store, defaults to file_name with a .zarr suffix
+            zarr_chunks: Chunk sizes along "time_utc" and "gsp_id" of the Zarr store
+            zarr_compressor: Blosc compressor of the Zarr store, or None for no compression
+            zarr_append: If true, only the datetimes after the ones already in the Zarr
+                store are appended to it, instead of leaving an existing store untouched.
+                In the incremental mode the store is rewritten whenever the GSP files
+                changed, unless this is true and only later datetimes were appended
+            cache_dir: If given, the cleaned dataframe of every GSP file is cached as parquet
+                in this folder and unchanged files skip the csv parsing on the next runs
+            mode: What every iteration yields, one of
+                "dataset" (the whole aligned dataset, once),
+                "gsp" (one cleaned GSP at a time, as it is loaded) or
+                "window" (consecutive time windows across all the GSPs)
+            window: Length of the time windows in the "window" mode, e.g. "7D"
+            lazy: If true, the "dataset" mode yields a dask backed dataset with a task per
+                GSP file, which is only computed a whole file at a time, for example when
+                written
+            csv_schema: Keyword arguments of `load_csv_to_pandas` describing the files,
+                e.g. UKPN_CSV_SCHEMA for the fast path with an explicit datetime format
+            dtype: Data type of the power, one of POWER_DTYPES. "float32" halves the memory
+                and the files, "int16" keeps float32 in memory but stores the power as
+                scaled and offset int16 in the NetCDF file and the Zarr store
+            memory_limit: If given, the resident memory of the process in bytes which the
+                aligned array must fit in. The "dataset" mode refuses to allocate beyond
+                it, the "window" mode splits the windows to fit in it
+            memmap_folder: If given, the dataset is also exported to a memory-mapped
+                training cache in this folder, see `save_memmap_cache`
+            shard: If true, every DataLoader worker of every distributed rank only loads
+                its own share of the GSP files, see `shard_items`. The datasets of the
+                shards can be gathered back with GatherGSPDatasets. They are marked
+                with the "shard_id" and "number_of_shards" attributes, so that
+                SampleGSPWindows and BatchGSPWindows keep all of their windows
+            metrics: If given, the wall time, rows and bytes of every stage of every GSP
+                are recorded in it, in the process iterating the datapipe. The GSPs of
+                the lazy dataset are only loaded later and are not recorded
 
         """
 
@@ -46,60 +136,363 @@ class OpenGSPDataIterDataPipe(IterDataPipe):
         self.folder_to_save = folder_to_save
         self.file_name = file_name
         self.write_as_netcdf = write_as_netcdf
+        self.ambiguous = ambiguous
+        self.nonexistent = nonexistent
+        self.max_workers = max_workers
+        self.executor = executor
+        self.incremental = incremental
+        self.write_as_zarr = write_as_zarr
+        self.zarr_file_name = zarr_file_name
+        self.zarr_chunks = zarr_chunks
+        self.zarr_compressor = zarr_compressor
+        self.zarr_append = zarr_append
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.window = window
+        self.lazy = lazy
+        self.csv_schema = csv_schema
+        self.dtype = dtype
+        self.memory_limit = memory_limit
+        self.memmap_folder = memmap_folder
+        self.shard = shard
+        self.metrics = metrics
+
+        if mode not in STREAMING_MODES:
+            raise ValueError(f"mode must be one of {STREAMING_MODES}, got {mode}")
+        if mode != "dataset" and (write_as_netcdf or incremental or memmap_folder):
+            raise ValueError(
+                "Writing NetCDF files, the memory-mapped cache and the incremental mode "
+                "need mode='dataset'"
+            )
+        if incremental and ambiguous == "infer":
+            raise ValueError(
+                "The appended rows are converted on their own in the incremental mode, "
+                "where the repeated autumn hour cannot be inferred, use another ambiguous"
+            )
+        if lazy and (mode != "dataset" or incremental):
+            raise ValueError("The lazy dataset needs mode='dataset' and no incremental mode")
+        if dtype not in POWER_DTYPES:
+            raise ValueError(f"dtype must be one of {tuple(POWER_DTYPES)}, got {dtype}")
+        if shard and (write_as_netcdf or write_as_zarr or incremental or memmap_folder):
+            raise ValueError("The shards cannot write files, gather them first")
+        if mode == "gsp" and write_as_zarr:
+            raise ValueError("Writing Zarr stores is only supported in the dataset or window mode")
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """This yields the xarray Dataset, whole or in chunks depending on the mode"""
+        if not self.shard:
+            yield from self._iterate_datasets()
+            return
+
+        # The shard is marked, so that the samplers do not split the windows again
+        shard_id, number_of_shards = get_shard_info()
+        for xarray_dataset in self._iterate_datasets():
+            yield xarray_dataset.assign_attrs(shard_id=shard_id, number_of_shards=number_of_shards)
 
-    def __iter__(self) -> xr.DataArray:
-        """This returns the xarray Dataarray"""
+    def _iterate_datasets(self) -> Iterator[xr.Dataset]:
+        """Loads the GSP files and yields the datasets of the mode"""
         # File path as posix for Windows users
         folder_destination = Path(self.folder_destination).as_posix()
 
-        # Loading every csv file from the path into a dataframe
-        gsp_data_in_dict = get_gsp_data_in_dict(folder_destination=folder_destination)
+        if self.incremental:
+            yield self._update_stored_dataset(folder_destination=folder_destination)
+            return
 
-        # Declaring final dataframe
-        gsp_dataframe = pd.DataFrame()
+        # Only the files of this shard are loaded
+        file_paths = None
+        if self.shard:
+            file_paths = shard_items(get_gsp_file_paths(folder_destination=folder_destination))
+            logger.info(f"Loading {len(file_paths)} GSP files in this shard")
 
-        # Pre-processing every data frame
-        for gsp_name, data_frame in gsp_data_in_dict.items():
+        if self.lazy:
+            final_dataset = open_gsp_data_lazy(
+                folder_destination=folder_destination,
+                freq=self.freq,
+                ambiguous=self.ambiguous,
+                nonexistent=self.nonexistent,
+                cache_dir=self.cache_dir,
+                csv_schema=self.csv_schema,
+                dtype=POWER_DTYPES[self.dtype],
+                file_paths=file_paths,
+            )
+            self._write_dataset(final_dataset=final_dataset)
+            yield final_dataset
+            return
+
+        # Loading and pre-processing every csv file from the path lazily
+        gsp_data = iterate_gsp_data(
+            folder_destination=folder_destination,
+            max_workers=self.max_workers,
+            executor=self.executor,
+            preprocess_kwargs=dict(
+                freq=self.freq, ambiguous=self.ambiguous, nonexistent=self.nonexistent
+            ),
+            file_paths=file_paths,
+            cache_dir=self.cache_dir,
+            csv_schema=self.csv_schema,
+            metrics=self.metrics,
+        )
 
-            # Check for negative data and replace with NaN's
-            non_negative_df = check_for_negative_data(original_df=data_frame, replace_with_nan=True)
+        if self.mode == "gsp":
+            # Every GSP is handed downstream as soon as it is cleaned
+            for gsp_name, non_negative_df in gsp_data:
+                logger.info(f"Pre-processing for {gsp_name} has completed")
+                yield assemble_gsp_dataset(
+                    gsp_data_in_dict={gsp_name: non_negative_df}, dtype=POWER_DTYPES[self.dtype]
+                )
+            return
 
-            # Converting to UTC
-            non_negative_df = bst_to_utc(original_df=non_negative_df)
+        gsp_data_in_dict = {}
+        for gsp_name, non_negative_df in gsp_data:
+            gsp_data_in_dict[gsp_name] = non_negative_df
+            logger.info(f"Pre-processing for {gsp_name} has completed")
 
-            # Check duplicates
-            check = non_negative_df.index.duplicated().any()
-            if check:
-                # Drop duplicates
-                non_negative_df = non_negative_df[~non_negative_df.index.duplicated(keep="last")]
+        if self.mode == "window":
+            yield from self._iterate_windows(gsp_data_in_dict=gsp_data_in_dict)
+            return
 
-            # Filling missing intervals
-            non_negative_df = non_negative_df.asfreq(self.freq)
+        # Aligning all the GSPs into a single xarray dataset
+        final_dataset = self._assemble_dataset(gsp_data_in_dict=gsp_data_in_dict)
+        self._write_dataset(final_dataset=final_dataset)
 
-            # Getting each df into a single big dataframe
-            gsp_dataframe = pd.concat([gsp_dataframe, non_negative_df], axis=1, join="outer")
+        yield final_dataset
 
-            print(f"\nPre-processing for {gsp_name} has completed")
+    @contextmanager
+    def _record_stage(self, stage: str, written_path: Optional[str] = None, **counts):
+        """Records the wall time of the block in the metrics, if any
 
-        # Metered power values into an array
-        gsp_metered_power_values = gsp_dataframe.to_numpy()
-        # GSP names
-        gsp_names = gsp_dataframe.columns
-        # Datetime values
-        gsp_datetimes = gsp_dataframe.index.values
+        The size of written_path is recorded as the bytes written after the block.
+        """
+        if self.metrics is None:
+            yield counts
+            return
 
-        # Creating an xarray dataset
-        final_dataset = xr.Dataset(
-            data_vars=dict(power=(["time_utc", "gsp_id"], gsp_metered_power_values)),
-            coords=dict(time_utc=gsp_datetimes, gsp_id=gsp_names),
-            attrs=dict(description="Metered power generation (MW) of GSP's"),
-        )
+        with self.metrics.time(stage, **counts) as counts:
+            yield counts
+            if written_path is not None:
+                counts["bytes_written"] = get_path_size(written_path)
 
+    def _assemble_dataset(self, gsp_data_in_dict: Dict) -> xr.Dataset:
+        """Aligns the GSPs into a single dataset in the in memory dtype"""
+        rows_in = sum(len(x) for x in gsp_data_in_dict.values())
+        with self._record_stage("assemble", rows_in=rows_in) as counts:
+            final_dataset = assemble_gsp_dataset(
+                gsp_data_in_dict=gsp_data_in_dict,
+                dtype=POWER_DTYPES[self.dtype],
+                memory_limit=self.memory_limit,
+            )
+            counts["rows_out"] = final_dataset.sizes["time_utc"]
+        return final_dataset
+
+    def _write_dataset(self, final_dataset: xr.Dataset):
+        """Writes the dataset into the NetCDF file, the Zarr store and the cache if asked for"""
         if self.write_as_netcdf:
-            convert_xarray_to_netcdf(
-                xarray_dataarray=final_dataset,
+            with self._record_stage(
+                "write_netcdf", written_path=os.path.join(self.folder_to_save, self.file_name)
+            ):
+                convert_xarray_to_netcdf(
+                    xarray_dataarray=final_dataset,
+                    folder_to_save=self.folder_to_save,
+                    file_name=self.file_name,
+                    dtype=self.dtype,
+                )
+
+        if self.write_as_zarr:
+            self._write_zarr(final_dataset=final_dataset)
+
+        if self.memmap_folder is not None:
+            self._write_memmap(final_dataset=final_dataset)
+
+    def _write_memmap(self, final_dataset: xr.Dataset):
+        """Exports the dataset to the memory-mapped cache"""
+        with self._record_stage("write_memmap", written_path=self.memmap_folder):
+            save_memmap_cache(xarray_dataset=final_dataset, folder_to_save=self.memmap_folder)
+
+    def _iterate_windows(self, gsp_data_in_dict: Dict) -> Iterator[xr.Dataset]:
+        """Yields time windows across all the GSPs, appending each to the Zarr store"""
+        # Every window after the first one is appended to the store
+        zarr_path = os.path.join(self.folder_to_save or "", self._get_zarr_file_name())
+        write_windows = self.write_as_zarr and (self.zarr_append or not os.path.exists(zarr_path))
+
+        # The int16 scaling has to cover every window, not only the first one
+        scaling = {}
+        if self.dtype == "int16" and len(gsp_data_in_dict) > 0:
+            all_values = np.concatenate([x.to_numpy().ravel() for x in gsp_data_in_dict.values()])
+            encoding = get_power_encoding(
+                xarray_dataset=xr.Dataset({"power": ("values", all_values)}), dtype="int16"
+            )
+            scaling = dict(scale_factor=encoding["scale_factor"], add_offset=encoding["add_offset"])
+
+        windows = iterate_gsp_dataset_windows(
+            gsp_data_in_dict=gsp_data_in_dict,
+            window=self.window,
+            dtype=POWER_DTYPES[self.dtype],
+            memory_limit=self.memory_limit,
+        )
+        for i, window_dataset in enumerate(windows):
+            if write_windows:
+                self._write_zarr(
+                    final_dataset=window_dataset, append=self.zarr_append or i > 0, **scaling
+                )
+            yield window_dataset
+
+    def _get_zarr_file_name(self) -> str:
+        """Name of the Zarr store, derived from file_name if not given"""
+        if self.zarr_file_name is not None:
+            return self.zarr_file_name
+        return os.path.splitext(self.file_name or "ukpn_gsp")[0] + ".zarr"
+
+    def _write_zarr(
+        self,
+        final_dataset: xr.Dataset,
+        append: Optional[bool] = None,
+        scale_factor: Optional[float] = None,
+        add_offset: Optional[float] = None,
+        overwrite: bool = False,
+    ):
+        """Writes or appends the dataset to the Zarr store"""
+        zarr_path = os.path.join(self.folder_to_save or "", self._get_zarr_file_name())
+        bytes_before = get_path_size(zarr_path) if self.metrics is not None else 0
+        with self._record_stage("write_zarr", rows_in=final_dataset.sizes["time_utc"]) as counts:
+            convert_xarray_to_zarr(
+                xarray_dataset=final_dataset,
                 folder_to_save=self.folder_to_save,
-                file_name=self.file_name,
+                file_name=self._get_zarr_file_name(),
+                chunks=self.zarr_chunks,
+                compressor=self.zarr_compressor,
+                append=self.zarr_append if append is None else append,
+                overwrite=overwrite,
+                dtype=self.dtype,
+                scale_factor=scale_factor,
+                add_offset=add_offset,
+            )
+            if self.metrics is not None:
+                counts["bytes_written"] = get_path_size(zarr_path) - bytes_before
+
+    def _update_zarr(
+        self,
+        final_dataset: xr.Dataset,
+        changed: bool,
+        appended_from: Optional[np.datetime64] = None,
+    ):
+        """Refreshes the Zarr store of the incremental mode with the merged dataset
+
+        The store is appended to if zarr_append is true and the only changes are the
+        datetimes from appended_from, after the stored ones, for the same GSPs.
+        Otherwise the store is rewritten whenever the GSP files changed.
+        """
+        zarr_path = os.path.join(self.folder_to_save or "", self._get_zarr_file_name())
+        if os.path.exists(zarr_path) and not changed:
+            return
+
+        append = False
+        if self.zarr_append and os.path.exists(zarr_path) and appended_from is not None:
+            with xr.open_zarr(zarr_path, consolidated=True) as stored_dataset:
+                append = bool(
+                    np.array_equal(stored_dataset.gsp_id.values, final_dataset.gsp_id.values)
+                    and appended_from > stored_dataset.time_utc.values[-1]
+                )
+        logger.info(f"{'Appending to' if append else 'Rewriting'} {zarr_path}")
+        self._write_zarr(final_dataset=final_dataset, append=append, overwrite=not append)
+
+    def _update_stored_dataset(self, folder_destination: str) -> xr.Dataset:
+        """Merges the new and changed GSP files into the stored NetCDF file"""
+        if self.folder_to_save is None or self.file_name is None:
+            raise ValueError("The incremental mode needs folder_to_save and file_name")
+
+        file_path = os.path.join(self.folder_to_save, self.file_name)
+        manifest_path = file_path + ".manifest.json"
+
+        # Without the stored file every GSP file is new
+        manifest = load_manifest(manifest_path) if os.path.isfile(file_path) else {}
+
+        # Comparing every file with the manifest
+        gsp_file_status = {}
+        byte_offsets = {}
+        for gsp_file_path in get_gsp_file_paths(folder_destination=folder_destination):
+            gsp_name = os.path.splitext(os.path.basename(gsp_file_path))[0]
+            file_status = get_file_status(gsp_file_path, manifest.get(gsp_name))
+            gsp_file_status[gsp_name] = file_status
+
+            if file_status["status"] != "unchanged":
+                logger.info(
+                    f"{gsp_name} is {file_status['status']}, reading from byte "
+                    f"{file_status['byte_offset']}"
+                )
+                byte_offsets[gsp_file_path] = file_status["byte_offset"]
+
+        # The GSP files deleted from the folder are dropped from the stored dataset
+        removed_gsps = [x for x in manifest if x not in gsp_file_status]
+        if removed_gsps:
+            logger.info(f"{removed_gsps} have been removed from {folder_destination}")
+
+        # Loading and pre-processing only the new rows
+        gsp_data_in_dict = get_gsp_data_in_dict(
+            folder_destination=folder_destination,
+            max_workers=self.max_workers,
+            executor=self.executor,
+            preprocess_kwargs=dict(
+                freq=self.freq, ambiguous=self.ambiguous, nonexistent=self.nonexistent
+            ),
+            file_paths=list(byte_offsets),
+            byte_offsets=byte_offsets,
+            cache_dir=self.cache_dir,
+            csv_schema=self.csv_schema,
+            metrics=self.metrics,
+        )
+
+        if manifest:
+            with self._record_stage("read_netcdf", bytes_read=os.path.getsize(file_path)):
+                with xr.open_dataset(file_path, engine="h5netcdf") as stored_dataset:
+                    stored_dataset = stored_dataset.load()
+            rows_in = sum(len(x) for x in gsp_data_in_dict.values())
+            with self._record_stage("merge", rows_in=rows_in) as counts:
+                final_dataset = merge_gsp_data_into_dataset(
+                    stored_dataset=stored_dataset,
+                    gsp_data_in_dict=gsp_data_in_dict,
+                    replace_gsps=[
+                        k for k, v in gsp_file_status.items() if v["status"] in ("new", "changed")
+                    ],
+                    freq=self.freq,
+                )
+                final_dataset = final_dataset.drop_sel(
+                    gsp_id=[x for x in removed_gsps if x in final_dataset.indexes["gsp_id"]]
+                )
+                counts["rows_out"] = final_dataset.sizes["time_utc"]
+        else:
+            final_dataset = self._assemble_dataset(gsp_data_in_dict=gsp_data_in_dict)
+
+        if byte_offsets or removed_gsps:
+            with self._record_stage("write_netcdf", written_path=file_path):
+                convert_xarray_to_netcdf(
+                    xarray_dataarray=final_dataset,
+                    folder_to_save=self.folder_to_save,
+                    file_name=self.file_name,
+                    overwrite=True,
+                    dtype=self.dtype,
+                )
+
+        if self.write_as_zarr:
+            # Only the new datetimes can be appended, other changes rewrite the store
+            statuses = {v["status"] for v in gsp_file_status.values()}
+            appended_from = None
+            if statuses <= {"unchanged", "appended"} and not removed_gsps:
+                new_datetimes = [x.index[0] for x in gsp_data_in_dict.values() if len(x) > 0]
+                if new_datetimes:
+                    appended_from = to_naive_utc(pd.DatetimeIndex([min(new_datetimes)]))[0]
+            self._update_zarr(
+                final_dataset=final_dataset,
+                changed=bool(byte_offsets or removed_gsps),
+                appended_from=appended_from,
             )
 
+        if self.memmap_folder is not None:
+            self._write_memmap(final_dataset=final_dataset)
+
+        # Recording the last datetime ingested for every GSP
+        for gsp_name, data_frame in gsp_data_in_dict.items():
+            if len(data_frame) > 0:
+                gsp_file_status[gsp_name]["last_timestamp"] = str(data_frame.index[-1])
+        save_manifest(manifest=gsp_file_status, manifest_path=manifest_path)
+
         return final_dataset
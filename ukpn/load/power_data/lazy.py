@@ -0,0 +1,211 @@
+"""Lazy, dask backed GSP dataset for histories which do not fit in memory"""
+import csv
+import logging
+import os
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
+
+import dask
+import dask.array as da
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from ukpn.load.power_data.cache import MAX_CACHE_BYTES
+from ukpn.load.power_data.utils import (
+    create_gsp_dataset,
+    get_gsp_file_paths,
+    load_gsp_file,
+    localize_datetime_index,
+    to_naive_utc,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def open_gsp_data_lazy(
+    folder_destination: str,
+    freq: str = "10Min",
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+    required_file_format: str = "*.csv",
+    time_chunk: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+    csv_schema: Optional[Dict] = None,
+    dtype: Union[str, np.dtype] = np.float64,
+    file_paths: Optional[List[str]] = None,
+) -> xr.Dataset:
+    """Builds a dask backed GSP dataset with one task graph per GSP file
+
+    The time grid is derived from the first and last rows of every file only, so
+    nothing is parsed until the dataset is computed or written. This needs the rows
+    of every file sorted by datetime and every file on the same grid of the frequency,
+    which is checked as far as possible. Every GSP file is then loaded, cleaned and
+    placed on the grid by its own task, so the files are parsed in parallel, a whole
+    file at a time, for example when writing with `convert_xarray_to_zarr`.
+
+    Args:
+        folder_destination: The destionation folder where are the files are
+        freq: Intended frequency of the time-series data
+        ambiguous: Policy for the repeated autumn hour, see `localize_datetime_index`
+        nonexistent: Policy for the skipped spring hour, see `localize_datetime_index`
+        required_file_format: The format of the UKPN power data files, usually .csv
+        time_chunk: If given, the dataset is rechunked to this many datetimes per chunk
+        cache_dir: If given, the cleaned dataframes are cached as parquet in this folder
+        max_cache_bytes: Size limit of the cache folder
+        csv_schema: Keyword arguments of `load_csv_to_pandas` describing the files
+        dtype: Data type of the power array
+        file_paths: Paths of the GSP files, all the files of the folder if None
+    """
+    if file_paths is None:
+        file_paths = get_gsp_file_paths(
+            folder_destination=folder_destination, required_file_format=required_file_format
+        )
+    gsp_names = [os.path.splitext(os.path.basename(x))[0] for x in file_paths]
+
+    # Regular time grid spanning every file
+    time_ranges = [
+        get_gsp_file_time_range(
+            file_path=x, ambiguous=ambiguous, nonexistent=nonexistent, csv_schema=csv_schema
+        )
+        for x in file_paths
+    ]
+    step = pd.Timedelta(freq).to_timedelta64()
+    if len(time_ranges) > 0:
+        start = min(x[0] for x in time_ranges)
+        end = max(x[1] for x in time_ranges)
+        off_grid = [x for x, y in zip(file_paths, time_ranges) if (y[0] - start) % step]
+        if off_grid:
+            raise ValueError(
+                f"The first datetimes of {off_grid} are not on the {freq} grid of the other "
+                "files, the lazy dataset needs every file on the same grid"
+            )
+        time_grid = np.arange(start, end + step, step)
+    else:
+        time_grid = np.array([], dtype="datetime64[ns]")
+
+    # A task per GSP file loading its column of the aligned array
+    load_function = partial(
+        load_gsp_file,
+        preprocess_kwargs=dict(freq=freq, ambiguous=ambiguous, nonexistent=nonexistent),
+        cache_dir=cache_dir,
+        max_cache_bytes=max_cache_bytes,
+        csv_schema=csv_schema,
+    )
+    gsp_columns = [
+        da.from_delayed(
+            dask.delayed(_load_gsp_column, pure=True)(load_function, file_path, time_grid, dtype),
+            shape=(len(time_grid), 1),
+            dtype=dtype,
+        )
+        for file_path in file_paths
+    ]
+    if len(gsp_columns) > 0:
+        gsp_metered_power_values = da.concatenate(gsp_columns, axis=1)
+    else:
+        gsp_metered_power_values = da.zeros((len(time_grid), 0), dtype=dtype)
+
+    if time_chunk is not None:
+        gsp_metered_power_values = gsp_metered_power_values.rechunk({0: time_chunk})
+
+    return create_gsp_dataset(
+        gsp_metered_power_values=gsp_metered_power_values,
+        gsp_datetimes=time_grid,
+        gsp_names=gsp_names,
+    )
+
+
+def get_gsp_file_time_range(
+    file_path: str,
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+    csv_schema: Optional[Dict] = None,
+) -> Tuple[np.datetime64, np.datetime64]:
+    """First and last datetimes of a GSP file in UTC, reading only its first and last rows
+
+    The rows of the file are assumed to be sorted by datetime. For the policies which
+    can drop or move a datetime, the range is widened so that it always contains the
+    cleaned data.
+
+    Args:
+        file_path: Path of the GSP file
+        ambiguous: Policy for the repeated autumn hour, see `localize_datetime_index`
+        nonexistent: Policy for the skipped spring hour, see `localize_datetime_index`
+        csv_schema: Keyword arguments of `load_csv_to_pandas` describing the files,
+            the position and format of the datetime column are taken from it
+    """
+    csv_schema = csv_schema or {}
+    datetime_column = csv_schema.get("usecols", (0, 1))[0]
+
+    with open(file_path, "rb") as csv_file:
+        # The first row is the header
+        csv_file.readline()
+        first_row = csv_file.readline()
+
+        # Reading backwards from the end of the file until a full row is found
+        csv_file.seek(0, os.SEEK_END)
+        size = csv_file.tell()
+        block_size = 1024
+        while True:
+            csv_file.seek(max(size - block_size, 0))
+            rows = [x for x in csv_file.read().splitlines() if x.strip()]
+            if len(rows) > 1 or block_size >= size:
+                break
+            block_size *= 2
+        last_row = rows[-1]
+
+    try:
+        raw_datetimes = [
+            x[datetime_column] for x in csv.reader([first_row.decode(), last_row.decode()])
+        ]
+        local_datetimes = pd.to_datetime(raw_datetimes, format=csv_schema.get("datetime_format"))
+    except (IndexError, ValueError) as error:
+        raise ValueError(
+            f"The datetimes of the first and last rows of {file_path} cannot be parsed"
+        ) from error
+    if local_datetimes[0] > local_datetimes[-1]:
+        raise ValueError(
+            f"The last row of {file_path} is before its first row, the lazy dataset needs "
+            "the rows sorted by datetime"
+        )
+
+    # Earliest reading of the first row and latest reading of the last row
+    bounds = []
+    for local_datetime, earliest in zip(local_datetimes, [True, False]):
+        bound_ambiguous = ambiguous
+        if ambiguous not in ("daylight", "standard"):
+            bound_ambiguous = "daylight" if earliest else "standard"
+        bound_nonexistent = nonexistent
+        if nonexistent == "NaT":
+            bound_nonexistent = "shift_backward" if earliest else "shift_forward"
+        utc_datetime = localize_datetime_index(
+            pd.DatetimeIndex([local_datetime]),
+            ambiguous=bound_ambiguous,
+            nonexistent=bound_nonexistent,
+        )
+        bounds.append(to_naive_utc(utc_datetime)[0])
+
+    return bounds[0], bounds[1]
+
+
+def _load_gsp_column(
+    load_function, file_path: str, time_grid: np.ndarray, dtype: Union[str, np.dtype] = np.float64
+) -> np.ndarray:
+    """Loads a GSP file and places it on the time grid as a single column"""
+    data_frame = load_function(file_path)
+    gsp_column = np.full((len(time_grid), 1), np.nan, dtype=dtype)
+
+    # The grid was derived from the first and last rows, every datetime must be on it
+    datetimes = to_naive_utc(pd.DatetimeIndex(data_frame.index))
+    positions = np.searchsorted(time_grid, datetimes)
+    on_grid = positions < len(time_grid)
+    on_grid[on_grid] = time_grid[positions[on_grid]] == datetimes[on_grid]
+    if not on_grid.all():
+        raise ValueError(
+            f"{(~on_grid).sum()} datetimes of {file_path} are off the time grid derived from "
+            "the first and last rows of the files, the rows must be sorted by datetime"
+        )
+
+    gsp_column[positions, 0] = data_frame.to_numpy().ravel()
+    return gsp_column
@@ -0,0 +1,132 @@
+"""Manifest of the ingested GSP files for the incremental loading"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Size of the blocks the files are hashed in
+HASH_BLOCK_SIZE = 1 << 20
+
+# Keys describing a single ingestion, which are not saved in the manifest
+INGESTION_KEYS = ("status", "byte_offset", "prefix_sha256", "prefix_ends_line")
+
+
+def get_file_record(file_path: str, previous_size: int = 0) -> Dict:
+    """Describes the current state of a GSP file
+
+    The file is hashed in a single pass, which also gives the hash of the first
+    `previous_size` bytes, so an append to the file can be told apart from an edit.
+
+    Args:
+        file_path: Path of the GSP file
+        previous_size: Size of the file when it was last ingested
+
+    Returns:
+        A dictionary with the path, size, mtime, sha256 of the content,
+        sha256 of the first `previous_size` bytes and whether those end a line
+    """
+    file_stat = os.stat(file_path)
+    content_hash = hashlib.sha256()
+    prefix_hash = None
+    prefix_ends_line = False
+
+    with open(file_path, "rb") as gsp_file:
+        bytes_read = 0
+        while True:
+            block = gsp_file.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+
+            # Snapshotting the hash once the previous size has been reached
+            if prefix_hash is None and 0 < previous_size <= bytes_read + len(block):
+                prefix = block[: previous_size - bytes_read]
+                content_hash.update(prefix)
+                prefix_hash = content_hash.hexdigest()
+                prefix_ends_line = prefix.endswith(b"\n")
+                content_hash.update(block[previous_size - bytes_read :])
+            else:
+                content_hash.update(block)
+            bytes_read += len(block)
+
+    return dict(
+        path=os.path.abspath(file_path),
+        size=file_stat.st_size,
+        mtime=file_stat.st_mtime,
+        sha256=content_hash.hexdigest(),
+        prefix_sha256=prefix_hash,
+        prefix_ends_line=prefix_ends_line,
+    )
+
+
+def get_file_status(file_path: str, manifest_record: Optional[Dict]) -> Dict:
+    """Compares a GSP file with its manifest record
+
+    Args:
+        file_path: Path of the GSP file
+        manifest_record: The record of the file from the previous ingestion, if any
+
+    Returns:
+        The new record of the file with a "status" of "new", "unchanged",
+        "appended" (only the rows after "byte_offset" need parsing) or "changed"
+    """
+    if manifest_record is None:
+        file_record = get_file_record(file_path)
+        return dict(file_record, status="new", byte_offset=0)
+
+    # Same size and modification time, the file is not read at all
+    file_stat = os.stat(file_path)
+    if (
+        file_stat.st_size == manifest_record["size"]
+        and file_stat.st_mtime == manifest_record["mtime"]
+    ):
+        return dict(manifest_record, status="unchanged", byte_offset=manifest_record["size"])
+
+    file_record = get_file_record(file_path, previous_size=manifest_record["size"])
+    if file_record["sha256"] == manifest_record["sha256"]:
+        status, byte_offset = "unchanged", file_record["size"]
+    elif (
+        file_record["size"] > manifest_record["size"]
+        and file_record["prefix_sha256"] == manifest_record["sha256"]
+        and file_record["prefix_ends_line"]
+    ):
+        status, byte_offset = "appended", manifest_record["size"]
+    else:
+        status, byte_offset = "changed", 0
+
+    file_record["last_timestamp"] = manifest_record.get("last_timestamp")
+    return dict(file_record, status=status, byte_offset=byte_offset)
+
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict]:
+    """Loads the manifest, an empty manifest is returned if there is none
+
+    Args:
+        manifest_path: Path of the manifest json file
+    """
+    if not os.path.isfile(manifest_path):
+        return {}
+
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest: Dict[str, Dict], manifest_path: str) -> None:
+    """Saves the manifest, replacing the previous one only once fully written
+
+    Args:
+        manifest: File records keyed by GSP name
+        manifest_path: Path of the manifest json file
+    """
+    # The status of the last ingestion is not part of the manifest
+    manifest = {
+        gsp_name: {k: v for k, v in record.items() if k not in INGESTION_KEYS}
+        for gsp_name, record in manifest.items()
+    }
+
+    temporary_path = manifest_path + ".tmp"
+    with open(temporary_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(temporary_path, manifest_path)
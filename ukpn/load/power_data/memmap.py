@@ -0,0 +1,181 @@
+"""Memory-mapped training cache of the aligned GSP arrays"""
+import json
+import logging
+import os
+from typing import Dict, Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+logger = logging.getLogger(__name__)
+
+MEMMAP_HEADER = "header.json"
+
+MEMMAP_VERSION = 1
+
+# Number of datetimes copied into the memory-mapped files at a time
+MEMMAP_WRITE_ROWS = 52560
+
+
+def save_memmap_cache(
+    xarray_dataset: xr.Dataset,
+    folder_to_save: str,
+    variables: Optional[Sequence[str]] = None,
+    dtype: Optional[str] = "float32",
+) -> str:
+    """Exports the arrays of the GSP dataset to raw .npy files with a JSON header
+
+    Every variable over time_utc and/or gsp_id, e.g. the power and the quality flags,
+    is written to its own .npy file. The header describes the time grid, the GSP names
+    and the files. The files are written through a memory map in blocks of datetimes,
+    so a lazy dataset is never loaded whole. The header is written last, so a cache
+    with a header is always complete.
+
+    Args:
+        xarray_dataset: The aligned GSP dataset
+        folder_to_save: Folder of the cache, created if needed
+        variables: Variables to export, every variable over time_utc or gsp_id if None
+        dtype: Data type of the floating point variables, or None to keep theirs
+
+    Returns:
+        Path of the header
+    """
+    os.makedirs(folder_to_save, exist_ok=True)
+    header_path = os.path.join(folder_to_save, MEMMAP_HEADER)
+    if os.path.exists(header_path):
+        # An existing cache is invalid from the moment its files are replaced
+        os.remove(header_path)
+
+    if variables is None:
+        variables = [
+            name
+            for name, variable in xarray_dataset.data_vars.items()
+            if set(variable.dims) <= {"time_utc", "gsp_id"}
+        ]
+
+    header = dict(
+        version=MEMMAP_VERSION,
+        time_utc=_get_time_grid_header(xarray_dataset.time_utc.values, folder_to_save),
+        gsp_id=[str(x) for x in xarray_dataset.gsp_id.values],
+        variables={},
+        attrs={k: v for k, v in xarray_dataset.attrs.items() if isinstance(v, (str, int, float))},
+    )
+
+    for name in variables:
+        variable = xarray_dataset[name]
+        dims = [x for x in ("time_utc", "gsp_id") if x in variable.dims]
+        variable = variable.transpose(*dims)
+        variable_dtype = variable.dtype
+        if dtype is not None and np.issubdtype(variable_dtype, np.floating):
+            variable_dtype = np.dtype(dtype)
+
+        file_name = f"{name}.npy"
+        memmap = np.lib.format.open_memmap(
+            os.path.join(folder_to_save, file_name),
+            mode="w+",
+            dtype=variable_dtype,
+            shape=variable.shape,
+        )
+        if "time_utc" in dims:
+            for start in range(0, variable.shape[0], MEMMAP_WRITE_ROWS):
+                rows = slice(start, start + MEMMAP_WRITE_ROWS)
+                memmap[rows] = variable.isel(time_utc=rows).values
+        else:
+            memmap[...] = variable.values
+        memmap.flush()
+        del memmap
+
+        header["variables"][name] = dict(
+            file=file_name, dims=dims, dtype=np.dtype(variable_dtype).str, shape=variable.shape
+        )
+        logger.info(f"{name} is exported to {file_name}")
+
+    with open(header_path + ".tmp", "w") as header_file:
+        json.dump(header, header_file, indent=2)
+    os.replace(header_path + ".tmp", header_path)
+
+    return header_path
+
+
+def open_memmap_cache(folder: str) -> xr.Dataset:
+    """Opens the memory-mapped cache as a GSP dataset, without reading the arrays
+
+    The variables are read-only numpy memory maps, so the processes opening the same
+    cache share its pages through the cache of the operating system.
+
+    Args:
+        folder: Folder of the cache
+    """
+    header_path = os.path.join(folder, MEMMAP_HEADER)
+    if not os.path.isfile(header_path):
+        raise FileNotFoundError(f"There is no complete memory-mapped cache in {folder}")
+    with open(header_path) as header_file:
+        header = json.load(header_file)
+    if header.get("version") != MEMMAP_VERSION:
+        raise ValueError(f"Unsupported memory-mapped cache version {header.get('version')}")
+
+    data_vars = {}
+    for name, description in header["variables"].items():
+        memmap = np.load(os.path.join(folder, description["file"]), mmap_mode="r")
+        if memmap.dtype != np.dtype(description["dtype"]) or list(memmap.shape) != list(
+            description["shape"]
+        ):
+            raise ValueError(f"{description['file']} does not match the header of the cache")
+        data_vars[name] = (description["dims"], memmap)
+
+    return xr.Dataset(
+        data_vars=data_vars,
+        coords=dict(time_utc=_load_time_grid(header["time_utc"], folder), gsp_id=header["gsp_id"]),
+        attrs=header["attrs"],
+    )
+
+
+def _get_time_grid_header(time_utc: np.ndarray, folder: str) -> Dict:
+    """Start, step and length of a regular time grid, or the file of an irregular one"""
+    time_utc = time_utc.astype("datetime64[ns]")
+    steps = np.unique(np.diff(time_utc))
+    if len(time_utc) > 0 and len(steps) <= 1:
+        step = steps[0] if len(steps) == 1 else np.timedelta64(0, "ns")
+        return dict(
+            start=str(pd.Timestamp(time_utc[0])),
+            step_ns=int(step.astype(np.int64)),
+            length=len(time_utc),
+        )
+
+    np.save(os.path.join(folder, "time_utc.npy"), time_utc.view(np.int64))
+    return dict(file="time_utc.npy", length=len(time_utc))
+
+
+def _load_time_grid(time_grid_header: Dict, folder: str) -> np.ndarray:
+    """Datetimes of the time grid described in the header"""
+    if "file" in time_grid_header:
+        return np.load(os.path.join(folder, time_grid_header["file"])).view("datetime64[ns]")
+
+    start = np.datetime64(pd.Timestamp(time_grid_header["start"]).to_datetime64(), "ns")
+    steps = np.arange(time_grid_header["length"], dtype=np.int64) * time_grid_header["step_ns"]
+    return start + steps.astype("timedelta64[ns]")
+
+
+@functional_datapipe("open_gsp_memmap")
+class OpenGSPMemmapIterDataPipe(IterDataPipe):
+    """Yields the GSP dataset of a memory-mapped cache, opened in every process
+
+    The cache is only opened when iterating, so every DataLoader worker maps the files
+    itself and the workers share the pages instead of each holding a copy. Chained with
+    SampleGSPWindows or BatchGSPWindows, the windows are served straight from the map.
+    """
+
+    def __init__(self, folder: str):
+        """Opens the memory-mapped cache
+
+        Args:
+            folder: Folder of the cache, written by `save_memmap_cache`
+        """
+        self.folder = folder
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields the memory-mapped dataset"""
+        yield open_memmap_cache(self.folder)
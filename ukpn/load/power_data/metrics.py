@@ -0,0 +1,177 @@
+"""Timings and row counts of the stages of the GSP load pipeline"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Counters of a stage record, summed in the summaries
+METRIC_COUNTERS = ("seconds", "rows_in", "rows_out", "bytes_read", "bytes_written")
+
+
+class PipelineMetrics:
+    """Records the wall time, rows and bytes of every stage, per GSP
+
+    A record is a dictionary with the stage, the GSP (None for the stages over every
+    GSP), the seconds, the rows in and out, the rows dropped by reason and the bytes
+    read and written. The records of the worker processes are sent back with their
+    results and added in the main process, so the callback and the logging always
+    run there.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[Dict], None]] = None,
+        log_level: Optional[int] = logging.INFO,
+    ):
+        """Records the metrics of a pipeline
+
+        Args:
+            callback: If given, called with every record as it is added, e.g. to send
+                it to a monitoring system
+            log_level: Level the records are logged at, or None to not log them
+        """
+        self.callback = callback
+        self.log_level = log_level
+        self.records: List[Dict] = []
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        gsp: Optional[str] = None,
+        rows_in: int = 0,
+        rows_out: int = 0,
+        rows_dropped: Optional[Dict[str, int]] = None,
+        bytes_read: int = 0,
+        bytes_written: int = 0,
+    ) -> Dict:
+        """Adds the record of a stage
+
+        Args:
+            stage: Name of the stage, e.g. "read_csv"
+            seconds: Wall time of the stage
+            gsp: Name of the GSP, or None for a stage over every GSP
+            rows_in: Rows going into the stage
+            rows_out: Rows coming out of the stage
+            rows_dropped: Rows dropped or masked, by reason, e.g. {"duplicate": 6}
+            bytes_read: Bytes read from disk
+            bytes_written: Bytes written to disk
+        """
+        return self.add(
+            dict(
+                stage=stage,
+                gsp=gsp,
+                seconds=seconds,
+                rows_in=int(rows_in),
+                rows_out=int(rows_out),
+                rows_dropped={k: int(v) for k, v in (rows_dropped or {}).items()},
+                bytes_read=int(bytes_read),
+                bytes_written=int(bytes_written),
+            )
+        )
+
+    def add(self, record: Dict) -> Dict:
+        """Adds a record, e.g. one sent back from a worker process"""
+        self.records.append(record)
+        if self.log_level is not None:
+            logger.log(self.log_level, format_record(record))
+        if self.callback is not None:
+            self.callback(record)
+        return record
+
+    def extend(self, records: Iterable[Dict]):
+        """Adds the records, e.g. the ones sent back from a worker process"""
+        for record in records:
+            self.add(record)
+
+    @contextmanager
+    def time(self, stage: str, gsp: Optional[str] = None, **counts) -> Iterator[Dict]:
+        """Records the wall time of the block
+
+        The yielded dictionary holds the keyword arguments of `record`, so the block
+        can fill in the rows and bytes once they are known.
+        """
+        counts = dict(counts)
+        start = time.perf_counter()
+        yield counts
+        self.record(stage=stage, seconds=time.perf_counter() - start, gsp=gsp, **counts)
+
+    def summary(self, by: str = "stage") -> Dict[str, Dict]:
+        """Sums the records by stage or by GSP
+
+        Args:
+            by: Either "stage" or "gsp"
+
+        Returns:
+            The summed counters and dropped rows of every stage or GSP, the GSP
+            of the stages over every GSP is "all"
+        """
+        if by not in ("stage", "gsp"):
+            raise ValueError(f"by must be either 'stage' or 'gsp', got {by}")
+
+        totals = defaultdict(lambda: dict({x: 0 for x in METRIC_COUNTERS}, rows_dropped={}))
+        for record in self.records:
+            total = totals[record[by] if record[by] is not None else "all"]
+            for counter in METRIC_COUNTERS:
+                total[counter] += record[counter]
+            for reason, rows in record["rows_dropped"].items():
+                total["rows_dropped"][reason] = total["rows_dropped"].get(reason, 0) + rows
+        return dict(totals)
+
+    def to_dict(self) -> Dict:
+        """The report of the pipeline, the records and their summaries"""
+        return dict(
+            records=self.records,
+            stages=self.summary(by="stage"),
+            gsps=self.summary(by="gsp"),
+        )
+
+    def save_json(self, path: str) -> str:
+        """Saves the report as JSON
+
+        Args:
+            path: Path of the JSON file
+
+        Returns:
+            The path of the report
+        """
+        with open(path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+        return path
+
+    def log_summary(self, level: int = logging.INFO):
+        """Logs the totals of every stage, the slowest first"""
+        stages = sorted(self.summary(by="stage").items(), key=lambda x: -x[1]["seconds"])
+        for stage, total in stages:
+            logger.log(level, format_record(dict(total, stage=stage, gsp=None)))
+
+
+def format_record(record: Dict) -> str:
+    """One line description of a record, for the logs"""
+    text = f"{record['stage']}"
+    if record.get("gsp") is not None:
+        text += f" of {record['gsp']}"
+    text += f" took {record['seconds']:.3f}s, {record['rows_in']} -> {record['rows_out']} rows"
+    if record["rows_dropped"]:
+        text += f", dropped {record['rows_dropped']}"
+    if record["bytes_read"]:
+        text += f", read {record['bytes_read']} bytes"
+    if record["bytes_written"]:
+        text += f", wrote {record['bytes_written']} bytes"
+    return text
+
+
+def get_path_size(path: str) -> int:
+    """Size in bytes of a file or of every file under a folder, 0 if it does not exist"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
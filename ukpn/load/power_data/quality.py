@@ -0,0 +1,187 @@
+"""Vectorized quality control of the aligned GSP power array"""
+import logging
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+logger = logging.getLogger(__name__)
+
+# Bit of every quality check in the flag bitmask
+QC_FLAGS = {"negative": 1, "stuck": 2, "spike": 4, "above_capacity": 8}
+
+# Scales the median absolute deviation to the standard deviation of normal data
+MAD_TO_STD = 1.4826
+
+
+def get_quality_flags(
+    power: np.ndarray,
+    stuck_intervals: int = 6,
+    stuck_ignore_zeros: bool = True,
+    spike_window: int = 13,
+    spike_threshold: float = 5.0,
+    capacity: Optional[Union[float, np.ndarray]] = None,
+) -> np.ndarray:
+    """Runs every quality check on a (time_utc, gsp_id) power array in one pass
+
+    Every check works on whole columns at once, there is no Python loop over the rows.
+
+    Args:
+        power: The aligned power array, with NaN's for the missing values
+        stuck_intervals: Number of consecutive identical values from which a sensor is
+            considered stuck
+        stuck_ignore_zeros: If true, runs of zeros, e.g. the nights of a solar farm,
+            are not considered stuck
+        spike_window: Length of the centered rolling window of the spike check
+        spike_threshold: Number of scaled median absolute deviations from the rolling
+            median beyond which a value is a spike. Windows without any spread are skipped
+        capacity: Capacity ceiling, either a single value or one per GSP
+
+    Returns:
+        A uint8 array of the shape of power with the QC_FLAGS bits of the failed checks
+    """
+    power = np.asarray(power)
+    flags = np.zeros(power.shape, dtype=np.uint8)
+    if power.size == 0:
+        return flags
+
+    flags[power < 0] |= QC_FLAGS["negative"]
+    flags[_get_stuck_mask(power, stuck_intervals, stuck_ignore_zeros)] |= QC_FLAGS["stuck"]
+    flags[_get_spike_mask(power, spike_window, spike_threshold)] |= QC_FLAGS["spike"]
+    if capacity is not None:
+        flags[power > np.asarray(capacity, dtype=power.dtype)] |= QC_FLAGS["above_capacity"]
+
+    return flags
+
+
+def _get_stuck_mask(power: np.ndarray, stuck_intervals: int, ignore_zeros: bool) -> np.ndarray:
+    """Marks the values in runs of at least stuck_intervals identical values"""
+    number_of_rows = power.shape[0]
+
+    # Columns one after the other, so every run is a contiguous slice
+    values = power.T.ravel()
+    run_starts = np.ones(len(values), dtype=bool)
+    run_starts[1:] = values[1:] != values[:-1]
+    run_starts[::number_of_rows] = True
+
+    # Length of the run every value belongs to
+    run_ids = np.cumsum(run_starts) - 1
+    run_lengths = np.bincount(run_ids)[run_ids]
+
+    stuck = (run_lengths >= stuck_intervals) & ~np.isnan(values)
+    if ignore_zeros:
+        stuck &= values != 0
+    return stuck.reshape(power.shape[::-1]).T
+
+
+def _get_spike_mask(power: np.ndarray, spike_window: int, spike_threshold: float) -> np.ndarray:
+    """Marks the values too far from the rolling median, in rolling MAD's"""
+    rolling = dict(window=spike_window, center=True, min_periods=spike_window // 2 + 1)
+    power_df = pd.DataFrame(power)
+    rolling_median = power_df.rolling(**rolling).median()
+    deviation = (power_df - rolling_median).abs()
+    rolling_mad = deviation.rolling(**rolling).median().to_numpy() * MAD_TO_STD
+
+    with np.errstate(invalid="ignore"):
+        return (rolling_mad > 0) & (deviation.to_numpy() > spike_threshold * rolling_mad)
+
+
+def add_quality_flags(
+    xarray_dataset: xr.Dataset,
+    capacity: Optional[Union[float, Dict[str, float]]] = None,
+    mask_flags: int = 0,
+    **check_kwargs,
+) -> xr.Dataset:
+    """Adds the quality flags of the power to the GSP dataset
+
+    Two variables are added, "quality_flags" with the flags of every value and
+    "gsp_quality_flags" with the flags raised at least once by every GSP.
+
+    Args:
+        xarray_dataset: The aligned GSP dataset
+        capacity: Capacity ceiling, either a single value or one per GSP name,
+            GSPs missing from the dictionary are not checked
+        mask_flags: Bitmask of the QC_FLAGS whose values are replaced with NaN's
+        check_kwargs: Other keyword arguments of `get_quality_flags`
+    """
+    if isinstance(capacity, dict):
+        capacity = np.array(
+            [capacity.get(x, np.inf) for x in xarray_dataset.gsp_id.values], dtype=np.float64
+        )
+
+    flags = get_quality_flags(
+        xarray_dataset.power.transpose("time_utc", "gsp_id").values,
+        capacity=capacity,
+        **check_kwargs,
+    )
+    for flag_name, flag in QC_FLAGS.items():
+        number_of_flags = np.count_nonzero(flags & flag)
+        if number_of_flags > 0:
+            logger.info(f"{number_of_flags} values are flagged as {flag_name}")
+
+    xarray_dataset = xarray_dataset.assign(
+        quality_flags=(("time_utc", "gsp_id"), flags),
+        gsp_quality_flags=(("gsp_id",), np.bitwise_or.reduce(flags, axis=0)),
+    )
+    xarray_dataset.quality_flags.attrs["flag_masks"] = list(QC_FLAGS.values())
+    xarray_dataset.quality_flags.attrs["flag_meanings"] = " ".join(QC_FLAGS)
+
+    if mask_flags:
+        xarray_dataset["power"] = xarray_dataset.power.where(
+            (xarray_dataset.quality_flags & mask_flags) == 0
+        )
+
+    return xarray_dataset
+
+
+@functional_datapipe("check_gsp_quality")
+class CheckGSPQualityIterDataPipe(IterDataPipe):
+    """Flags the negative, stuck, spiking and above capacity power of every dataset
+
+    In the streaming modes of OpenGSPData every dataset is checked on its own, so the
+    runs and the rolling windows do not span two consecutive datasets.
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        capacity: Optional[Union[float, Dict[str, float]]] = None,
+        mask_flags: int = 0,
+        stuck_intervals: int = 6,
+        stuck_ignore_zeros: bool = True,
+        spike_window: int = 13,
+        spike_threshold: float = 5.0,
+    ):
+        """Checks the quality of the GSP datasets
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            capacity: Capacity ceiling, either a single value or one per GSP name
+            mask_flags: Bitmask of the QC_FLAGS whose values are replaced with NaN's
+            stuck_intervals: Number of consecutive identical values of a stuck sensor
+            stuck_ignore_zeros: If true, runs of zeros are not considered stuck
+            spike_window: Length of the centered rolling window of the spike check
+            spike_threshold: Number of scaled rolling MAD's beyond which a value is a spike
+        """
+        self.source_datapipe = source_datapipe
+        self.capacity = capacity
+        self.mask_flags = mask_flags
+        self.check_kwargs = dict(
+            stuck_intervals=stuck_intervals,
+            stuck_ignore_zeros=stuck_ignore_zeros,
+            spike_window=spike_window,
+            spike_threshold=spike_threshold,
+        )
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields every dataset with its quality flags"""
+        for xarray_dataset in self.source_datapipe:
+            yield add_quality_flags(
+                xarray_dataset=xarray_dataset,
+                capacity=self.capacity,
+                mask_flags=self.mask_flags,
+                **self.check_kwargs,
+            )
@@ -0,0 +1,235 @@
+"""Resampling of the aligned GSP power array to coarser periods"""
+import logging
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.power_data.utils import create_gsp_dataset
+
+logger = logging.getLogger(__name__)
+
+RESAMPLE_METHODS = ("mean", "energy", "instantaneous")
+
+
+def resample_gsp_dataset(
+    xarray_dataset: xr.Dataset,
+    period: str = "30Min",
+    freq: str = "10Min",
+    method: str = "mean",
+    min_valid_samples: int = 1,
+    closed: str = "left",
+    label: str = "left",
+) -> xr.Dataset:
+    """Aggregates the GSP power to coarser periods, e.g. half hourly settlement periods
+
+    The power is placed on a regular (period, sample, gsp_id) array, so every method is
+    a single reduction along the sample axis instead of a groupby. Missing datetimes
+    and incomplete first and last periods are treated as missing samples.
+
+    Args:
+        xarray_dataset: The aligned GSP dataset
+        period: Length of the periods, a multiple of freq
+        freq: Frequency of the time grid of the dataset
+        method: One of RESAMPLE_METHODS,
+            "mean" (mean power over the period),
+            "energy" (energy in MWh, the mean power times the length of the period) or
+            "instantaneous" (the last sample of the period)
+        min_valid_samples: Periods with fewer samples which are not NaN become NaN
+        closed: Which side of the period is closed, "left" or "right" as in pandas
+        label: Which side of the period labels it, "left" or "right" as in pandas
+
+    Returns:
+        The resampled dataset. A "quality_flags" variable is reduced with a bitwise or
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f"method must be one of {RESAMPLE_METHODS}, got {method}")
+    if label not in ("left", "right"):
+        raise ValueError(f"label must be 'left' or 'right', got {label}")
+
+    step = pd.Timedelta(freq).to_timedelta64()
+    period_step = pd.Timedelta(period).to_timedelta64()
+    samples_per_period = period_step // step
+    if samples_per_period < 1 or period_step % step != np.timedelta64(0):
+        raise ValueError(f"period {period} must be a multiple of freq {freq}")
+
+    time_utc = xarray_dataset.time_utc.values
+    gsp_names = list(xarray_dataset.gsp_id.values)
+    if len(time_utc) == 0:
+        return xarray_dataset
+
+    # Position of every datetime on a regular grid starting at a period boundary
+    period_starts = get_period_starts(time_utc, period=period, freq=freq, closed=closed)
+    origin = period_starts[0] + (step if closed == "right" else np.timedelta64(0))
+    positions = (time_utc - origin) // step
+    if ((time_utc - origin) % step != np.timedelta64(0)).any():
+        raise ValueError(f"The datetimes are not on a {freq} grid")
+    number_of_periods = int(positions[-1] // samples_per_period) + 1
+
+    # Scattering the power into (period, sample, gsp_id) blocks
+    power = xarray_dataset.power.transpose("time_utc", "gsp_id").values
+    dtype = power.dtype if np.issubdtype(power.dtype, np.floating) else np.float64
+    if (
+        len(positions) == number_of_periods * samples_per_period
+        and positions[-1] == len(positions) - 1
+    ):
+        # Already whole periods on a regular grid, the blocks are a view of the array
+        blocks = power.astype(dtype, copy=False)
+    else:
+        blocks = np.full(
+            (number_of_periods * samples_per_period, len(gsp_names)), np.nan, dtype=dtype
+        )
+        blocks[positions] = power
+    blocks = blocks.reshape(number_of_periods, samples_per_period, len(gsp_names))
+
+    valid_samples = np.count_nonzero(~np.isnan(blocks), axis=1)
+    if method == "instantaneous":
+        resampled_power = blocks[:, -1]
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            resampled_power = np.nansum(blocks, axis=1) / valid_samples
+        if method == "energy":
+            resampled_power = resampled_power * (period_step / np.timedelta64(1, "h"))
+    resampled_power = np.where(valid_samples >= min_valid_samples, resampled_power, np.nan)
+
+    first_start = period_starts[0]
+    period_labels = first_start + np.arange(number_of_periods) * period_step
+    if label == "right":
+        period_labels = period_labels + period_step
+
+    resampled_dataset = create_gsp_dataset(
+        gsp_metered_power_values=resampled_power.astype(dtype, copy=False),
+        gsp_datetimes=period_labels,
+        gsp_names=gsp_names,
+        attrs=dict(xarray_dataset.attrs, resample_method=method, resample_period=period),
+    )
+    if method == "energy":
+        resampled_dataset.attrs["description"] = "Metered energy (MWh) of GSP's"
+
+    if "quality_flags" in xarray_dataset:
+        flags = np.zeros((number_of_periods * samples_per_period, len(gsp_names)), np.uint8)
+        flags[positions] = xarray_dataset.quality_flags.transpose("time_utc", "gsp_id").values
+        resampled_dataset["quality_flags"] = (
+            ("time_utc", "gsp_id"),
+            np.bitwise_or.reduce(flags.reshape(number_of_periods, samples_per_period, -1), axis=1),
+        )
+        resampled_dataset["quality_flags"].attrs = xarray_dataset.quality_flags.attrs
+
+    # Variables without datetimes, e.g. the per GSP flags, are kept as they are
+    for name, variable in xarray_dataset.data_vars.items():
+        if "time_utc" not in variable.dims:
+            resampled_dataset[name] = variable
+
+    return resampled_dataset
+
+
+def get_period_starts(
+    time_utc: np.ndarray, period: str = "30Min", freq: str = "10Min", closed: str = "left"
+) -> np.ndarray:
+    """Start of the period every datetime belongs to
+
+    Args:
+        time_utc: Naive UTC datetimes
+        period: Length of the periods
+        freq: Frequency of the time grid, with closed="right" a datetime on a period
+            boundary belongs to the period before it
+        closed: Which side of the period is closed, "left" or "right"
+    """
+    if closed not in ("left", "right"):
+        raise ValueError(f"closed must be 'left' or 'right', got {closed}")
+
+    time_utc = pd.DatetimeIndex(time_utc)
+    if closed == "right":
+        time_utc = time_utc - pd.Timedelta(freq)
+    return time_utc.floor(period).values
+
+
+@functional_datapipe("resample_gsp_data")
+class ResampleGSPDataIterDataPipe(IterDataPipe):
+    """Resamples the GSP datasets to coarser periods, e.g. half hourly settlement periods
+
+    Consecutive datasets of the same GSPs, like the windows of OpenGSPData, are treated
+    as one stream: the samples of a period split across two datasets are carried over
+    to the next one, so every period is only yielded once and with all its samples.
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        period: str = "30Min",
+        freq: str = "10Min",
+        method: str = "mean",
+        min_valid_samples: int = 1,
+        closed: str = "left",
+        label: str = "left",
+    ):
+        """Resamples the GSP datasets
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            period: Length of the periods, a multiple of freq
+            freq: Frequency of the time grid of the datasets
+            method: One of RESAMPLE_METHODS, see `resample_gsp_dataset`
+            min_valid_samples: Periods with fewer samples which are not NaN become NaN
+            closed: Which side of the period is closed, "left" or "right"
+            label: Which side of the period labels it, "left" or "right"
+        """
+        if method not in RESAMPLE_METHODS:
+            raise ValueError(f"method must be one of {RESAMPLE_METHODS}, got {method}")
+
+        self.source_datapipe = source_datapipe
+        self.period = period
+        self.freq = freq
+        self.resample_kwargs = dict(
+            period=period,
+            freq=freq,
+            method=method,
+            min_valid_samples=min_valid_samples,
+            closed=closed,
+            label=label,
+        )
+        self.closed = closed
+
+    def __iter__(self) -> Iterator[xr.Dataset]:
+        """Yields the resampled datasets, carrying the incomplete last period over"""
+        carry: Optional[xr.Dataset] = None
+        for xarray_dataset in self.source_datapipe:
+            if carry is not None:
+                if np.array_equal(carry.gsp_id.values, xarray_dataset.gsp_id.values):
+                    xarray_dataset = xr.concat([carry, xarray_dataset], dim="time_utc")
+                else:
+                    # A different set of GSPs starts a new stream
+                    yield resample_gsp_dataset(carry, **self.resample_kwargs)
+            if xarray_dataset.sizes["time_utc"] == 0:
+                carry = None
+                continue
+
+            complete, carry = self._split_last_period(xarray_dataset)
+            if complete is not None:
+                yield resample_gsp_dataset(complete, **self.resample_kwargs)
+
+        if carry is not None:
+            yield resample_gsp_dataset(carry, **self.resample_kwargs)
+
+    def _split_last_period(self, xarray_dataset: xr.Dataset):
+        """Splits the dataset into its complete periods and its incomplete last period"""
+        time_utc = xarray_dataset.time_utc.values
+        period_starts = get_period_starts(
+            time_utc, period=self.period, freq=self.freq, closed=self.closed
+        )
+
+        # The last period is complete if its last sample is there
+        last_sample = period_starts[-1] + pd.Timedelta(self.period).to_timedelta64()
+        if self.closed == "left":
+            last_sample = last_sample - pd.Timedelta(self.freq).to_timedelta64()
+        if time_utc[-1] == last_sample:
+            return xarray_dataset, None
+
+        in_last_period = period_starts == period_starts[-1]
+        carry = xarray_dataset.isel(time_utc=in_last_period)
+        if in_last_period.all():
+            return None, carry
+        return xarray_dataset.isel(time_utc=~in_last_period), carry
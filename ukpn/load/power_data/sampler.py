@@ -0,0 +1,211 @@
+"""Indexed sampling of (GSP, t0) training windows from the aligned GSP power array"""
+import logging
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from torch.utils.data import get_worker_info
+from torchdata.datapipes import functional_datapipe
+from torchdata.datapipes.iter import IterDataPipe
+
+from ukpn.load.sharding import SHARD_ATTRS
+
+logger = logging.getLogger(__name__)
+
+
+def get_valid_window_index(
+    power: np.ndarray,
+    history_length: int,
+    forecast_length: int,
+    max_nans: int = 0,
+    valid_t0: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the (GSP, t0) windows with at most max_nans missing values
+
+    A window of t0 covers the history_length datetimes up to and including t0 and
+    the forecast_length datetimes after it. The missing values of every window are
+    counted from a cumulative sum along time, in a single pass over the array.
+
+    Args:
+        power: The aligned (time_utc, gsp_id) power array
+        history_length: Number of datetimes up to and including t0
+        forecast_length: Number of datetimes after t0
+        max_nans: Largest number of missing values in a window
+        valid_t0: Optional boolean (time_utc, gsp_id) or (time_utc,) array of the t0's
+            which can be sampled, e.g. from `get_daylight_mask`
+
+    Returns:
+        The GSP positions and the t0 positions of the valid windows as int32 arrays,
+        sorted by GSP and then by t0
+    """
+    if history_length < 1 or forecast_length < 0:
+        raise ValueError("history_length must be at least 1 and forecast_length at least 0")
+
+    number_of_datetimes, number_of_gsps = power.shape
+    window_length = history_length + forecast_length
+    number_of_windows = number_of_datetimes - window_length + 1
+    if number_of_windows < 1:
+        return np.array([], dtype=np.int32), np.array([], dtype=np.int32)
+
+    # Missing values of every window from the cumulative count of the NaN's
+    nan_counts = np.zeros((number_of_datetimes + 1, number_of_gsps), dtype=np.int32)
+    np.cumsum(np.isnan(power), axis=0, out=nan_counts[1:])
+    window_nans = nan_counts[window_length:] - nan_counts[:number_of_windows]
+    valid = window_nans <= max_nans
+
+    if valid_t0 is not None:
+        valid_t0 = np.asarray(valid_t0, dtype=bool)
+        if valid_t0.ndim == 1:
+            valid_t0 = valid_t0[:, None]
+        valid &= valid_t0[history_length - 1 : history_length - 1 + number_of_windows]
+
+    gsp_positions, window_starts = np.nonzero(valid.T)
+    return gsp_positions.astype(np.int32), (window_starts + history_length - 1).astype(np.int32)
+
+
+def get_daylight_mask(
+    time_utc: np.ndarray,
+    gsp_coordinates: Sequence[Sequence[float]],
+    min_elevation: float = 0.0,
+) -> np.ndarray:
+    """Boolean (time_utc, gsp_id) array of the datetimes with the sun above min_elevation
+
+    Args:
+        time_utc: Naive UTC datetimes
+        gsp_coordinates: Longitude and latitude of every GSP, e.g. the centers from
+            GetCenterCoordinatesGSP
+        min_elevation: Solar elevation in degrees above which it is daylight
+    """
+    import pvlib
+
+    times = pd.DatetimeIndex(time_utc).tz_localize("UTC")
+    daylight = np.zeros((len(times), len(gsp_coordinates)), dtype=bool)
+    for i, coordinates in enumerate(gsp_coordinates):
+        longitude, latitude = np.ravel(coordinates)[:2]
+        solar_position = pvlib.solarposition.get_solarposition(
+            times, latitude=latitude, longitude=longitude
+        )
+        daylight[:, i] = solar_position["elevation"].to_numpy() > min_elevation
+    return daylight
+
+
+@functional_datapipe("sample_gsp_windows")
+class SampleGSPWindowsIterDataPipe(IterDataPipe):
+    """Draws (GSP, t0) training windows from the GSP datasets by integer slicing
+
+    The valid windows are indexed once per dataset, every window is then a slice of
+    the underlying array. With shuffling, every epoch draws a new permutation from the
+    seed and the epoch number. Inside a DataLoader, every worker takes its own share of
+    the permutation, so the workers never yield the same window twice in an epoch. The
+    datasets of a sharded source, e.g. OpenGSPData(shard=True), already hold the GSPs
+    of the worker only, and all of their windows are kept.
+    """
+
+    def __init__(
+        self,
+        source_datapipe: IterDataPipe,
+        history_length: int,
+        forecast_length: int,
+        max_nans: int = 0,
+        shuffle: bool = False,
+        seed: Optional[int] = None,
+        gsp_coordinates: Optional[Dict[str, Sequence[float]]] = None,
+        min_elevation: float = 0.0,
+    ):
+        """Samples the training windows
+
+        Args:
+            source_datapipe: Datapipe yielding the aligned GSP datasets
+            history_length: Number of datetimes up to and including t0
+            forecast_length: Number of datetimes after t0
+            max_nans: Largest number of missing values in a window
+            shuffle: If true, the windows are yielded in a random order
+            seed: Seed of the shuffling, drawn once if None so that all the
+                DataLoader workers share it
+            gsp_coordinates: If given, only the t0's in daylight are sampled, from the
+                longitude and latitude of every GSP name. GSPs without coordinates
+                are not sampled
+            min_elevation: Solar elevation in degrees above which it is daylight
+        """
+        self.source_datapipe = source_datapipe
+        self.history_length = history_length
+        self.forecast_length = forecast_length
+        self.max_nans = max_nans
+        self.shuffle = shuffle
+        self.seed = int(np.random.SeedSequence().entropy % 2**32) if seed is None else seed
+        self.gsp_coordinates = gsp_coordinates
+        self.min_elevation = min_elevation
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        """Sets the epoch of the shuffling, the next iterations count from it
+
+        The DataLoader workers iterate over copies of the datapipe, so with workers it
+        has to be called before every epoch for the order to change between epochs.
+        """
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Yields the power, the GSP and the t0 of every window"""
+        for power, time_utc, gsp_names, gsp_positions, t0_positions in self._iterate_index():
+            for gsp_position, t0_position in zip(gsp_positions, t0_positions):
+                start = t0_position - self.history_length + 1
+                end = t0_position + self.forecast_length + 1
+                yield dict(
+                    power=power[start:end, gsp_position],
+                    gsp_id=gsp_names[gsp_position],
+                    t0=time_utc[t0_position],
+                )
+
+    def _iterate_index(self) -> Iterator[Tuple]:
+        """Yields every dataset with the windows of this worker, in the order of the epoch
+
+        Returns:
+            The (time_utc, gsp_id) power array, the datetimes, the GSP names and the
+            GSP and t0 positions of the windows
+        """
+        epoch = self.epoch
+        self.epoch += 1
+
+        # The share of this DataLoader worker
+        worker_info = get_worker_info()
+        worker_id, number_of_workers = 0, 1
+        if worker_info is not None:
+            worker_id, number_of_workers = worker_info.id, worker_info.num_workers
+
+        for i, xarray_dataset in enumerate(self.source_datapipe):
+            power = xarray_dataset.power.transpose("time_utc", "gsp_id").values
+            time_utc = xarray_dataset.time_utc.values
+            gsp_names = xarray_dataset.gsp_id.values
+
+            gsp_positions, t0_positions = get_valid_window_index(
+                power=power,
+                history_length=self.history_length,
+                forecast_length=self.forecast_length,
+                max_nans=self.max_nans,
+                valid_t0=self._get_valid_t0(time_utc=time_utc, gsp_names=gsp_names),
+            )
+            logger.info(f"{len(t0_positions)} valid windows in dataset {i}")
+
+            order = np.arange(len(t0_positions))
+            if self.shuffle:
+                rng = np.random.default_rng([self.seed, epoch, i])
+                order = rng.permutation(len(t0_positions))
+            if not set(SHARD_ATTRS) <= set(xarray_dataset.attrs):
+                order = order[worker_id::number_of_workers]
+
+            yield power, time_utc, gsp_names, gsp_positions[order], t0_positions[order]
+
+    def _get_valid_t0(self, time_utc: np.ndarray, gsp_names: np.ndarray) -> Optional[np.ndarray]:
+        """Daylight t0's of every GSP, or None without coordinates"""
+        if self.gsp_coordinates is None:
+            return None
+
+        valid_t0 = np.zeros((len(time_utc), len(gsp_names)), dtype=bool)
+        known = [i for i, x in enumerate(gsp_names) if x in self.gsp_coordinates]
+        valid_t0[:, known] = get_daylight_mask(
+            time_utc=time_utc,
+            gsp_coordinates=[self.gsp_coordinates[gsp_names[i]] for i in known],
+            min_elevation=self.min_elevation,
+        )
+        return valid_t0
@@ -1,46 +1,150 @@
 """Function needed to load the data into the IterDatapipe"""
 import logging
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from glob import glob
 from pathlib import Path
-from typing import Dict, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-import pytz
 import xarray as xr
+import zarr
 from pandas import DatetimeIndex
 
+from ukpn.load.power_data.cache import (
+    MAX_CACHE_BYTES,
+    get_cache_key,
+    load_from_cache,
+    save_to_cache,
+)
+from ukpn.load.power_data.metrics import PipelineMetrics
+from ukpn.load.sharding import SHARD_ATTRS
+
 logger = logging.getLogger(__name__)
 
+AMBIGUOUS_POLICIES = ("daylight", "standard", "infer", "NaT")
+NONEXISTENT_POLICIES = ("standard", "shift_forward", "shift_backward", "NaT")
+
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+
+# Explicit schema of the UKPN csv files, for the fast path of load_csv_to_pandas
+UKPN_CSV_SCHEMA = dict(datetime_format="%Y-%m-%d %H:%M:%S", usecols=(0, 1), engine="c")
+
+# Blosc compressors available for the Zarr stores
+ZARR_COMPRESSORS = ("zstd", "lz4", "lz4hc", "zlib", "blosclz")
+
+# Default chunks, 30 days of 10 minute data for a handful of GSPs
+ZARR_CHUNKS = {"time_utc": 4320, "gsp_id": 8}
+
+# In memory dtype of the power array for every dtype it can be stored as,
+# int16 is only used on disk, scaled and offset, and is decoded back into floats
+POWER_DTYPES = {"float64": "float64", "float32": "float32", "int16": "float32"}
+
+# The int16 values are kept within +-INT16_MAX_VALUE, the fill value stands for NaN's
+INT16_MAX_VALUE = 32766
+INT16_FILL_VALUE = -32768
+
 
 def load_csv_to_pandas(
-    path_to_file: Path[Union, str], datetime_index_name: str = "time_utc"
-) -> pd.DataFrame:
+    path_to_file: Union[Path, str],
+    datetime_index_name: str = "time_utc",
+    byte_offset: int = 0,
+    datetime_format: Optional[str] = None,
+    usecols: Tuple[int, int] = (0, 1),
+    engine: str = "c",
+    return_failed_rows: bool = False,
+) -> Union[pd.DataFrame, Tuple[pd.DataFrame, pd.DataFrame]]:
     """This function resamples a time series into regular intervals
 
+    The values are parsed straight into float64 and only fall back to a slower
+    coercion if some of them are not numbers. Rows whose datetime cannot be parsed
+    are dropped, values which cannot be parsed become NaN's, both are reported.
+
     Args:
         path_to_file: Enter the absolute path to the csv file
         datetime_index_name: An appropriate index name for DateTimes
+        byte_offset: If non zero, only the rows after this byte offset are read,
+            the offset must be at the start of a line after the header
+        datetime_format: Format of the datetimes, e.g. "%Y-%m-%d %H:%M:%S",
+            if None the format is inferred
+        usecols: Positions of the datetime and the value columns in the file
+        engine: Parsing engine of pandas.read_csv, "c" or "pyarrow"
+        return_failed_rows: If true, also returns the rows which failed to parse
 
+    Returns:
+        The dataframe indexed by datetime and, if return_failed_rows is true, a
+        dataframe of the failed rows with their row number, raw text and reason
     """
     # Path file converted to posix() for a Windows folder path
-    path_to_file = path_to_file.as_posix()
+    path_to_file = Path(path_to_file).as_posix()
 
     # Getting the file name
-    file_name = [os.path.basename(x).rsplit(".", 1)[0] for x in glob(path_to_file)]
+    file_name = os.path.basename(path_to_file).rsplit(".", 1)[0]
+    column_names = [datetime_index_name, file_name]
+
+    # Reading the csv data from the path, the values straight into floats if possible
+    read_csv = partial(
+        _read_gsp_csv,
+        path_to_file=path_to_file,
+        column_names=column_names,
+        byte_offset=byte_offset,
+        usecols=list(usecols),
+        engine=engine,
+    )
+    try:
+        df = read_csv(dtype={usecols[1]: np.float64})
+    except (ValueError, TypeError):
+        df = read_csv(dtype=None)
 
-    # Reading the csv data from the path
-    df = pd.read_csv(path_to_file, names=[datetime_index_name, file_name[0]], sep=",", skiprows=1)
+    failed_rows = []
+    if df[file_name].dtype != np.float64:
+        # Convert data values from str into float
+        raw_values = df[file_name].astype(object)
+        df[file_name] = pd.to_numeric(raw_values, errors="coerce")
+        failed_values = df[file_name].isna() & raw_values.notna()
+        failed_rows.append(
+            df.loc[failed_values, [datetime_index_name]].assign(
+                **{file_name: raw_values[failed_values], "reason": "value"}
+            )
+        )
 
-    if isinstance(df[df.columns[1]][0], str):
-        # Convert data values from str into int
-        df[file_name[0]] = pd.to_numeric(df[file_name[0]], errors="coerce")
+    # Converting into datetime format, the pyarrow engine may have parsed them already
+    raw_datetimes = df[datetime_index_name]
+    if pd.api.types.is_datetime64_dtype(raw_datetimes):
+        df[datetime_index_name] = raw_datetimes.astype("datetime64[ns]")
     else:
-        pass
+        df[datetime_index_name] = pd.to_datetime(
+            raw_datetimes, format=datetime_format, errors="coerce"
+        )
+    failed_datetimes = df[datetime_index_name].isna()
+    if failed_datetimes.any():
+        failed_rows.append(
+            pd.DataFrame(
+                {
+                    datetime_index_name: raw_datetimes[failed_datetimes],
+                    file_name: df.loc[failed_datetimes, file_name],
+                    "reason": "datetime",
+                }
+            )
+        )
+        df = df[~failed_datetimes]
 
-    # Converting into datetime format
-    df[datetime_index_name] = pd.to_datetime(df[datetime_index_name])
+    failed_rows = (
+        pd.concat(failed_rows)
+        if failed_rows
+        else pd.DataFrame(columns=[datetime_index_name, file_name, "reason"])
+    )
+    failed_rows = failed_rows.rename_axis("row").sort_index()
+    if len(failed_rows) > 0:
+        logger.info(
+            f"{len(failed_rows)} rows of {path_to_file} failed to parse: "
+            f"{failed_rows['reason'].value_counts().to_dict()}"
+        )
 
     # Reset index
     df = df.reset_index(drop=True)
@@ -48,60 +152,216 @@ def load_csv_to_pandas(
     # Set index of original data frame as date_time
     df = df.set_index(datetime_index_name)
 
+    if return_failed_rows:
+        return df, failed_rows
+    return df
+
+
+def _read_gsp_csv(
+    path_to_file: str,
+    column_names: List[str],
+    byte_offset: int,
+    usecols: List[int],
+    engine: str,
+    dtype,
+) -> pd.DataFrame:
+    """Reads the two columns of a GSP csv file, from the header or from a byte offset"""
+    read_kwargs = dict(sep=",", usecols=usecols, engine=engine, dtype=dtype)
+    if not byte_offset:
+        df = pd.read_csv(path_to_file, header=None, skiprows=1, **read_kwargs)
+    else:
+        with open(path_to_file, "rb") as csv_file:
+            csv_file.seek(byte_offset)
+            try:
+                df = pd.read_csv(csv_file, header=None, **read_kwargs)
+            except pd.errors.EmptyDataError:
+                df = pd.DataFrame(columns=usecols, dtype=object)
+
+    # Positional columns renamed once read, which works with every engine
+    df.columns = column_names
     return df
 
 
-def bst_to_utc(original_df: pd.DataFrame, time_zone: str = "Europe/London") -> pd.DataFrame:
+def localize_datetime_index(
+    datetime_index: DatetimeIndex,
+    time_zone: str = "Europe/London",
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+) -> DatetimeIndex:
+    """Vectorised conversion of a naive local DatetimeIndex to UTC
+
+    Args:
+        datetime_index: Naive datetimes in the local time zone
+        time_zone: Local time zone of the dataset
+        ambiguous: Policy for the repeated autumn hour, one of
+            "standard" (read as standard time, the previous pytz behaviour),
+            "daylight" (read as daylight saving time),
+            "infer" (infer the offset from the ordering of the datetimes) or
+            "NaT" (mark the datetimes as NaT)
+        nonexistent: Policy for the skipped spring hour, one of
+            "standard" (read as standard time, the previous pytz behaviour),
+            "shift_forward", "shift_backward" (shift to the closest existing time) or
+            "NaT" (mark the datetimes as NaT)
+    """
+    if ambiguous not in AMBIGUOUS_POLICIES:
+        raise ValueError(f"ambiguous must be one of {AMBIGUOUS_POLICIES}, got {ambiguous}")
+    if nonexistent not in NONEXISTENT_POLICIES:
+        raise ValueError(f"nonexistent must be one of {NONEXISTENT_POLICIES}, got {nonexistent}")
+
+    datetime_index = pd.DatetimeIndex(datetime_index)
+
+    # Boolean arrays tell pandas whether each ambiguous datetime is in daylight saving time
+    if ambiguous == "standard":
+        ambiguous = np.zeros(len(datetime_index), dtype=bool)
+    elif ambiguous == "daylight":
+        ambiguous = np.ones(len(datetime_index), dtype=bool)
+
+    # Reading a skipped datetime as standard time moves it forward by the DST offset
+    if nonexistent == "standard":
+        nonexistent = pd.Timedelta(hours=1)
+
+    utc_index = datetime_index.tz_localize(
+        time_zone, ambiguous=ambiguous, nonexistent=nonexistent
+    ).tz_convert("UTC")
+
+    return utc_index
+
+
+def bst_to_utc(
+    original_df: pd.DataFrame,
+    time_zone: str = "Europe/London",
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+) -> pd.DataFrame:
     """Function converts a datetimeindex localtime to UTC
 
+    Datetimes which cannot be converted under the "NaT" policies are kept as NaT
+    in the index, so that the caller can decide whether to drop them.
+
     Args:
         original_df: Dataframe loaded from the csv file
         time_zone: Local time zone of the dataset
+        ambiguous: Policy for the repeated autumn hour, see `localize_datetime_index`
+        nonexistent: Policy for the skipped spring hour, see `localize_datetime_index`
     """
-    # Declaring the time zone
-    local_standard_time = pytz.timezone(time_zone)
+    utc_index = localize_datetime_index(
+        datetime_index=original_df.index,
+        time_zone=time_zone,
+        ambiguous=ambiguous,
+        nonexistent=nonexistent,
+    )
 
-    # Getting the datetimes
-    original_df.reset_index(inplace=True)
-    original_df["time_utc"] = original_df["time_utc"].apply(lambda x: x.to_pydatetime())
+    return original_df.set_axis(utc_index.rename("time_utc"), axis=0)
 
-    # Localise datetimes to timezone
-    original_df["time_utc"] = original_df["time_utc"].apply(
-        lambda x: local_standard_time.localize(x).astimezone(pytz.utc)
-    )
 
-    # Changing to pandas datetime
-    original_df["time_utc"] = pd.to_datetime(original_df["time_utc"])
+def convert_gsp_data_to_utc(
+    gsp_data_in_dict: Dict[str, pd.DataFrame],
+    time_zone: str = "Europe/London",
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+) -> Dict[str, pd.DataFrame]:
+    """Converts the local datetimes of every GSP dataframe to UTC in a single pass
 
-    # Set back as index
-    original_df = original_df.set_index("time_utc")
+    The datetimes of all the dataframes are concatenated, localised in one call and
+    split back to each dataframe. Inferring the ambiguous hour depends on the ordering
+    within each file, hence with ambiguous="infer" each dataframe is localised separately.
 
-    return original_df
+    Args:
+        gsp_data_in_dict: Dataframes of the GSPs, keyed by GSP name
+        time_zone: Local time zone of the dataset
+        ambiguous: Policy for the repeated autumn hour, see `localize_datetime_index`
+        nonexistent: Policy for the skipped spring hour, see `localize_datetime_index`
+    """
+    if ambiguous == "infer" or len(gsp_data_in_dict) == 0:
+        return {
+            gsp_name: bst_to_utc(
+                original_df=data_frame,
+                time_zone=time_zone,
+                ambiguous=ambiguous,
+                nonexistent=nonexistent,
+            )
+            for gsp_name, data_frame in gsp_data_in_dict.items()
+        }
+
+    # Naive datetimes of all the GSPs as a single array
+    local_datetimes = [
+        pd.DatetimeIndex(data_frame.index).values for data_frame in gsp_data_in_dict.values()
+    ]
+    utc_datetimes = localize_datetime_index(
+        datetime_index=pd.DatetimeIndex(np.concatenate(local_datetimes)),
+        time_zone=time_zone,
+        ambiguous=ambiguous,
+        nonexistent=nonexistent,
+    ).rename("time_utc")
+
+    # Splitting the converted datetimes back to each GSP
+    gsp_utc_dict = {}
+    split_points = np.cumsum([0] + [len(x) for x in local_datetimes])
+    for i, (gsp_name, data_frame) in enumerate(gsp_data_in_dict.items()):
+        utc_index = utc_datetimes[split_points[i] : split_points[i + 1]]
+        gsp_utc_dict[gsp_name] = data_frame.set_axis(utc_index, axis=0)
+
+    return gsp_utc_dict
 
 
 def get_gsp_data_in_dict(
-    folder_destination: str, required_file_format: str = "*.csv", count_gsp_data: bool = False
+    folder_destination: str,
+    required_file_format: str = "*.csv",
+    count_gsp_data: bool = False,
+    max_workers: Optional[int] = None,
+    executor: str = "process",
+    preprocess_kwargs: Optional[Dict] = None,
+    file_paths: Optional[List[str]] = None,
+    byte_offsets: Optional[Dict[str, int]] = None,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+    csv_schema: Optional[Dict] = None,
+    metrics: Optional[PipelineMetrics] = None,
 ) -> Union[pd.DataFrame, Dict]:
     """This function counts the total number of GSP solar data
 
+    The files are listed in sorted order and the dictionary always follows that order,
+    regardless of the order in which the parallel workers complete.
+
     Args:
         folder_destination: The destionation folder where are the files are
         required_file_format: The format of the UKPN power data files, usually .csv
         count_gsp_data: If true, returns a dictionary with total data points for each gsp
+        max_workers: Number of parallel workers, if None the files are loaded serially
+        executor: Either "process" or "thread", the type of the pool of workers
+        preprocess_kwargs: If given, every dataframe is also pre-processed in the worker
+            with `preprocess_gsp_data` using these keyword arguments
+        file_paths: If given, only these files are loaded instead of listing the folder
+        byte_offsets: Byte offset to start reading from for some of the files,
+            keyed by file path, to load only the rows appended since
+        cache_dir: If given, the parsed dataframes are cached as parquet in this folder,
+            keyed by the content of the file, and read from there on the next runs
+        max_cache_bytes: Size limit of the cache folder
+        csv_schema: Keyword arguments of `load_csv_to_pandas` describing the files,
+            e.g. UKPN_CSV_SCHEMA for the fast path with an explicit datetime format
+        metrics: If given, the timings and row counts of every GSP are recorded in it
     """
-    # Getting the file names and the corresponsing dataframes
-    file_paths = os.path.join(folder_destination, required_file_format)
-    file_paths = [x for x in glob(file_paths)]
-
     # Declaring a dictionary
     gsp_count_dict = {}
     gsp_dataframe_dict = {}
 
+    # Loading every file, in parallel if asked for
+    gsp_data = iterate_gsp_data(
+        folder_destination=folder_destination,
+        required_file_format=required_file_format,
+        max_workers=max_workers,
+        executor=executor,
+        preprocess_kwargs=preprocess_kwargs,
+        file_paths=file_paths,
+        byte_offsets=byte_offsets,
+        cache_dir=cache_dir,
+        max_cache_bytes=max_cache_bytes,
+        csv_schema=csv_schema,
+        metrics=metrics,
+    )
+
     # Getting the count of all the dataframes
-    for file_path in file_paths:
-        base_name = os.path.basename(file_path)
-        file_name = os.path.splitext(base_name)[0]
-        pandas_df = load_csv_to_pandas(path_to_file=Path(file_path))
+    for file_name, pandas_df in gsp_data:
         pandas_df_shape = pandas_df.shape[0]
 
         # Getiing the count of all the solar data from the GSP's
@@ -116,6 +376,458 @@ def get_gsp_data_in_dict(
         return gsp_dataframe_dict
 
 
+def iterate_gsp_data(
+    folder_destination: str,
+    required_file_format: str = "*.csv",
+    max_workers: Optional[int] = None,
+    executor: str = "process",
+    preprocess_kwargs: Optional[Dict] = None,
+    file_paths: Optional[List[str]] = None,
+    byte_offsets: Optional[Dict[str, int]] = None,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+    csv_schema: Optional[Dict] = None,
+    metrics: Optional[PipelineMetrics] = None,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Lazily loads the GSP files one at a time, in sorted order
+
+    Only a bounded number of GSP dataframes are held at once, so the caller can
+    process each GSP before the next ones are loaded. See `get_gsp_data_in_dict`
+    for the arguments.
+
+    Yields:
+        The GSP name and its dataframe
+    """
+    # Getting the file names and the corresponsing dataframes
+    if file_paths is None:
+        file_paths = get_gsp_file_paths(
+            folder_destination=folder_destination, required_file_format=required_file_format
+        )
+
+    load_function = partial(
+        load_gsp_file,
+        preprocess_kwargs=preprocess_kwargs,
+        byte_offsets=byte_offsets,
+        cache_dir=cache_dir,
+        max_cache_bytes=max_cache_bytes,
+        csv_schema=csv_schema,
+        return_metrics=metrics is not None,
+    )
+    pandas_dfs = iterate_over_gsp_files(
+        function=load_function, file_paths=file_paths, max_workers=max_workers, executor=executor
+    )
+
+    for file_path, pandas_df in zip(file_paths, pandas_dfs):
+        if metrics is not None:
+            # The records of the workers are added in this process
+            pandas_df, records = pandas_df
+            metrics.extend(records)
+
+        base_name = os.path.basename(file_path)
+        file_name = os.path.splitext(base_name)[0]
+        yield file_name, pandas_df
+
+
+def get_gsp_file_paths(folder_destination: str, required_file_format: str = "*.csv") -> List[str]:
+    """Lists the GSP files of a folder in a stable, sorted order
+
+    Args:
+        folder_destination: The destionation folder where are the files are
+        required_file_format: The format of the UKPN power data files, usually .csv
+    """
+    file_paths = os.path.join(folder_destination, required_file_format)
+    return sorted(glob(file_paths))
+
+
+def map_over_gsp_files(
+    function: Callable,
+    file_paths: List[str],
+    max_workers: Optional[int] = None,
+    executor: str = "process",
+) -> List:
+    """Applies a function to every GSP file, serially or with a pool of workers
+
+    Args:
+        function: A picklable function taking a single file path
+        file_paths: Paths of the GSP files
+        max_workers: Number of parallel workers, if None the files are processed serially
+        executor: Either "process" or "thread", the type of the pool of workers
+
+    Returns:
+        The results in the same order as `file_paths`
+    """
+    return list(
+        iterate_over_gsp_files(
+            function=function, file_paths=file_paths, max_workers=max_workers, executor=executor
+        )
+    )
+
+
+def iterate_over_gsp_files(
+    function: Callable,
+    file_paths: List[str],
+    max_workers: Optional[int] = None,
+    executor: str = "process",
+) -> Iterator:
+    """Lazily applies a function to every GSP file, serially or with a pool of workers
+
+    At most twice `max_workers` files are in flight, so the results which have not
+    been consumed yet stay bounded.
+
+    Args:
+        function: A picklable function taking a single file path
+        file_paths: Paths of the GSP files
+        max_workers: Number of parallel workers, if None the files are processed serially
+        executor: Either "process" or "thread", the type of the pool of workers
+
+    Yields:
+        The results in the same order as `file_paths`
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor must be one of {list(EXECUTORS)}, got {executor}")
+
+    if max_workers is None or max_workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield function(file_path)
+        return
+
+    with EXECUTORS[executor](max_workers=max_workers) as pool:
+        # Futures are consumed in submission order, so the order is stable
+        futures = deque()
+        for file_path in file_paths:
+            futures.append(pool.submit(function, file_path))
+            if len(futures) >= 2 * max_workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def load_gsp_file(
+    file_path: str,
+    preprocess_kwargs: Optional[Dict] = None,
+    byte_offsets: Optional[Dict[str, int]] = None,
+    cache_dir: Optional[str] = None,
+    max_cache_bytes: int = MAX_CACHE_BYTES,
+    csv_schema: Optional[Dict] = None,
+    return_metrics: bool = False,
+) -> Union[pd.DataFrame, Tuple[pd.DataFrame, List[Dict]]]:
+    """Loads, and optionally pre-processes, a single GSP file
+
+    Args:
+        file_path: Path of the GSP file
+        preprocess_kwargs: If given, the dataframe is pre-processed with
+            `preprocess_gsp_data` using these keyword arguments
+        byte_offsets: Byte offset to start reading from, keyed by file path
+        cache_dir: If given, the dataframe is read from and saved to this parquet cache
+        max_cache_bytes: Size limit of the cache folder
+        csv_schema: Keyword arguments of `load_csv_to_pandas` describing the files,
+            e.g. UKPN_CSV_SCHEMA for the fast path with an explicit datetime format
+        return_metrics: If true, the records of a PipelineMetrics timing the stages
+            are returned with the dataframe, so that a worker process can send them back
+
+    Returns:
+        The dataframe and, if return_metrics is true, the metric records
+    """
+    byte_offset = 0 if byte_offsets is None else byte_offsets.get(file_path, 0)
+    gsp_name = os.path.splitext(os.path.basename(file_path))[0]
+    metrics = PipelineMetrics(log_level=None) if return_metrics else None
+
+    # Only whole files are cached
+    use_cache = cache_dir is not None and byte_offset == 0
+    if use_cache:
+        start = time.perf_counter()
+        cache_key = get_cache_key(
+            file_path=file_path, preprocess_kwargs=preprocess_kwargs, csv_schema=csv_schema
+        )
+        freq = None if preprocess_kwargs is None else preprocess_kwargs.get("freq", "10Min")
+        pandas_df = load_from_cache(cache_dir=cache_dir, cache_key=cache_key, freq=freq)
+        if pandas_df is not None:
+            if metrics is None:
+                return pandas_df
+            metrics.record(
+                stage="read_cache",
+                seconds=time.perf_counter() - start,
+                gsp=gsp_name,
+                rows_out=len(pandas_df),
+            )
+            return pandas_df, metrics.records
+
+    start = time.perf_counter()
+    pandas_df, failed_rows = load_csv_to_pandas(
+        path_to_file=Path(file_path),
+        byte_offset=byte_offset,
+        return_failed_rows=True,
+        **(csv_schema or {}),
+    )
+    if metrics is not None:
+        reasons = failed_rows["reason"].value_counts()
+        metrics.record(
+            stage="read_csv",
+            seconds=time.perf_counter() - start,
+            gsp=gsp_name,
+            rows_in=len(pandas_df) + reasons.get("datetime", 0),
+            rows_out=len(pandas_df),
+            rows_dropped={f"invalid_{k}": v for k, v in reasons.items()},
+            bytes_read=os.path.getsize(file_path) - byte_offset,
+        )
+
+    if preprocess_kwargs is not None:
+        pandas_df = preprocess_gsp_data(
+            original_df=pandas_df, metrics=metrics, gsp_name=gsp_name, **preprocess_kwargs
+        )
+
+    if use_cache:
+        save_to_cache(
+            data_frame=pandas_df,
+            cache_dir=cache_dir,
+            cache_key=cache_key,
+            max_cache_bytes=max_cache_bytes,
+        )
+
+    if metrics is not None:
+        return pandas_df, metrics.records
+    return pandas_df
+
+
+def preprocess_gsp_data(
+    original_df: pd.DataFrame,
+    freq: str = "10Min",
+    ambiguous: str = "standard",
+    nonexistent: str = "standard",
+    metrics: Optional[PipelineMetrics] = None,
+    gsp_name: Optional[str] = None,
+) -> pd.DataFrame:
+    """Cleans a single GSP dataframe onto a regular UTC time grid
+
+    Negative values are replaced with NaN's, the datetimes are converted to UTC,
+    duplicated datetimes are dropped and the missing intervals are filled with NaN's.
+
+    Args:
+        original_df: Dataframe loaded from the csv file
+        freq: Intended frequency of the time-series data
+        ambiguous: Policy for the repeated autumn hour, see `localize_datetime_index`
+        nonexistent: Policy for the skipped spring hour, see `localize_datetime_index`
+        metrics: If given, the wall time and the rows dropped are recorded in it,
+            the negative values are counted as masked rather than dropped
+        gsp_name: Name of the GSP in the metrics
+    """
+    start = time.perf_counter()
+    rows_in = len(original_df)
+    if metrics is not None:
+        negative_values = int((original_df.to_numpy() < 0).sum())
+
+    # Check for negative data and replace with NaN's
+    non_negative_df = check_for_negative_data(original_df=original_df, replace_with_nan=True)
+
+    # Converting to UTC
+    non_negative_df = bst_to_utc(
+        original_df=non_negative_df, ambiguous=ambiguous, nonexistent=nonexistent
+    )
+
+    # Dropping the datetimes marked as NaT by the DST policies
+    non_negative_df = non_negative_df[non_negative_df.index.notna()]
+    rows_with_datetime = len(non_negative_df)
+
+    # Check duplicates
+    check = non_negative_df.index.duplicated().any()
+    if check:
+        # Drop duplicates
+        non_negative_df = non_negative_df[~non_negative_df.index.duplicated(keep="last")]
+    rows_without_duplicates = len(non_negative_df)
+
+    # Filling missing intervals
+    non_negative_df = non_negative_df.asfreq(freq)
+
+    if metrics is not None:
+        metrics.record(
+            stage="preprocess",
+            seconds=time.perf_counter() - start,
+            gsp=gsp_name,
+            rows_in=rows_in,
+            rows_out=len(non_negative_df),
+            rows_dropped=dict(
+                negative=negative_values,
+                dst=rows_in - rows_with_datetime,
+                duplicate=rows_with_datetime - rows_without_duplicates,
+            ),
+        )
+
+    return non_negative_df
+
+
+def assemble_gsp_dataset(
+    gsp_data_in_dict: Dict[str, pd.DataFrame],
+    dtype: Union[str, np.dtype] = np.float64,
+    memory_limit: Optional[int] = None,
+) -> xr.Dataset:
+    """Aligns all the GSP dataframes onto a single time grid in one pass
+
+    The union of the datetimes is computed once, a single (time_utc, gsp_id) array
+    is allocated and every GSP column is scattered into it by index position, so the
+    accumulated data is never re-aligned or copied per GSP.
+
+    Args:
+        gsp_data_in_dict: Pre-processed single column dataframes, keyed by GSP name
+        dtype: Data type of the power array
+        memory_limit: If given, a MemoryError is raised instead of allocating an array
+            which would take the resident memory of the process above this many bytes
+    """
+    gsp_names = list(gsp_data_in_dict.keys())
+    gsp_indexes = [pd.DatetimeIndex(x.index) for x in gsp_data_in_dict.values()]
+
+    # Datetimes of every GSP as naive UTC
+    gsp_datetimes = [to_naive_utc(x) for x in gsp_indexes]
+
+    # Union of all the datetimes and the position of every GSP datetime in it
+    time_grid, gsp_positions = _get_union_time_grid(
+        gsp_datetimes=gsp_datetimes, freqs=[x.freq for x in gsp_indexes]
+    )
+
+    if memory_limit is not None:
+        check_memory_budget(
+            required_bytes=len(time_grid) * len(gsp_names) * np.dtype(dtype).itemsize,
+            memory_limit=memory_limit,
+        )
+
+    # Preallocating the final array
+    gsp_metered_power_values = np.full((len(time_grid), len(gsp_names)), np.nan, dtype=dtype)
+
+    # Scattering every GSP into its column
+    for i, (positions, data_frame) in enumerate(zip(gsp_positions, gsp_data_in_dict.values())):
+        gsp_metered_power_values[positions, i] = data_frame.to_numpy().ravel()
+
+    return create_gsp_dataset(
+        gsp_metered_power_values=gsp_metered_power_values,
+        gsp_datetimes=time_grid,
+        gsp_names=gsp_names,
+    )
+
+
+def iterate_gsp_dataset_windows(
+    gsp_data_in_dict: Dict[str, pd.DataFrame],
+    window: str = "7D",
+    dtype: Union[str, np.dtype] = np.float64,
+    memory_limit: Optional[int] = None,
+) -> Iterator[xr.Dataset]:
+    """Yields the aligned GSP dataset in consecutive time windows
+
+    The union time grid is computed once, but the (time_utc, gsp_id) array is only
+    allocated one window at a time, so the full aligned array is never materialised.
+
+    Args:
+        gsp_data_in_dict: Pre-processed single column dataframes, keyed by GSP name
+        window: Length of every time window, e.g. "7D"
+        dtype: Data type of the power array
+        memory_limit: If given, windows whose array would take the resident memory of
+            the process above this many bytes are split into shorter ones
+    """
+    gsp_names = list(gsp_data_in_dict.keys())
+    gsp_indexes = [pd.DatetimeIndex(x.index) for x in gsp_data_in_dict.values()]
+    gsp_values = [x.to_numpy().ravel() for x in gsp_data_in_dict.values()]
+
+    # Union of all the datetimes and the position of every GSP datetime in it
+    time_grid, gsp_positions = _get_union_time_grid(
+        gsp_datetimes=[to_naive_utc(x) for x in gsp_indexes], freqs=[x.freq for x in gsp_indexes]
+    )
+    if len(time_grid) == 0:
+        return
+
+    # Grid positions where every window starts
+    window_starts = np.arange(
+        time_grid[0], time_grid[-1] + np.timedelta64(1, "ns"), pd.Timedelta(window).to_timedelta64()
+    )
+    window_bounds = np.append(np.searchsorted(time_grid, window_starts), len(time_grid))
+
+    if memory_limit is not None:
+        # Longest window which still fits in the memory left
+        row_bytes = max(len(gsp_names), 1) * np.dtype(dtype).itemsize
+        max_rows = (memory_limit - get_rss_bytes()) // row_bytes
+        if max_rows < 1:
+            check_memory_budget(required_bytes=row_bytes, memory_limit=memory_limit)
+        if (np.diff(window_bounds) > max_rows).any():
+            logger.info(f"Windows are split into {max_rows} datetimes to fit the memory limit")
+            window_bounds = np.unique(
+                np.concatenate(
+                    [
+                        np.arange(start, end, max_rows)
+                        for start, end in zip(window_bounds[:-1], window_bounds[1:])
+                    ]
+                    + [[len(time_grid)]]
+                )
+            )
+
+    for start, end in zip(window_bounds[:-1], window_bounds[1:]):
+        if start == end:
+            continue
+
+        # Scattering only the part of every GSP inside the window
+        window_power = np.full((end - start, len(gsp_names)), np.nan, dtype=dtype)
+        for i, (positions, values) in enumerate(zip(gsp_positions, gsp_values)):
+            first, last = np.searchsorted(positions, [start, end])
+            window_power[positions[first:last] - start, i] = values[first:last]
+
+        yield create_gsp_dataset(
+            gsp_metered_power_values=window_power,
+            gsp_datetimes=time_grid[start:end],
+            gsp_names=gsp_names,
+        )
+
+
+def create_gsp_dataset(
+    gsp_metered_power_values: np.ndarray,
+    gsp_datetimes: np.ndarray,
+    gsp_names: List[str],
+    attrs: Optional[Dict] = None,
+) -> xr.Dataset:
+    """Wraps the aligned (time_utc, gsp_id) array into an xarray dataset without copying
+
+    Args:
+        gsp_metered_power_values: The (time_utc, gsp_id) power array, numpy or dask
+        gsp_datetimes: Naive UTC datetimes of the rows
+        gsp_names: Names of the GSP columns
+        attrs: Attributes of the dataset, defaults to the description of the power
+    """
+    if attrs is None:
+        attrs = dict(description="Metered power generation (MW) of GSP's")
+
+    # Creating an xarray dataset
+    final_dataset = xr.Dataset(
+        data_vars=dict(power=(["time_utc", "gsp_id"], gsp_metered_power_values)),
+        coords=dict(time_utc=gsp_datetimes, gsp_id=gsp_names),
+        attrs=attrs,
+    )
+
+    return final_dataset
+
+
+def _get_union_time_grid(gsp_datetimes: List[np.ndarray], freqs: List) -> Tuple:
+    """Union of the GSP datetimes and the positions of each GSP in the union
+
+    Regular grids sharing a frequency and phase, which is what asfreq produces,
+    are merged arithmetically, anything else falls back to a sort based union.
+    """
+    if len(gsp_datetimes) == 0:
+        return np.array([], dtype="datetime64[ns]"), []
+
+    # Fast path, every GSP is on the same regular grid
+    freq = freqs[0]
+    regular = isinstance(freq, pd.offsets.Tick) and all(x == freq for x in freqs)
+    if regular and all(len(x) for x in gsp_datetimes):
+        step = pd.Timedelta(freq).to_timedelta64()
+        start = min(x[0] for x in gsp_datetimes)
+        end = max(x[-1] for x in gsp_datetimes)
+        if all((x[0] - start) % step == np.timedelta64(0) for x in gsp_datetimes):
+            time_grid = np.arange(start, end + step, step)
+            gsp_positions = [
+                (x[0] - start) // step + np.arange(len(x), dtype=np.int64) for x in gsp_datetimes
+            ]
+            return time_grid, gsp_positions
+
+    time_grid = np.unique(np.concatenate(gsp_datetimes))
+    gsp_positions = [np.searchsorted(time_grid, x) for x in gsp_datetimes]
+    return time_grid, gsp_positions
+
+
 def check_for_negative_data(
     original_df: pd.DataFrame, replace_with_nan: bool = False
 ) -> Union[DatetimeIndex, pd.DataFrame]:
@@ -125,28 +837,33 @@ def check_for_negative_data(
         original_df: Loaded dataframe from the csv file
         replace_with_nan: If true it replaces negative values with NaN's
     """
-    # Check for the negative values
-    check_non_negative = (original_df < 0).any()
+    # Check for the negative values in every column at once
+    negative_values = original_df < 0
 
-    if not check_non_negative[0]:
-        logger.info(f"The CSV file does contain the negative values {check_for_negative_data}")
+    if not negative_values.to_numpy().any():
+        logger.info("The CSV file does not contain negative values")
         return original_df
     else:
-        # Filtering the dataframe which has negative values
-        negative_df = original_df.iloc[np.where(original_df[original_df.columns[0]].values < 0.0)]
+        logger.info(f"The CSV file contains {negative_values.to_numpy().sum()} negative values")
 
         if not replace_with_nan:
             # Returns index values where there are negative numbers
-            return negative_df.index
+            return original_df.index[negative_values.to_numpy().any(axis=1)]
         else:
             # Replacing negative values with NaN's
-            original_df.loc[negative_df.index] = np.nan
+            original_df[negative_values] = np.nan
             # Returns original dataframe with negative values replaced with NaN's
             return original_df
 
 
 def convert_xarray_to_netcdf(
-    xarray_dataarray: xr.Dataset, folder_to_save: str, file_name: str = "canterbury_north.nc"
+    xarray_dataarray: xr.Dataset,
+    folder_to_save: str,
+    file_name: str = "canterbury_north.nc",
+    overwrite: bool = False,
+    dtype: Optional[str] = None,
+    scale_factor: Optional[float] = None,
+    add_offset: Optional[float] = None,
 ) -> None:
     """This function saves the xarray dataarray in netcdf file
 
@@ -154,17 +871,382 @@ def convert_xarray_to_netcdf(
         xarray_dataarray: The dataarray that needs to be saved
         folder_to_save: Path of the destination folder
         file_name: Name of the file to be saved
+        overwrite: If true, an existing file is replaced, otherwise it is left untouched
+        dtype: Data type of the stored power, one of POWER_DTYPES, see `get_power_encoding`
+        scale_factor: Scale factor of the int16 power, derived from the data if None
+        add_offset: Offset of the int16 power, derived from the data if None
     """
 
     # Define the path
     file_path = os.path.join(folder_to_save, file_name)
 
+    # Encoding of the stored power
+    encoding = {
+        "power": get_power_encoding(
+            xarray_dataset=xarray_dataarray,
+            dtype=dtype,
+            scale_factor=scale_factor,
+            add_offset=add_offset,
+        )
+    }
+
     # Check if the file exists
     check_file = os.path.isfile(file_path)
 
     if not check_file:
         # Saving the xarray
-        xarray_dataarray.to_netcdf(path=file_path, engine="h5netcdf")
+        xarray_dataarray.to_netcdf(path=file_path, engine="h5netcdf", encoding=encoding)
 
         # Close the data array
         xarray_dataarray.close()
+    elif overwrite:
+        # Writing next to the file first, so a failed write keeps the previous file
+        temporary_path = file_path + ".tmp"
+        xarray_dataarray.to_netcdf(path=temporary_path, engine="h5netcdf", encoding=encoding)
+        xarray_dataarray.close()
+        os.replace(temporary_path, file_path)
+    else:
+        logger.info(f"{file_path} already exists and has not been overwritten")
+
+
+def convert_xarray_to_zarr(
+    xarray_dataset: xr.Dataset,
+    folder_to_save: str,
+    file_name: str = "ukpn_gsp.zarr",
+    chunks: Optional[Dict[str, int]] = None,
+    compressor: Optional[str] = "zstd",
+    compression_level: int = 5,
+    consolidated: bool = True,
+    append: bool = False,
+    overwrite: bool = False,
+    dtype: Optional[str] = None,
+    scale_factor: Optional[float] = None,
+    add_offset: Optional[float] = None,
+) -> None:
+    """This function saves the xarray dataset in a chunked and compressed Zarr store
+
+    Args:
+        xarray_dataset: The dataset that needs to be saved
+        folder_to_save: Path of the destination folder
+        file_name: Name of the Zarr store to be saved
+        chunks: Chunk sizes along "time_utc" and "gsp_id", defaults to ZARR_CHUNKS
+        compressor: Blosc compressor, one of ZARR_COMPRESSORS, or None for no compression
+        compression_level: Blosc compression level from 0 to 9
+        consolidated: If true, the metadata is consolidated into a single object
+        append: If true and the store exists, the datetimes after the last stored
+            datetime are appended along "time_utc"
+        overwrite: If true, an existing store is replaced, otherwise it is left untouched
+        dtype: Data type of the stored power, one of POWER_DTYPES, see `get_power_encoding`.
+            When appending, the data type of the store is kept
+        scale_factor: Scale factor of the int16 power, derived from the data if None
+        add_offset: Offset of the int16 power, derived from the data if None
+    """
+    if compressor is not None and compressor not in ZARR_COMPRESSORS:
+        raise ValueError(f"compressor must be one of {ZARR_COMPRESSORS} or None, got {compressor}")
+
+    # Define the path
+    file_path = os.path.join(folder_to_save, file_name)
+
+    # Check if the store exists
+    check_file = os.path.exists(file_path)
+
+    if check_file and append:
+        # Only the datetimes after the stored ones are appended
+        with xr.open_zarr(file_path, consolidated=consolidated) as stored_dataset:
+            last_datetime = stored_dataset.time_utc.values[-1]
+            stored_gsps = stored_dataset.gsp_id.values
+            stored_chunks = stored_dataset.power.encoding["chunks"]
+        if not np.array_equal(stored_gsps, xarray_dataset.gsp_id.values):
+            raise ValueError("Appending along time_utc needs the same gsp_id as the store")
+        new_dataset = xarray_dataset.isel(time_utc=xarray_dataset.time_utc.values > last_datetime)
+        if new_dataset.power.chunks is not None:
+            # Dask chunks have to line up with the chunks of the store
+            new_dataset = new_dataset.chunk(dict(zip(new_dataset.power.dims, stored_chunks)))
+        if new_dataset.sizes["time_utc"] > 0:
+            new_dataset.to_zarr(file_path, append_dim="time_utc", consolidated=consolidated)
+    elif not check_file or overwrite:
+        chunks = dict(ZARR_CHUNKS, **(chunks or {}))
+        encoding = dict(
+            chunks=tuple(
+                min(chunks[dim], max(xarray_dataset.sizes[dim], 1))
+                for dim in xarray_dataset.power.dims
+            ),
+            **_get_zarr_compressor_encoding(
+                compressor=compressor, compression_level=compression_level
+            ),
+            **get_power_encoding(
+                xarray_dataset=xarray_dataset,
+                dtype=dtype,
+                scale_factor=scale_factor,
+                add_offset=add_offset,
+            ),
+        )
+        if xarray_dataset.power.chunks is not None:
+            # Dask chunks have to line up with the chunks of the store
+            xarray_dataset = xarray_dataset.chunk(
+                dict(zip(xarray_dataset.power.dims, encoding["chunks"]))
+            )
+        xarray_dataset.to_zarr(
+            file_path, mode="w", encoding={"power": encoding}, consolidated=consolidated
+        )
+    else:
+        logger.info(f"{file_path} already exists and has not been overwritten")
+
+
+def _get_zarr_compressor_encoding(compressor: Optional[str], compression_level: int) -> Dict:
+    """Zarr encoding of a Blosc compressor for either zarr 2 or zarr 3"""
+    zarr_v3 = int(zarr.__version__.split(".")[0]) >= 3
+    if compressor is None:
+        return {"compressors": None} if zarr_v3 else {"compressor": None}
+
+    if zarr_v3:
+        from zarr.codecs import BloscCodec
+
+        return {
+            "compressors": (
+                BloscCodec(cname=compressor, clevel=compression_level, shuffle="bitshuffle"),
+            )
+        }
+    else:
+        from numcodecs import Blosc
+
+        return {
+            "compressor": Blosc(
+                cname=compressor, clevel=compression_level, shuffle=Blosc.BITSHUFFLE
+            )
+        }
+
+
+def get_power_encoding(
+    xarray_dataset: xr.Dataset,
+    dtype: Optional[str] = None,
+    scale_factor: Optional[float] = None,
+    add_offset: Optional[float] = None,
+) -> Dict:
+    """Encoding of the power variable when it is stored in a compact data type
+
+    The int16 values are stored as round((power - add_offset) / scale_factor), with
+    INT16_FILL_VALUE for the NaN's, and are decoded back into floats when read. If not
+    given, the scale factor and the offset are derived from the range of the data, so
+    the error of every value is at most half of (max - min) / (2 * INT16_MAX_VALUE).
+
+    Args:
+        xarray_dataset: The dataset with the power variable
+        dtype: One of POWER_DTYPES, or None to store the power as it is in memory
+        scale_factor: Scale factor of the int16 values
+        add_offset: Offset of the int16 values
+    """
+    if dtype is None:
+        return {}
+    if dtype not in POWER_DTYPES:
+        raise ValueError(f"dtype must be one of {tuple(POWER_DTYPES)} or None, got {dtype}")
+    if dtype != "int16":
+        return {"dtype": dtype}
+
+    if scale_factor is None or add_offset is None:
+        min_power = float(xarray_dataset.power.min())
+        max_power = float(xarray_dataset.power.max())
+        if np.isnan(min_power):
+            min_power, max_power = 0.0, 0.0
+        if add_offset is None:
+            add_offset = (max_power + min_power) / 2
+        if scale_factor is None:
+            half_range = max(max_power - add_offset, add_offset - min_power)
+            scale_factor = half_range / INT16_MAX_VALUE if half_range > 0 else 1.0
+
+    return {
+        "dtype": "int16",
+        "scale_factor": scale_factor,
+        "add_offset": add_offset,
+        "_FillValue": INT16_FILL_VALUE,
+    }
+
+
+def get_rss_bytes() -> int:
+    """Resident memory of the current process in bytes
+
+    The current resident memory is read from procfs, or from psutil if it is installed.
+    Otherwise this is the peak resident memory of the process, which never decreases,
+    so a memory limit reached once stays reached.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import psutil
+    except ImportError:
+        import resource
+
+        # The peak is in kilobytes, except on macOS where it is in bytes
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+    else:
+        return psutil.Process().memory_info().rss
+
+
+def check_memory_budget(required_bytes: int, memory_limit: int) -> None:
+    """Raises a MemoryError if allocating required_bytes would exceed the memory limit
+
+    Args:
+        required_bytes: Size of the array about to be allocated
+        memory_limit: Limit of the resident memory of the process in bytes
+    """
+    rss_bytes = get_rss_bytes()
+    if rss_bytes + required_bytes > memory_limit:
+        raise MemoryError(
+            f"Allocating {required_bytes / 2**20:.1f} MiB on top of the "
+            f"{rss_bytes / 2**20:.1f} MiB in use exceeds the memory limit of "
+            f"{memory_limit / 2**20:.1f} MiB, use a more compact dtype, the window mode "
+            "or the lazy dataset"
+        )
+
+
+def merge_gsp_data_into_dataset(
+    stored_dataset: xr.Dataset,
+    gsp_data_in_dict: Dict[str, pd.DataFrame],
+    replace_gsps: Optional[List[str]] = None,
+    freq: Optional[str] = None,
+) -> xr.Dataset:
+    """Updates a stored GSP dataset with new or changed GSP data
+
+    The variables of the stored dataset besides the power, e.g. the quality flags of
+    `CheckGSPQuality`, are reindexed onto the merged grid. As they are not derived from
+    the new data, they become missing wherever the power is new or replaced, which
+    casts integer variables to float.
+
+    Args:
+        stored_dataset: The previously assembled dataset
+        gsp_data_in_dict: Pre-processed single column dataframes, keyed by GSP name
+        replace_gsps: GSPs whose stored values are discarded before merging, for files
+            which changed entirely. The other GSPs only have their new datetimes updated
+        freq: Frequency of the time grid, used to keep the merged grid regular
+    """
+    replace_gsps = set(replace_gsps or [])
+    stored_times = stored_dataset.time_utc.values
+    stored_gsps = list(stored_dataset.gsp_id.values)
+
+    # Datetimes of every new GSP dataframe as naive UTC
+    gsp_datetimes = {
+        gsp_name: to_naive_utc(pd.DatetimeIndex(data_frame.index))
+        for gsp_name, data_frame in gsp_data_in_dict.items()
+    }
+
+    # Union of the stored and the new datetimes
+    time_grid = _get_regular_time_grid(
+        np.unique(np.concatenate([stored_times, *gsp_datetimes.values()])), freq=freq
+    )
+
+    # Stored GSPs keep their order, the new ones are added after them
+    gsp_names = stored_gsps + [x for x in gsp_data_in_dict if x not in stored_gsps]
+
+    # Copying the stored array into the merged grid
+    stored_power = stored_dataset.power.values
+    gsp_metered_power_values = np.full(
+        (len(time_grid), len(gsp_names)), np.nan, dtype=stored_power.dtype
+    )
+    stored_positions = np.searchsorted(time_grid, stored_times)
+    gsp_metered_power_values[stored_positions, : len(stored_gsps)] = stored_power
+
+    # Scattering the new data of every GSP
+    updated = np.zeros(gsp_metered_power_values.shape, dtype=bool)
+    for gsp_name, data_frame in gsp_data_in_dict.items():
+        i = gsp_names.index(gsp_name)
+        if gsp_name in replace_gsps:
+            gsp_metered_power_values[:, i] = np.nan
+            updated[:, i] = True
+        positions = np.searchsorted(time_grid, gsp_datetimes[gsp_name])
+        gsp_metered_power_values[positions, i] = data_frame.to_numpy().ravel()
+        updated[positions, i] = True
+
+    final_dataset = create_gsp_dataset(
+        gsp_metered_power_values=gsp_metered_power_values,
+        gsp_datetimes=time_grid,
+        gsp_names=gsp_names,
+        attrs=stored_dataset.attrs,
+    )
+
+    # Carrying the other stored variables over, missing where the power was updated
+    updated = xr.DataArray(updated, coords=final_dataset.power.coords)
+    for name, variable in stored_dataset.data_vars.items():
+        if name == "power":
+            continue
+        indexers = {k: final_dataset.indexes[k] for k in variable.dims if k in updated.dims}
+        variable = variable.reindex(indexers)
+        if set(updated.dims) <= set(variable.dims):
+            variable = variable.where(~updated)
+        final_dataset[name] = variable
+
+    return final_dataset
+
+
+def gather_gsp_datasets(
+    xarray_datasets: List[xr.Dataset], freq: Optional[str] = None
+) -> xr.Dataset:
+    """Gathers the datasets of separate GSPs, e.g. of every shard, into one aligned dataset
+
+    The GSPs are sorted by name, like when all the files are loaded by a single process.
+
+    Args:
+        xarray_datasets: Datasets of separate GSPs
+        freq: Frequency of the time grid, used to keep the gathered grid regular
+    """
+    if len(xarray_datasets) == 0:
+        raise ValueError("There are no datasets to gather")
+
+    gsp_names = [str(x) for xarray_dataset in xarray_datasets for x in xarray_dataset.gsp_id.values]
+    if len(set(gsp_names)) < len(gsp_names):
+        raise ValueError("The gathered datasets must not share any GSP")
+
+    # Union of the datetimes of every dataset
+    time_grid = _get_regular_time_grid(
+        np.unique(np.concatenate([x.time_utc.values for x in xarray_datasets])), freq=freq
+    )
+
+    # Column of every GSP once sorted by name
+    gsp_columns = np.empty(len(gsp_names), dtype=np.int64)
+    gsp_columns[np.argsort(gsp_names, kind="stable")] = np.arange(len(gsp_names))
+
+    gsp_metered_power_values = np.full(
+        (len(time_grid), len(gsp_names)),
+        np.nan,
+        dtype=np.result_type(*[x.power.dtype for x in xarray_datasets]),
+    )
+    first_column = 0
+    for xarray_dataset in xarray_datasets:
+        columns = gsp_columns[first_column : first_column + xarray_dataset.sizes["gsp_id"]]
+        positions = np.searchsorted(time_grid, xarray_dataset.time_utc.values)
+        gsp_metered_power_values[np.ix_(positions, columns)] = xarray_dataset.power.transpose(
+            "time_utc", "gsp_id"
+        ).values
+        first_column += len(columns)
+
+    return create_gsp_dataset(
+        gsp_metered_power_values=gsp_metered_power_values,
+        gsp_datetimes=time_grid,
+        gsp_names=sorted(gsp_names),
+        # The gathered dataset is not the share of a shard any more
+        attrs={k: v for k, v in xarray_datasets[0].attrs.items() if k not in SHARD_ATTRS},
+    )
+
+
+def _get_regular_time_grid(time_grid: np.ndarray, freq: Optional[str] = None) -> np.ndarray:
+    """Fills the gaps of a sorted time grid if all its datetimes are on the freq grid"""
+    if freq is not None and len(time_grid) > 0:
+        step = pd.Timedelta(freq).to_timedelta64()
+        if ((time_grid - time_grid[0]) % step == np.timedelta64(0)).all():
+            time_grid = np.arange(time_grid[0], time_grid[-1] + step, step)
+    return time_grid
+
+
+def to_naive_utc(datetime_index: DatetimeIndex) -> np.ndarray:
+    """Datetimes as naive UTC numpy values
+
+    Args:
+        datetime_index: Naive UTC or timezone aware datetimes
+    """
+    if datetime_index.tz is not None:
+        datetime_index = datetime_index.tz_convert("UTC").tz_localize(None)
+    return datetime_index.values
@@ -0,0 +1,50 @@
+"""Sharding of the GSPs across the DataLoader workers and the distributed ranks"""
+from typing import List, Optional, Sequence, Tuple
+
+import torch.distributed as dist
+from torch.utils.data import get_worker_info
+
+# Attributes of the datasets which only hold the GSPs of a shard
+SHARD_ATTRS = ("shard_id", "number_of_shards")
+
+
+def get_shard_info() -> Tuple[int, int]:
+    """Position of this process among the DataLoader workers of every distributed rank
+
+    The shards are numbered like the sharding of the torch DataLoader, the workers of
+    a rank are spread out so that every rank gets an even share.
+
+    Returns:
+        The shard id of this process and the number of shards
+    """
+    rank, world_size = 0, 1
+    if dist.is_available() and dist.is_initialized():
+        rank, world_size = dist.get_rank(), dist.get_world_size()
+
+    worker_id, number_of_workers = 0, 1
+    worker_info = get_worker_info()
+    if worker_info is not None:
+        worker_id, number_of_workers = worker_info.id, worker_info.num_workers
+
+    return worker_id * world_size + rank, number_of_workers * world_size
+
+
+def shard_items(
+    items: Sequence, shard_id: Optional[int] = None, number_of_shards: Optional[int] = None
+) -> List:
+    """The share of the items of a shard, the same in every process
+
+    The items are sorted and dealt out in turn, so every shard gets a deterministic
+    share whatever order they were listed in.
+
+    Args:
+        items: The items to share, e.g. the paths of the GSP files
+        shard_id: Shard to get the share of, from `get_shard_info` if None
+        number_of_shards: Number of shards, from `get_shard_info` if None
+    """
+    if shard_id is None or number_of_shards is None:
+        shard_id, number_of_shards = get_shard_info()
+    if not 0 <= shard_id < number_of_shards:
+        raise ValueError(f"shard_id must be in [0, {number_of_shards}), got {shard_id}")
+
+    return sorted(items)[shard_id::number_of_shards]